@@ -1,21 +1,30 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
-import plotly.express as px
 import plotly.graph_objects as go
-from optimization import analyze_sensitivity
+import os
+
+# Solver, chart and job modules are imported by the functions that use them,
+# so a page loads only what it shows
+from scenario_store import session_store
+from work_table import session_table
 
 def render_sensitivity_analysis():
     """Render a sensitivity analysis page that shows how changing budget affects optimization."""
+    from jobs import ensure_job
+    from main import SOLVE_MODES, watch_job
+    from optimization import frontier_supported
+    
     st.title("Sensitivity Analysis")
     
-    if 'work_types' not in st.session_state or len(st.session_state.work_types) == 0:
+    table = session_table(st.session_state)
+    if len(table) == 0:
         st.warning("Please add work types on the main page before running sensitivity analysis.")
         return
     
     st.subheader("Budget Sensitivity Analysis")
     
-    work_df = pd.DataFrame(st.session_state.work_types)
+    work_df = table.frame()
     
     budget_base = st.number_input(
         "Reference Budget ($)", 
@@ -23,159 +32,856 @@ def render_sensitivity_analysis():
         value=1000000, 
         step=10000
     )
+    budget_min = budget_base * 0.5
+    budget_max = budget_base * 1.5
     
-    steps = st.slider(
-        "Number of Analysis Points", 
-        min_value=5, 
-        max_value=20, 
-        value=10
-    )
+    # The exact frontier covers every budget, so sample points are only
+    # needed when it is unavailable for these work types
+    exact = table.derive('frontier_supported', lambda table, budget: frontier_supported(table.frame(), budget), budget_max)
+    frontier_key = (table.version, budget_max)
+    
+    if not exact:
+        steps = st.slider(
+            "Number of Analysis Points", 
+            min_value=5, 
+            max_value=200, 
+            value=10
+        )
+        
+        solve_mode = st.radio(
+            "Solve Mode", list(SOLVE_MODES), horizontal=True,
+            help="Fast mode solves each point approximately; choose Exact to re-solve every point to optimality"
+        )
+        
+        col1, col2 = st.columns(2)
+        with col1:
+            workers = st.number_input(
+                "Parallel Workers",
+                min_value=1,
+                max_value=max(os.cpu_count() or 1, 1),
+                value=1,
+                help="Solve budget points in this many worker processes"
+            )
+        with col2:
+            chunksize = st.number_input(
+                "Points per Worker Batch",
+                min_value=1,
+                value=1
+            )
     
     if st.button("Run Sensitivity Analysis"):
-        with st.spinner("Running sensitivity analysis..."):
-            sensitivity_results = analyze_sensitivity(work_df, budget_base, steps)
-            
-            # Plot results
-            fig = go.Figure()
-            
-            fig.add_trace(go.Scatter(
-                x=sensitivity_results['budget'],
-                y=sensitivity_results['objective_value'],
-                mode='lines+markers',
-                name='Priority Value',
-                line=dict(color='blue')
-            ))
-            
-            # Add a secondary y-axis for budget utilization
-            fig.add_trace(go.Scatter(
-                x=sensitivity_results['budget'],
-                y=sensitivity_results['budget_utilization'] * 100,  # Convert to percentage
-                mode='lines+markers',
-                name='Budget Utilization (%)',
-                line=dict(color='green'),
-                yaxis='y2'
-            ))
-            
-            fig.update_layout(
-                title='Budget Sensitivity Analysis',
-                xaxis_title='Budget ($)',
-                yaxis_title='Priority Value',
-                yaxis2=dict(
-                    title='Budget Utilization (%)',
-                    titlefont=dict(color='green'),
-                    tickfont=dict(color='green'),
-                    anchor='x',
-                    overlaying='y',
-                    side='right'
-                ),
-                legend=dict(
-                    orientation="h",
-                    yanchor="bottom",
-                    y=1.02,
-                    xanchor="right",
-                    x=1
-                )
+        if exact:
+            ensure_job(st.session_state, 'sensitivity_job', frontier_key, run_frontier, work_df, budget_max)
+        else:
+            sweep_key = (table.version, budget_base, steps, solve_mode)
+            ensure_job(
+                st.session_state, 'sensitivity_job', sweep_key, run_sweep,
+                work_df, budget_base, steps, SOLVE_MODES[solve_mode], workers, chunksize, total=steps
             )
-            
-            st.plotly_chart(fig, use_container_width=True)
-            
-            # Show data table
-            st.subheader("Detailed Results")
-            display_df = sensitivity_results.copy()
-            display_df['budget'] = display_df['budget'].map('${:,.2f}'.format)
-            display_df['budget_utilization'] = (display_df['budget_utilization'] * 100).map('{:.1f}%'.format)
-            display_df.columns = ['Budget', 'Priority Value', 'Budget Utilization']
-            st.dataframe(display_df)
+    
+    # The job keeps running across reruns; redraw the chart from the points solved so far
+    if 'sensitivity_job' in st.session_state:
+        job = st.session_state.sensitivity_job
+        watch_job(job, render_sweep_progress, "Cancel Analysis", 'cancel_sensitivity')
+        del st.session_state.sensitivity_job
+        
+        if job.error is not None:
+            st.error(f"Sensitivity analysis failed: {str(job.error)}")
+        elif job.result is not None:
+            st.session_state['sensitivity_frontier' if exact else 'sensitivity_sweep'] = {
+                'key': job.key,
+                'result': job.result,
+                'complete': job.state == 'done'
+            }
+    
+    stored = st.session_state.get('sensitivity_frontier')
+    if exact and stored and stored['key'] == frontier_key:
+        render_budget_frontier(stored['result'], work_df, budget_min, budget_max, budget_base)
+    
+    stored = st.session_state.get('sensitivity_sweep')
+    if not exact and stored and stored['key'][:2] == (frontier_key[0], budget_base) and len(stored['result']) > 0:
+        if not stored['complete']:
+            st.info("Analysis cancelled; showing the budget points solved before it stopped.")
+        st.plotly_chart(sampled_sensitivity_figure(stored['result']), use_container_width=True)
+        render_sampled_table(stored['result'])
+    
+    render_grid_analysis(table, budget_min, budget_max)
+
+def render_grid_analysis(table, budget_min, budget_max):
+    """Render the budget x multiplier grid and its heatmap."""
+    from jobs import ensure_job
+    from main import watch_job
+    
+    st.subheader("Budget and Multiplier Grid")
+    work_df = table.frame()
+    
+    col1, col2 = st.columns(2)
+    with col1:
+        parameter = st.radio("Vary", ["Priority", "Cost"], horizontal=True, key='grid_parameter')
+        scaled_types = st.multiselect(
+            "Work Types to Scale", list(work_df['name']), default=list(work_df['name'][:1]), key='grid_work_types'
+        )
+    with col2:
+        multiplier_range = st.slider(
+            "Multiplier Range", min_value=0.0, max_value=3.0, value=(0.5, 1.5), step=0.05, key='grid_range'
+        )
+        resolution = st.slider("Grid Points per Axis", min_value=5, max_value=50, value=20, key='grid_resolution')
+    
+    # Two-decimal multipliers keep scaled priorities on a grid the knapsack solver can bound tightly
+    multipliers = np.unique(np.round(np.linspace(*multiplier_range, resolution), 2))
+    budgets = np.linspace(budget_min, budget_max, resolution)
+    axis = {'parameter': parameter.lower(), 'work_types': scaled_types, 'multipliers': multipliers}
+    grid_key = (table.version, budget_min, budget_max, parameter, tuple(scaled_types), tuple(multipliers))
+    
+    if st.button("Run Grid Analysis", disabled=not scaled_types):
+        ensure_job(
+            st.session_state, 'sensitivity_grid_job', grid_key, run_grid,
+            work_df, budgets, axis, total=len(multipliers) * len(budgets)
+        )
+    
+    if 'sensitivity_grid_job' in st.session_state:
+        job = st.session_state.sensitivity_grid_job
+        watch_job(job, render_grid_progress, "Cancel Grid Analysis", 'cancel_sensitivity_grid')
+        del st.session_state.sensitivity_grid_job
+        
+        if job.error is not None:
+            st.error(f"Grid analysis failed: {str(job.error)}")
+        elif job.result is not None:
+            st.session_state.sensitivity_grid = {'key': job.key, 'result': job.result, 'complete': job.state == 'done'}
+    
+    stored = st.session_state.get('sensitivity_grid')
+    if stored and stored['key'] == grid_key:
+        if not stored['complete']:
+            st.info("Grid analysis cancelled; cells not reached are left blank.")
+        render_grid_heatmap(stored['result'])
+
+def run_grid(job, work_df, budgets, axis):
+    """Job function: solve the budget x multiplier grid, publishing progress by cells."""
+    from sensitivity_grid import compute_sensitivity_grid
+    from solve_cache import get_default_cache
+    
+    def progress(finished):
+        job.publish(advance=finished - job.completed)
+    
+    return compute_sensitivity_grid(
+        work_df, budgets, [axis], cache=get_default_cache(), on_progress=progress, stop_event=job.stop_event
+    )
+
+def render_grid_progress(snapshot):
+    """Show the progress bar of a running grid analysis."""
+    if snapshot['state'] == 'queued':
+        st.caption("Waiting for a free solver...")
+    else:
+        st.progress(snapshot['progress'], text=f"Finished {snapshot['completed']} of {snapshot['total']} grid cells")
+
+def render_grid_heatmap(grid):
+    """Heatmap of the priority value, or of one scaled work type's units, over the grid."""
+    axis = grid['axes'][0]
+    shown = st.selectbox(
+        "Show", ["Priority Value"] + [f"Units of {name}" for name in grid['unit_names']], key='grid_shown'
+    )
+    if shown == "Priority Value":
+        values = grid['objective_value']
+    else:
+        values = grid['units'][..., grid['unit_names'].index(shown[len("Units of "):])]
+    
+    fig = go.Figure(go.Heatmap(
+        x=grid['budgets'],
+        y=axis['multipliers'],
+        z=values,
+        colorscale='Viridis',
+        colorbar=dict(title=shown),
+        hovertemplate='Budget: $%{x:,.0f}<br>Multiplier: %{y:.2f}<br>' + shown + ': %{z:,.2f}<extra></extra>'
+    ))
+    fig.update_layout(
+        title=f"{shown} by Budget and {axis['parameter'].title()} Multiplier",
+        xaxis_title='Budget ($)',
+        yaxis_title=f"{axis['parameter'].title()} Multiplier ({', '.join(axis['work_types'])})"
+    )
+    st.plotly_chart(fig, use_container_width=True)
+    
+    stats = grid['stats']
+    st.caption(
+        f"{stats['cells']} cells from {stats['frontier_passes']} frontier passes and {stats['solves']} "
+        f"single-budget solves; {stats['reused']} cells reused a neighbour's proven optimum "
+        f"({stats['timings']['total']:.2f}s)"
+    )
+
+def run_frontier(job, work_df, budget_max):
+    """Job function: compute the exact budget frontier."""
+    from optimization import compute_budget_frontier
+    
+    return compute_budget_frontier(work_df, budget_max)
+
+def run_sweep(job, work_df, budget_base, steps, engine, workers, chunksize):
+    """
+    Job function: solve the sampled budget points, publishing each row.
+    
+    Returns:
+        pd.DataFrame: Rows solved before the sweep finished or was cancelled
+    """
+    from optimization import iter_sensitivity
+    from solve_cache import get_default_cache
+    
+    rows = iter_sensitivity(work_df, budget_base, steps, engine, workers, chunksize, cache=get_default_cache())
+    try:
+        for row in rows:
+            job.publish(row)
+            if job.cancelled:
+                break
+    finally:
+        rows.close()
+    return pd.DataFrame(job.partial)
+
+def render_sweep_progress(snapshot):
+    """Show the progress bar and the chart of the budget points solved so far."""
+    if snapshot['state'] == 'queued':
+        st.caption("Waiting for a free solver...")
+    elif snapshot['total']:
+        st.progress(snapshot['progress'], text=f"Solved {snapshot['completed']} of {snapshot['total']} budget points")
+    else:
+        st.caption(f"Computing the budget frontier... {snapshot['elapsed']:.1f}s elapsed")
+    
+    if snapshot['partial']:
+        st.plotly_chart(sampled_sensitivity_figure(pd.DataFrame(snapshot['partial'])), use_container_width=True)
+
+def sampled_sensitivity_figure(sensitivity_results):
+    """Build the chart for sensitivity results sampled at fixed budgets."""
+    # Plot results
+    fig = go.Figure()
+    
+    fig.add_trace(go.Scatter(
+        x=sensitivity_results['budget'],
+        y=sensitivity_results['objective_value'],
+        mode='lines+markers',
+        name='Priority Value',
+        line=dict(color='blue')
+    ))
+    
+    # Add a secondary y-axis for budget utilization
+    fig.add_trace(go.Scatter(
+        x=sensitivity_results['budget'],
+        y=sensitivity_results['budget_utilization'] * 100,  # Convert to percentage
+        mode='lines+markers',
+        name='Budget Utilization (%)',
+        line=dict(color='green'),
+        yaxis='y2'
+    ))
+    
+    fig.update_layout(**sensitivity_layout())
+    
+    return fig
+
+def render_sampled_table(sensitivity_results):
+    """Render the table of sampled sensitivity results."""
+    # Show data table
+    st.subheader("Detailed Results")
+    display_df = sensitivity_results.copy()
+    display_df['budget'] = display_df['budget'].map('${:,.2f}'.format)
+    display_df['budget_utilization'] = (display_df['budget_utilization'] * 100).map('{:.1f}%'.format)
+    display_df.columns = ['Budget', 'Priority Value', 'Budget Utilization']
+    st.dataframe(display_df)
+
+def render_budget_frontier(frontier, work_df, budget_min, budget_max, budget_base):
+    """Render the exact step curve of priority value against budget."""
+    from charts import line_trace
+    from optimization import frontier_lookup
+    
+    budgets = frontier['budget']
+    first = max(int(np.searchsorted(budgets, budget_min, side='right')) - 1, 0)
+    last = int(np.searchsorted(budgets, budget_max, side='right'))
+    
+    if last <= first:
+        st.warning("The minimum required units cannot be funded within this budget range.")
+        return
+    
+    breakpoints = pd.DataFrame({
+        'budget': budgets[first:last],
+        'objective_value': frontier['objective_value'][first:last],
+        'total_cost': frontier['total_cost'][first:last]
+    })
+    
+    # Extend the curve flat to both ends of the budget range
+    curve_budget = np.concatenate(([max(budget_min, budgets[first])], budgets[first + 1:last], [budget_max]))
+    curve_value = np.concatenate((breakpoints['objective_value'], breakpoints['objective_value'].iloc[-1:]))
+    
+    fig = go.Figure()
+    
+    # A frontier can have many thousands of breakpoints; only those a chart
+    # this wide can show are sent
+    fig.add_trace(line_trace(
+        curve_budget,
+        curve_value,
+        mode='lines',
+        line_shape='hv',
+        name='Priority Value',
+        line=dict(color='blue')
+    ))
+    
+    # Utilization of each optimal allocation at the budget where it becomes affordable
+    fig.add_trace(line_trace(
+        breakpoints['budget'],
+        breakpoints['total_cost'] / breakpoints['budget'].clip(lower=1e-9) * 100,
+        mode='lines',
+        name='Budget Utilization (%)',
+        line=dict(color='green'),
+        yaxis='y2'
+    ))
+    
+    fig.update_layout(**sensitivity_layout())
+    
+    st.plotly_chart(fig, use_container_width=True)
+    
+    # Inspect the optimal allocation at any budget in the range
+    st.subheader("Allocation at Budget")
+    inspect_budget = st.slider(
+        "Budget ($)",
+        min_value=float(budget_min),
+        max_value=float(budget_max),
+        value=float(budget_base)
+    )
+    result = frontier_lookup(frontier, inspect_budget)
+    
+    if result['status'] == 'Optimal':
+        allocation_df = pd.DataFrame({
+            'Work Type': work_df['name'],
+            'Units Allocated': result['allocation'],
+            'Cost': np.asarray(result['allocation']) * work_df['cost'].to_numpy()
+        })
+        st.metric("Priority Value", f"{result['objective_value']:,.2f}")
+        st.dataframe(allocation_df)
+    else:
+        st.warning("The minimum required units cannot be funded at this budget.")
+    
+    # Show data table
+    st.subheader("Breakpoints")
+    display_df = pd.DataFrame({
+        'Budget': breakpoints['budget'].map('${:,.2f}'.format),
+        'Priority Value': breakpoints['objective_value'],
+        'Total Cost': breakpoints['total_cost'].map('${:,.2f}'.format),
+        'Budget Utilization': (breakpoints['total_cost'] / breakpoints['budget'].clip(lower=1e-9) * 100).map('{:.1f}%'.format)
+    })
+    st.dataframe(display_df)
+
+def sensitivity_layout():
+    """Shared layout for the budget sensitivity charts."""
+    return dict(
+        title='Budget Sensitivity Analysis',
+        xaxis_title='Budget ($)',
+        yaxis_title='Priority Value',
+        yaxis2=dict(
+            title='Budget Utilization (%)',
+            titlefont=dict(color='green'),
+            tickfont=dict(color='green'),
+            anchor='x',
+            overlaying='y',
+            side='right'
+        ),
+        legend=dict(
+            orientation="h",
+            yanchor="bottom",
+            y=1.02,
+            xanchor="right",
+            x=1
+        )
+    )
 
 def render_scenario_comparison():
     """Render a scenario comparison tool that allows comparing different work mixes."""
     st.title("Scenario Comparison")
     
-    if 'scenarios' not in st.session_state:
-        st.session_state.scenarios = {}
+    store = session_store(st.session_state)
     
     # Current scenario section
     st.subheader("Current Scenario")
     
-    if 'results' in st.session_state and st.session_state.results and 'work_types' in st.session_state:
-        results_df = pd.DataFrame({
-            'Work Type': [w['name'] for w in st.session_state.work_types],
-            'Units Allocated': st.session_state.results['allocation'],
-            'Cost': [u * w['cost'] for u, w in zip(st.session_state.results['allocation'], st.session_state.work_types)]
-        })
+    table = session_table(st.session_state)
+    if 'results' in st.session_state and st.session_state.results and len(table) > 0:
+        results_df = table.allocation_frame(st.session_state.results['allocation'])
         
         st.dataframe(results_df)
         
-        scenario_name = st.text_input("Scenario Name", "Scenario " + str(len(st.session_state.scenarios) + 1))
+        scenario_name = st.text_input("Scenario Name", "Scenario " + str(len(store) + 1))
         
         if st.button("Save Current Scenario"):
-            st.session_state.scenarios[scenario_name] = {
-                'data': results_df.copy(),
-                'total_cost': results_df['Cost'].sum(),
-                'objective_value': st.session_state.results['objective_value']
-            }
+            store.save(
+                scenario_name,
+                table.frame(),
+                st.session_state.results['allocation'],
+                st.session_state.results['objective_value']
+            )
             st.success(f"Saved scenario: {scenario_name}")
     else:
         st.info("Run an optimization on the main page to create a scenario for comparison.")
     
     # Scenarios comparison section
-    if st.session_state.scenarios:
+    scenario_names = store.names()
+    if scenario_names:
         st.subheader("Compare Scenarios")
         
         scenarios_to_compare = st.multiselect(
             "Select Scenarios to Compare",
-            options=list(st.session_state.scenarios.keys()),
-            default=list(st.session_state.scenarios.keys())
+            options=scenario_names,
+            default=scenario_names
         )
         
         if scenarios_to_compare:
-            # Create comparison metrics
-            metrics_df = pd.DataFrame({
-                'Scenario': scenarios_to_compare,
-                'Total Cost': [st.session_state.scenarios[s]['total_cost'] for s in scenarios_to_compare],
-                'Priority Value': [st.session_state.scenarios[s]['objective_value'] for s in scenarios_to_compare]
-            })
+            # Metrics come straight from the stored allocation arrays
+            metrics_df = store.metrics(scenarios_to_compare)
             
             st.dataframe(metrics_df)
             
             # Create comparison chart
-            fig = go.Figure()
-            
-            for scenario in scenarios_to_compare:
-                scenario_data = st.session_state.scenarios[scenario]['data']
-                
-                fig.add_trace(go.Bar(
-                    name=scenario,
-                    x=scenario_data['Work Type'],
-                    y=scenario_data['Units Allocated'],
-                    text=scenario_data['Cost'].map('${:,.2f}'.format),
-                    textposition='auto'
-                ))
-            
-            fig.update_layout(
-                title='Work Allocation Comparison by Scenario',
-                xaxis_title='Work Type',
-                yaxis_title='Units Allocated',
-                barmode='group',
-                legend=dict(
-                    orientation="h",
-                    yanchor="bottom",
-                    y=1.02,
-                    xanchor="right",
-                    x=1
-                )
-            )
-            
+            fig = allocation_comparison_figure(store.allocation_frame(scenarios_to_compare))
             st.plotly_chart(fig, use_container_width=True)
             
             # Option to delete scenarios
-            to_delete = st.multiselect("Select Scenarios to Delete", options=list(st.session_state.scenarios.keys()))
+            to_delete = st.multiselect("Select Scenarios to Delete", options=scenario_names)
             
             if to_delete and st.button("Delete Selected Scenarios"):
-                for scenario in to_delete:
-                    if scenario in st.session_state.scenarios:
-                        del st.session_state.scenarios[scenario]
+                store.delete(to_delete)
                 st.success("Deleted selected scenarios")
                 st.experimental_rerun()
     else:
-        st.info("Save scenarios to enable comparison.")
\ No newline at end of file
+        st.info("Save scenarios to enable comparison.")
+
+def allocation_comparison_figure(allocations):
+    """
+    Grouped bar chart of units allocated per work type, one group per scenario.
+    
+    Work types beyond the charts.TOP_N with the most cost are summed into
+    "Other", and the figure is cached by the allocations it shows.
+    
+    Args:
+        allocations (pd.DataFrame): Scenario, Work Type, Units Allocated and
+            Cost (see ScenarioStore.allocation_frame)
+    """
+    from charts import cached_figure, comparison_frame, figure_key
+    
+    key = figure_key(
+        'comparison', allocations['Scenario'], allocations['Work Type'],
+        allocations['Units Allocated'], allocations['Cost']
+    )
+    return cached_figure(key, lambda: _comparison_figure(comparison_frame(allocations)))
+
+def _comparison_figure(allocations):
+    fig = go.Figure()
+    
+    for scenario, scenario_data in allocations.groupby('Scenario', sort=False):
+        fig.add_trace(go.Bar(
+            name=scenario,
+            x=scenario_data['Work Type'],
+            y=scenario_data['Units Allocated'],
+            text=scenario_data['Cost'].map('${:,.2f}'.format),
+            textposition='auto'
+        ))
+    
+    fig.update_layout(
+        title='Work Allocation Comparison by Scenario',
+        xaxis_title='Work Type',
+        yaxis_title='Units Allocated',
+        barmode='group',
+        legend=dict(
+            orientation="h",
+            yanchor="bottom",
+            y=1.02,
+            xanchor="right",
+            x=1
+        )
+    )
+    return fig
+
+def render_robustness_analysis():
+    """Render a page that tests allocations against sampled unit cost overruns."""
+    from jobs import ensure_job
+    from main import SOLVE_MODES, watch_job
+    from robustness import DISTRIBUTIONS, sample_costs, scenario_totals, summarize_resolves, summarize_totals
+    
+    st.title("Robustness Analysis")
+    
+    table = session_table(st.session_state)
+    if len(table) == 0:
+        st.warning("Please add work types on the main page before running robustness analysis.")
+        return
+    
+    work_df = table.frame()
+    
+    total_budget = st.number_input("Budget ($)", min_value=0, value=1000000, step=10000)
+    
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        distribution = st.selectbox(
+            "Cost Distribution", DISTRIBUTIONS,
+            help="Work types with their own cost_distribution and cost_spread keep them"
+        )
+    with col2:
+        spread = st.slider("Cost Spread (%)", min_value=0, max_value=100, value=10) / 100
+    with col3:
+        n_samples = st.number_input("Cost Scenarios", min_value=100, max_value=100000, value=2000, step=100)
+    seed = st.number_input("Random Seed", min_value=0, value=0)
+    
+    sample_key = (table.version, distribution, spread, n_samples, seed)
+    
+    # Allocations to test: the last optimization and saved scenarios of the same work types
+    names, allocations = candidate_allocations(work_df)
+    
+    st.subheader("Allocation Robustness")
+    if not names:
+        st.info("Run an optimization on the main page or save scenarios to test their allocations.")
+    elif st.button("Evaluate Allocations"):
+        cost_samples = sample_costs(work_df, n_samples, distribution, spread, seed)
+        totals = scenario_totals(allocations, cost_samples)
+        metrics = summarize_totals(names, totals, total_budget)
+        metrics.insert(1, 'Priority Value', allocations @ work_df['priority'].to_numpy(dtype=float))
+        st.session_state.robustness = {
+            'key': (sample_key, total_budget, tuple(names)),
+            'metrics': metrics,
+            'totals': totals
+        }
+    
+    stored = st.session_state.get('robustness')
+    if stored and stored['key'] == (sample_key, total_budget, tuple(names)):
+        st.dataframe(stored['metrics'].style.format({
+            'Priority Value': '{:,.2f}',
+            'Expected Cost': '${:,.0f}',
+            'Cost P95': '${:,.0f}',
+            'Overrun Probability': '{:.1%}',
+            'Expected Shortfall': '${:,.0f}',
+            'Tail Cost': '${:,.0f}'
+        }))
+        st.plotly_chart(total_cost_figure(names, stored['totals'], total_budget), use_container_width=True)
+    
+    # Re-optimizing every scenario shows how the best allocation itself moves
+    st.subheader("Re-optimize per Cost Scenario")
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        solve_mode = st.radio("Solve Mode", list(SOLVE_MODES), key='robustness_solve_mode')
+    with col2:
+        n_resolves = st.number_input(
+            "Scenarios to Re-optimize", min_value=1, max_value=int(n_samples), value=min(200, int(n_samples))
+        )
+    with col3:
+        workers = st.number_input(
+            "Parallel Workers",
+            min_value=1,
+            max_value=max(os.cpu_count() or 1, 1),
+            value=1,
+            key='robustness_workers'
+        )
+    
+    resolve_key = (sample_key, total_budget, n_resolves, solve_mode)
+    if st.button("Re-optimize"):
+        ensure_job(
+            st.session_state, 'robustness_job', resolve_key, run_resolves,
+            work_df, total_budget, n_resolves, distribution, spread, seed, SOLVE_MODES[solve_mode], workers,
+            total=n_resolves
+        )
+    
+    if 'robustness_job' in st.session_state:
+        job = st.session_state.robustness_job
+        watch_job(job, render_resolve_progress, "Cancel Re-optimization", 'cancel_robustness')
+        del st.session_state.robustness_job
+        
+        if job.error is not None:
+            st.error(f"Re-optimization failed: {str(job.error)}")
+        elif job.result is not None:
+            st.session_state.robustness_resolves = {'key': job.key, 'result': job.result, 'complete': job.state == 'done'}
+    
+    stored = st.session_state.get('robustness_resolves')
+    if stored and stored['key'] == resolve_key and stored['result']:
+        if not stored['complete']:
+            st.info("Re-optimization cancelled; showing the scenarios solved before it stopped.")
+        render_resolve_summary(work_df, summarize_resolves(work_df, stored['result']), names, allocations)
+
+def candidate_allocations(work_df):
+    """
+    Allocations of the current work types to test for robustness.
+    
+    Returns:
+        tuple: (names, allocation matrix of shape allocations x work types)
+            for the last optimization result and every saved scenario with
+            the same work types
+    """
+    names, rows = [], []
+    results = st.session_state.get('results')
+    if results and results.get('allocation') is not None and len(results['allocation']) == len(work_df):
+        names.append("Current Allocation")
+        rows.append(np.asarray(results['allocation'], dtype=float))
+    
+    store = session_store(st.session_state)
+    work_type_names = list(work_df['name'])
+    for group_names, baseline, matrix in store.allocations(store.names()):
+        if list(baseline['names']) == work_type_names:
+            names += group_names
+            rows += list(matrix.astype(float))
+    
+    return names, np.array(rows).reshape(len(rows), len(work_df))
+
+def run_resolves(job, work_df, total_budget, n_resolves, distribution, spread, seed, engine, workers):
+    """
+    Job function: re-optimize the first cost scenarios, publishing each result.
+    
+    Returns:
+        list: Results solved before the job finished or was cancelled
+    """
+    from robustness import iter_resolves, sample_costs
+    
+    cost_samples = sample_costs(work_df, n_resolves, distribution, spread, seed)
+    results = iter_resolves(work_df, total_budget, cost_samples, engine, workers)
+    try:
+        for result in results:
+            job.publish(result)
+            if job.cancelled:
+                break
+    finally:
+        results.close()
+    return list(job.partial)
+
+def render_resolve_progress(snapshot):
+    """Show the progress bar of a running re-optimization."""
+    if snapshot['state'] == 'queued':
+        st.caption("Waiting for a free solver...")
+    else:
+        st.progress(snapshot['progress'], text=f"Re-optimized {snapshot['completed']} of {snapshot['total']} cost scenarios")
+
+def render_resolve_summary(work_df, summary, names, allocations):
+    """Show how re-optimized allocations vary and compare their mean with the current allocation."""
+    objective_values = summary['objective_values']
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Scenarios Re-optimized", len(objective_values))
+    col2.metric("Mean Priority Value", f"{objective_values.mean():,.2f}")
+    col3.metric("Priority Value P5-P95", f"{np.percentile(objective_values, 5):,.0f} - {np.percentile(objective_values, 95):,.0f}")
+    
+    st.dataframe(summary['work_types'].style.format({
+        'Mean Units': '{:,.1f}',
+        'Units P5': '{:,.0f}',
+        'Units P95': '{:,.0f}',
+        'Funded Share': '{:.0%}'
+    }))
+    
+    # Same chart as Scenario Comparison, with the mean re-optimized allocation as a scenario
+    costs = work_df['cost'].to_numpy(dtype=float)
+    compared = [("Re-optimized (mean)", summary['mean_allocation'])]
+    if "Current Allocation" in names:
+        compared.insert(0, ("Current Allocation", allocations[names.index("Current Allocation")]))
+    frame = pd.concat([
+        pd.DataFrame({
+            'Scenario': name,
+            'Work Type': work_df['name'],
+            'Units Allocated': allocation,
+            'Cost': allocation * costs
+        })
+        for name, allocation in compared
+    ], ignore_index=True)
+    st.plotly_chart(allocation_comparison_figure(frame), use_container_width=True)
+
+def total_cost_figure(names, totals, total_budget):
+    """Distribution of each allocation's total cost over the cost scenarios, with the budget marked."""
+    from charts import histogram_traces
+    
+    fig = go.Figure()
+    
+    # Binned here, so the chart carries 60 bars per allocation rather than every cost scenario
+    for trace in histogram_traces(names, totals, bins=60, opacity=0.6):
+        fig.add_trace(trace)
+    fig.add_vline(x=total_budget, line_dash='dash', line_color='red', annotation_text='Budget')
+    
+    fig.update_layout(
+        title='Total Cost over Cost Scenarios',
+        xaxis_title='Total Cost ($)',
+        yaxis_title='Cost Scenarios',
+        barmode='overlay',
+        legend=dict(
+            orientation="h",
+            yanchor="bottom",
+            y=1.02,
+            xanchor="right",
+            x=1
+        )
+    )
+    return fig
+
+def render_multi_period_planning():
+    """Render a page that plans work over several periods, carrying unfunded required work over."""
+    from jobs import ensure_job
+    from main import SOLVE_MODES, watch_job
+    from multi_period import LOOKAHEAD
+    
+    st.title("Multi-Period Planning")
+    
+    table = session_table(st.session_state)
+    if len(table) == 0:
+        st.warning("Please add work types on the main page before planning over several periods.")
+        return
+    
+    work_df = table.frame()
+    
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        n_periods = st.number_input("Periods", min_value=1, max_value=20, value=5)
+    with col2:
+        first_budget = st.number_input("First Period Budget ($)", min_value=0, value=1000000, step=10000)
+    with col3:
+        growth = st.number_input("Budget Change per Period (%)", min_value=-50.0, max_value=50.0, value=0.0, step=0.5)
+    budgets = first_budget * (1 + growth / 100) ** np.arange(n_periods)
+    
+    col1, col2 = st.columns(2)
+    with col1:
+        lookahead = st.slider(
+            "Lookahead (periods)", min_value=1, max_value=10, value=LOOKAHEAD,
+            help="Required work due in this many periods that their budgets cannot fund is done earlier"
+        )
+    with col2:
+        solve_mode = st.radio("Solve Mode", list(SOLVE_MODES), horizontal=True, key='plan_solve_mode')
+    st.caption(
+        "Each period requires the minimum units of every work type again. Units a period cannot fund carry "
+        "over as backlog; a `window` column gives the periods a work type's required units may take (default 1)."
+    )
+    
+    plan_key = (table.version, tuple(budgets), lookahead, solve_mode)
+    if st.button("Plan Horizon"):
+        ensure_job(
+            st.session_state, 'plan_job', plan_key, run_plan,
+            work_df, budgets, SOLVE_MODES[solve_mode], lookahead, total=len(budgets)
+        )
+    
+    if 'plan_job' in st.session_state:
+        job = st.session_state.plan_job
+        watch_job(job, render_plan_progress, "Stop Planning", 'cancel_plan')
+        del st.session_state.plan_job
+        
+        if job.error is not None:
+            st.error(f"Planning failed: {str(job.error)}")
+        elif job.result is not None:
+            st.session_state.plan = {'key': job.key, 'result': job.result}
+    
+    stored = st.session_state.get('plan')
+    if stored and stored['key'] == plan_key:
+        render_plan(work_df, stored['result'])
+    
+    # What-if horizons with every budget scaled alike, planned in parallel
+    st.subheader("Horizon Budget Sensitivity")
+    col1, col2 = st.columns(2)
+    with col1:
+        steps = st.slider("Budget Levels", min_value=3, max_value=50, value=10, key='plan_steps')
+    with col2:
+        workers = st.number_input(
+            "Parallel Workers",
+            min_value=1,
+            max_value=max(os.cpu_count() or 1, 1),
+            value=1,
+            help="Plan budget levels in this many worker processes",
+            key='plan_workers'
+        )
+    
+    sweep_key = (plan_key, steps)
+    if st.button("Run Horizon Sensitivity"):
+        ensure_job(
+            st.session_state, 'plan_sensitivity_job', sweep_key, run_horizon_sensitivity,
+            work_df, budgets, steps, SOLVE_MODES[solve_mode], lookahead, workers, total=steps
+        )
+    
+    if 'plan_sensitivity_job' in st.session_state:
+        job = st.session_state.plan_sensitivity_job
+        watch_job(job, render_sweep_progress, "Cancel Analysis", 'cancel_plan_sensitivity')
+        del st.session_state.plan_sensitivity_job
+        
+        if job.error is not None:
+            st.error(f"Horizon sensitivity failed: {str(job.error)}")
+        elif job.result is not None:
+            st.session_state.plan_sensitivity = {'key': job.key, 'result': job.result, 'complete': job.state == 'done'}
+    
+    stored = st.session_state.get('plan_sensitivity')
+    if stored and stored['key'] == sweep_key and len(stored['result']) > 0:
+        if not stored['complete']:
+            st.info("Analysis cancelled; showing the budget levels planned before it stopped.")
+        st.caption("Budgets are totals over the horizon, with every period's budget scaled alike.")
+        st.plotly_chart(sampled_sensitivity_figure(stored['result']), use_container_width=True)
+        render_sampled_table(stored['result'])
+
+def run_plan(job, work_df, budgets, engine, lookahead):
+    """Job function: plan the horizon, publishing progress by periods."""
+    from multi_period import plan_horizon
+    
+    def progress(planned):
+        job.publish(advance=planned - job.completed)
+    
+    return plan_horizon(work_df, budgets, engine, lookahead, on_progress=progress, stop_event=job.stop_event)
+
+def run_horizon_sensitivity(job, work_df, budgets, steps, engine, lookahead, workers):
+    """
+    Job function: plan the horizon at each budget level, publishing each row.
+    
+    Returns:
+        pd.DataFrame: Rows planned before the job finished or was cancelled
+    """
+    from multi_period import horizon_sensitivity
+    
+    rows = horizon_sensitivity(work_df, budgets, steps, engine, lookahead, workers)
+    try:
+        for row in rows:
+            job.publish(row)
+            if job.cancelled:
+                break
+    finally:
+        rows.close()
+    return pd.DataFrame(job.partial)
+
+def render_plan_progress(snapshot):
+    """Show the progress bar of a running horizon plan."""
+    if snapshot['state'] == 'queued':
+        st.caption("Waiting for a free solver...")
+    else:
+        st.progress(snapshot['progress'], text=f"Planned {snapshot['completed']} of {snapshot['total']} periods")
+
+def render_plan(work_df, plan):
+    """Show a horizon plan by period, and save its periods as scenarios."""
+    from charts import group_labels
+    from multi_period import save_plan_scenarios
+    
+    summary = plan['summary']
+    if plan['status'] == 'Infeasible':
+        st.warning(
+            f"{summary['Overdue Units'].max():,} required units could not be funded within their window; "
+            "they are carried over as overdue work."
+        )
+    
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Total Priority Value", f"{plan['objective_value']:,.2f}")
+    col2.metric("Total Spend", f"${summary['Spend'].sum():,.0f}")
+    col3.metric("Open Backlog After Horizon", f"{int(plan['backlog'].sum()):,} units")
+    
+    st.dataframe(summary.style.format({
+        'Budget': '${:,.0f}',
+        'Spend': '${:,.0f}',
+        'Priority Value': '{:,.2f}'
+    }))
+    
+    fig = go.Figure()
+    fig.add_trace(go.Bar(x=summary['Period'], y=summary['Budget'], name='Budget', opacity=0.4))
+    fig.add_trace(go.Bar(x=summary['Period'], y=summary['Spend'], name='Spend'))
+    fig.add_trace(go.Scatter(
+        x=summary['Period'], y=summary['Priority Value'], name='Priority Value', mode='lines+markers', yaxis='y2'
+    ))
+    fig.update_layout(
+        title='Budget, Spend and Priority Value by Period',
+        xaxis_title='Period',
+        yaxis_title='Amount ($)',
+        yaxis2=dict(title='Priority Value', anchor='x', overlaying='y', side='right'),
+        barmode='overlay',
+        legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1)
+    )
+    st.plotly_chart(fig, use_container_width=True)
+    
+    # Units by period; large portfolios show their costliest work types plus "Other"
+    allocations = plan['allocations']
+    spend = (allocations * work_df['cost'].to_numpy(dtype=float)).sum(axis=0)
+    units = pd.DataFrame(allocations.T, columns=[f"P{t + 1}" for t in range(len(allocations))])
+    units.insert(0, 'Work Type', group_labels(work_df['name'], spend))
+    st.subheader("Units by Period")
+    st.dataframe(units.groupby('Work Type', sort=False).sum())
+    
+    prefix = st.text_input("Scenario Name Prefix", "Plan")
+    if st.button("Save Periods as Scenarios"):
+        names = save_plan_scenarios(session_store(st.session_state), work_df, plan, prefix)
+        st.success(f"Saved {len(names)} scenarios for Scenario Comparison and Robustness Analysis")
\ No newline at end of file
@@ -1,19 +1,20 @@
+import importlib
+
 import streamlit as st
-from advanced_features import render_sensitivity_analysis, render_scenario_comparison
-from import_export import render_import_export
 
 # Setup page config first - must be the first Streamlit command
 st.set_page_config(page_title="Utility Work Planner", layout="wide")
 
-# Import main after set_page_config to avoid the error
-from main import main as main_page
-
-# Define the pages
+# Define the pages as (module, function). A page's module is imported only
+# when the page is first shown, so no page pays for another's solver and
+# chart libraries
 PAGES = {
-    "Work Optimization": main_page,
-    "Sensitivity Analysis": render_sensitivity_analysis,
-    "Scenario Comparison": render_scenario_comparison,
-    "Import/Export Data": render_import_export
+    "Work Optimization": ('main', 'main'),
+    "Sensitivity Analysis": ('advanced_features', 'render_sensitivity_analysis'),
+    "Scenario Comparison": ('advanced_features', 'render_scenario_comparison'),
+    "Robustness Analysis": ('advanced_features', 'render_robustness_analysis'),
+    "Multi-Period Planning": ('advanced_features', 'render_multi_period_planning'),
+    "Import/Export Data": ('import_export', 'render_import_export')
 }
 
 # Sidebar navigation
@@ -21,7 +22,8 @@ st.sidebar.title("Navigation")
 selection = st.sidebar.radio("Go to", list(PAGES.keys()))
 
 # Display the selected page
-PAGES[selection]()
+module, function = PAGES[selection]
+getattr(importlib.import_module(module), function)()
 
 # Footer
 st.sidebar.markdown("---")
@@ -0,0 +1,266 @@
+"""
+Headless batch solving of many portfolios.
+
+This module must not import streamlit or plotly, so nightly jobs can run
+it on hosts without the UI dependencies.
+"""
+import csv
+import json
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import numpy as np
+import pandas as pd
+
+from multi_resource import optimize_multi_resource
+from optimization import optimize_work_allocation
+
+CSV_FIELDS = ['id', 'status', 'budget', 'objective_value', 'total_cost', 'seconds', 'error', 'allocation']
+
+def iter_portfolios(source):
+    """
+    Yield the portfolios in a directory, file or JSON-lines stream.
+    
+    Portfolios have the shape of data/example_data.json: a `work_types`
+    list and a `budget`. A directory is read file by file in name order.
+    `.json` files hold one portfolio; `.jsonl` files and standard input
+    (`-`) hold one portfolio per line.
+    
+    Args:
+        source (str): Directory, file path, or '-' for standard input
+    
+    Yields:
+        tuple: (portfolio_id, portfolio dict)
+    """
+    if source == '-':
+        yield from _iter_json_lines(sys.stdin, 'stdin')
+    elif os.path.isdir(source):
+        for filename in sorted(os.listdir(source)):
+            if filename.endswith(('.json', '.jsonl')):
+                yield from iter_portfolios(os.path.join(source, filename))
+    elif source.endswith('.jsonl'):
+        with open(source) as f:
+            yield from _iter_json_lines(f, os.path.splitext(os.path.basename(source))[0])
+    else:
+        with open(source) as f:
+            portfolio = json.load(f)
+        yield str(portfolio.get('id', os.path.splitext(os.path.basename(source))[0])), portfolio
+
+def _iter_json_lines(lines, prefix):
+    for line_number, line in enumerate(lines, start=1):
+        if line.strip():
+            portfolio = json.loads(line)
+            yield str(portfolio.get('id', f"{prefix}:{line_number}")), portfolio
+
+def solve_portfolio(portfolio_id, portfolio, budget=None, engine='auto', time_limit=None, mip_gap=None):
+    """
+    Solve one portfolio and summarize the result as an output record.
+    
+    Errors are reported in the record instead of raised, so one bad
+    portfolio does not stop the batch.
+    
+    Args:
+        portfolio_id (str): Identifier written to the output
+        portfolio (dict): Portfolio with `work_types` and `budget`, or with
+            `limits` and optionally `region_limits` to solve under several
+            resources (see multi_resource.optimize_multi_resource)
+        budget (float): Budget overriding the portfolio's own
+        engine (str): Solver engine (see optimize_work_allocation)
+        time_limit (float): Seconds per portfolio before the best allocation
+            found so far is kept
+        mip_gap (float): Relative optimality gap at which to stop
+    
+    Returns:
+        dict: Output record
+    """
+    start = time.perf_counter()
+    record = {'id': portfolio_id}
+    
+    try:
+        work_df = pd.DataFrame(portfolio['work_types'])
+        if 'limits' in portfolio:
+            limits = dict(portfolio['limits'])
+            if budget is not None:
+                limits['cost'] = budget
+            total_budget = limits.get('cost')
+            result = optimize_multi_resource(
+                work_df, limits, portfolio.get('region_limits'), time_limit=time_limit, mip_gap=mip_gap
+            )
+            record['resource_usage'] = result['resource_usage']
+        else:
+            total_budget = float(budget if budget is not None else portfolio['budget'])
+            result = optimize_work_allocation(work_df, total_budget, engine=engine, time_limit=time_limit, mip_gap=mip_gap)
+        
+        record.update({
+            'status': result['status'],
+            'budget': total_budget,
+            'objective_value': result['objective_value'],
+            'total_cost': float(np.dot(result['allocation'], work_df['cost'].to_numpy(dtype=float))),
+            'allocation': result['allocation'],
+            'stats': result['stats']
+        })
+    except Exception as e:
+        record.update({'status': 'Error', 'error': str(e)})
+    
+    record['seconds'] = time.perf_counter() - start
+    return record
+
+class JsonlWriter:
+    """Append output records to a JSON-lines file, one flushed line each."""
+    
+    def __init__(self, path):
+        self.file = open(path, 'a')
+    
+    def write(self, record):
+        self.file.write(json.dumps(record) + '\n')
+        self.file.flush()
+    
+    def close(self):
+        self.file.close()
+
+class CsvWriter:
+    """Append output records to a CSV file, one flushed row each (without stats)."""
+    
+    def __init__(self, path):
+        new_file = not os.path.exists(path) or os.path.getsize(path) == 0
+        self.file = open(path, 'a', newline='')
+        self.writer = csv.DictWriter(self.file, fieldnames=CSV_FIELDS, extrasaction='ignore')
+        if new_file:
+            self.writer.writeheader()
+    
+    def write(self, record):
+        row = dict(record)
+        if 'allocation' in row:
+            row['allocation'] = json.dumps(row['allocation'])
+        self.writer.writerow(row)
+        self.file.flush()
+    
+    def close(self):
+        self.file.close()
+
+def completed_ids(path, output_format):
+    """
+    Read the ids already written to an output file, for resuming.
+    
+    Records that ended in an error are not counted, so they are retried.
+    A partially written last line from an interrupted run is ignored.
+    """
+    if not os.path.exists(path):
+        return set()
+    
+    done = set()
+    with open(path, newline='') as f:
+        if output_format == 'csv':
+            records = csv.DictReader(f)
+        else:
+            records = (_parse_line(line) for line in f)
+        for record in records:
+            if record and record.get('status') not in (None, '', 'Error'):
+                done.add(str(record['id']))
+    return done
+
+def _drop_partial_line(path):
+    """Cut off a last line left half-written by an interrupted run."""
+    if not os.path.exists(path):
+        return
+    with open(path, 'rb+') as f:
+        data = f.read()
+        if data and not data.endswith(b'\n'):
+            f.truncate(data.rfind(b'\n') + 1)
+
+def _parse_line(line):
+    try:
+        return json.loads(line)
+    except json.JSONDecodeError:
+        return None
+
+def run_batch(source, output, output_format=None, workers=None, budget=None, engine='auto', resume=False, report_every=5.0, log=sys.stderr, time_limit=None, mip_gap=None):
+    """
+    Solve every portfolio from a source and stream the results to a file.
+    
+    Portfolios are solved on a process pool with a bounded number in
+    flight, and each result is written as soon as it finishes.
+    
+    Args:
+        source (str): Directory, file path, or '-' for standard input
+        output (str): Output file (.jsonl or .csv)
+        output_format (str): 'jsonl' or 'csv' (default from the file extension)
+        workers (int): Worker processes (default: CPU count)
+        budget (float): Budget overriding each portfolio's own
+        engine (str): Solver engine (see optimize_work_allocation)
+        resume (bool): Skip portfolios already solved in the output file
+        report_every (float): Seconds between progress reports
+        log (file): Stream for progress reports
+        time_limit (float): Seconds per portfolio (see optimize_work_allocation)
+        mip_gap (float): Relative optimality gap at which to stop
+    
+    Returns:
+        dict: Summary with solved, failed and skipped counts, elapsed
+            seconds and throughput in portfolios per second
+    """
+    if output_format is None:
+        output_format = 'csv' if output.endswith('.csv') else 'jsonl'
+    workers = workers or os.cpu_count() or 1
+    
+    if resume:
+        _drop_partial_line(output)
+        done = completed_ids(output, output_format)
+    else:
+        done = set()
+        if os.path.exists(output):
+            os.remove(output)
+    writer = CsvWriter(output) if output_format == 'csv' else JsonlWriter(output)
+    
+    counts = {'solved': 0, 'failed': 0, 'skipped': 0}
+    start = time.perf_counter()
+    last_report = start
+    
+    def record_finished(futures):
+        nonlocal last_report
+        for future in futures:
+            record = future.result()
+            writer.write(record)
+            counts['failed' if record['status'] == 'Error' else 'solved'] += 1
+        now = time.perf_counter()
+        if now - last_report >= report_every:
+            last_report = now
+            _report(counts, now - start, log)
+    
+    pool = ProcessPoolExecutor(max_workers=workers)
+    try:
+        pending = set()
+        for portfolio_id, portfolio in iter_portfolios(source):
+            if portfolio_id in done:
+                counts['skipped'] += 1
+                continue
+            pending.add(pool.submit(solve_portfolio, portfolio_id, portfolio, budget, engine, time_limit, mip_gap))
+            
+            # Keep the input from running far ahead of the workers
+            if len(pending) >= 2 * workers:
+                finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                record_finished(finished)
+        
+        while pending:
+            finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+            record_finished(finished)
+    finally:
+        pool.shutdown(cancel_futures=True)
+        writer.close()
+    
+    elapsed = time.perf_counter() - start
+    summary = dict(counts, seconds=elapsed, throughput=(counts['solved'] + counts['failed']) / elapsed if elapsed > 0 else 0.0)
+    _report(counts, elapsed, log, final=True)
+    return summary
+
+def _report(counts, elapsed, log, final=False):
+    finished = counts['solved'] + counts['failed']
+    rate = finished / elapsed if elapsed > 0 else 0.0
+    prefix = "Finished" if final else "Progress"
+    print(
+        f"{prefix}: {counts['solved']} solved, {counts['failed']} failed, "
+        f"{counts['skipped']} skipped in {elapsed:.1f}s ({rate:.1f} portfolios/s)",
+        file=log,
+        flush=True
+    )
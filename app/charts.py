@@ -0,0 +1,264 @@
+"""
+Chart building that stays small for large portfolios.
+
+A Plotly chart with one bar, slice or trace per work type grows with the
+portfolio, and its JSON is sent to the browser on every rerun. Charts here
+are built from at most a screen's worth of data:
+    - work types beyond the TOP_N largest are summed into one "Other" row,
+      or all of them are summed by category when the work types have a
+      `category` column
+    - line series are decimated to the first, last, lowest and highest
+      point of each of MAX_BUCKETS equal-width buckets, which keeps every
+      step a chart of that width can show, and drawn with WebGL once they
+      have more than WEBGL_POINTS points
+    - histograms are binned here and sent as bars, not as raw samples
+Built figures are cached by a hash of their data, so a rerun showing the
+same result reuses the figure.
+"""
+import hashlib
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+from plotly.colors import qualitative
+
+# Work types shown individually; the rest are summed into "Other"
+TOP_N = 25
+
+# Buckets a line series is decimated to, about one per horizontal pixel
+MAX_BUCKETS = 1000
+
+# Points above which line series use WebGL (Scattergl) traces
+WEBGL_POINTS = 1000
+
+# Built figures kept by figure_key
+FIGURE_CACHE_SIZE = 64
+
+_figures = OrderedDict()
+_figures_lock = threading.Lock()
+
+def figure_key(*parts):
+    """
+    Hash the data a figure is built from.
+    
+    Args:
+        *parts: Arrays, Series or values; arrays are hashed by content
+    
+    Returns:
+        str: Hex digest
+    """
+    digest = hashlib.sha256()
+    for part in parts:
+        if isinstance(part, pd.Series):
+            part = part.to_numpy()
+        if isinstance(part, np.ndarray) and part.dtype != object:
+            digest.update(part.dtype.str.encode())
+            digest.update(np.ascontiguousarray(part).tobytes())
+        elif isinstance(part, (np.ndarray, list, tuple)):
+            digest.update('\x1f'.join(map(str, part)).encode())
+        else:
+            digest.update(repr(part).encode())
+        digest.update(b'\x1e')
+    return digest.hexdigest()
+
+def cached_figure(key, build):
+    """
+    Return the figure cached under `key`, building it on a miss.
+    
+    Figures are shared between reruns and sessions; do not modify them.
+    """
+    with _figures_lock:
+        if key in _figures:
+            _figures.move_to_end(key)
+            return _figures[key]
+    
+    fig = build()
+    with _figures_lock:
+        _figures[key] = fig
+        while len(_figures) > FIGURE_CACHE_SIZE:
+            _figures.popitem(last=False)
+    return fig
+
+def group_labels(names, weights, categories=None, top_n=TOP_N):
+    """
+    Label each work type with the group it is charted in.
+    
+    Args:
+        names (array-like): Work type names
+        weights (array-like): Size of each work type; the top_n largest keep
+            their own name
+        categories (array-like): Category of each work type; if given,
+            work types are grouped by category instead
+        top_n (int): Work types charted on their own
+    
+    Returns:
+        np.ndarray: Chart label of each work type
+    """
+    if categories is not None:
+        return pd.Series(categories).fillna("Uncategorized").astype(str).to_numpy(dtype=object)
+    
+    labels = np.asarray(names, dtype=object).astype(str).astype(object)
+    if len(labels) <= top_n:
+        return labels
+    
+    top = np.zeros(len(labels), dtype=bool)
+    top[np.argsort(-np.asarray(weights, dtype=float), kind='stable')[:top_n]] = True
+    labels[~top] = _other_label(len(labels) - top_n)
+    return labels
+
+def aggregate_allocation(results_df, categories=None, top_n=TOP_N):
+    """
+    Sum a results table into at most top_n + 1 rows.
+    
+    Args:
+        results_df (pd.DataFrame): Work Type, Units Allocated and Cost
+        categories (array-like): Category of each work type, if any
+        top_n (int): Work types charted on their own
+    
+    Returns:
+        pd.DataFrame: Work Type, Units Allocated and Cost per chart group,
+            largest cost first, with the "Other" row last
+    """
+    if categories is None and len(results_df) <= top_n:
+        return results_df[['Work Type', 'Units Allocated', 'Cost']]
+    
+    grouped = pd.DataFrame({
+        'Work Type': group_labels(results_df['Work Type'], results_df['Cost'], categories, top_n),
+        'Units Allocated': results_df['Units Allocated'].to_numpy(),
+        'Cost': results_df['Cost'].to_numpy()
+    }).groupby('Work Type', sort=False, as_index=False).sum()
+    other = (grouped['Work Type'] == _other_label(len(results_df) - top_n)) & (categories is None)
+    return pd.concat([grouped[~other].sort_values('Cost', ascending=False, kind='stable'), grouped[other]], ignore_index=True)
+
+def allocation_figures(results_df, categories=None, top_n=TOP_N):
+    """
+    Bar chart of units and pie chart of cost by work type, for the main page.
+    
+    Args:
+        results_df (pd.DataFrame): Work Type, Units Allocated and Cost
+        categories (array-like): Category of each work type, if any
+        top_n (int): Work types charted on their own
+    
+    Returns:
+        tuple: (units figure, cost figure)
+    """
+    key = figure_key(
+        'allocation', results_df['Work Type'], results_df['Units Allocated'], results_df['Cost'],
+        None if categories is None else list(categories), top_n
+    )
+    return cached_figure(key, lambda: _allocation_figures(aggregate_allocation(results_df, categories, top_n)))
+
+def comparison_frame(allocations, top_n=TOP_N):
+    """
+    Sum a long table of scenario allocations into the top_n work types plus "Other".
+    
+    Args:
+        allocations (pd.DataFrame): Scenario, Work Type, Units Allocated and Cost
+        top_n (int): Work types charted on their own, by total cost over
+            all scenarios
+    
+    Returns:
+        pd.DataFrame: The same columns, one row per scenario and chart group
+    """
+    totals = allocations.groupby('Work Type', sort=False)['Cost'].sum()
+    if len(totals) <= top_n:
+        return allocations
+    
+    labels = dict(zip(totals.index, group_labels(totals.index, totals.to_numpy(), top_n=top_n)))
+    grouped = allocations.assign(**{'Work Type': allocations['Work Type'].map(labels)})
+    return grouped.groupby(['Scenario', 'Work Type'], sort=False, as_index=False)[['Units Allocated', 'Cost']].sum()
+
+def downsample(x, y, buckets=MAX_BUCKETS):
+    """
+    Positions of the points of a line series worth drawing.
+    
+    The x range is cut into equal-width buckets, and the first, last,
+    lowest and highest point of each is kept, so every step or spike that
+    is wider than a bucket survives.
+    
+    Args:
+        x (array-like): Ascending x values
+        y (array-like): y values
+        buckets (int): Number of buckets
+    
+    Returns:
+        np.ndarray: Ascending positions into x and y
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    n = len(x)
+    if n <= 4 * buckets or x[-1] <= x[0]:
+        return np.arange(n)
+    
+    bucket = np.minimum(((x - x[0]) / (x[-1] - x[0]) * buckets).astype(np.int64), buckets - 1)
+    starts = np.flatnonzero(np.concatenate(([True], np.diff(bucket) != 0)))
+    ends = np.append(starts[1:], n) - 1
+    # Buckets are contiguous, so sorting by (bucket, y) puts each bucket's
+    # lowest point at its start and its highest at its end
+    by_value = np.lexsort((y, bucket))
+    return np.unique(np.concatenate((starts, ends, by_value[starts], by_value[ends])))
+
+def line_trace(x, y, buckets=MAX_BUCKETS, **kwargs):
+    """
+    Line trace of a series, decimated with downsample() and drawn with
+    WebGL when it is still long.
+    
+    Args:
+        x (array-like): Ascending x values
+        y (array-like): y values
+        buckets (int): Number of buckets
+        **kwargs: Further go.Scatter arguments
+    
+    Returns:
+        go.Scatter or go.Scattergl
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    keep = downsample(x, y, buckets)
+    trace = go.Scattergl if len(keep) > WEBGL_POINTS else go.Scatter
+    return trace(x=x[keep], y=y[keep], **kwargs)
+
+def histogram_traces(names, samples, bins=60, **kwargs):
+    """
+    Histograms of several sample columns on shared bins, as bar traces.
+    
+    Args:
+        names (list): Trace names, one per column of samples
+        samples (np.ndarray): Samples of shape samples x len(names)
+        bins (int): Number of bins
+        **kwargs: Further go.Bar arguments
+    
+    Returns:
+        list: One go.Bar per name
+    """
+    samples = np.asarray(samples, dtype=float).reshape(-1, len(names))
+    edges = np.histogram_bin_edges(samples, bins=bins)
+    centers = (edges[:-1] + edges[1:]) / 2
+    return [
+        go.Bar(x=centers, y=np.histogram(samples[:, i], bins=edges)[0], width=np.diff(edges), name=name, **kwargs)
+        for i, name in enumerate(names)
+    ]
+
+def _other_label(count):
+    return f"Other ({count} work types)"
+
+def _allocation_figures(aggregated):
+    colors = [qualitative.Plotly[i % len(qualitative.Plotly)] for i in range(len(aggregated))]
+    
+    units = go.Figure(go.Bar(
+        x=aggregated['Work Type'],
+        y=aggregated['Units Allocated'],
+        marker_color=colors
+    ))
+    units.update_layout(title="Allocation of Work Units", xaxis_title='Work Type', yaxis_title='Units Allocated')
+    
+    cost = go.Figure(go.Pie(
+        labels=aggregated['Work Type'],
+        values=aggregated['Cost'],
+        marker=dict(colors=colors),
+        sort=False
+    ))
+    cost.update_layout(title="Cost Distribution")
+    return units, cost
@@ -0,0 +1,190 @@
+"""
+Solve instrumentation: phase timings, CBC statistics and result hooks.
+
+Every optimization result carries a `stats` dict. Callers that want to
+forward these to their own metrics system register a hook:
+    
+    from diagnostics import register_solve_hook
+    
+    @register_solve_hook
+    def send_metrics(result):
+        statsd.timing('solve.total', result['stats']['timings']['total'])
+"""
+import logging
+import re
+import threading
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+_solve_hooks = []
+_context = threading.local()
+
+# Patterns for the summary CBC prints after a solve
+CBC_PATTERNS = {
+    'nodes': re.compile(r"Enumerated nodes:\s+(\d+)"),
+    'iterations': re.compile(r"Total iterations:\s+(\d+)"),
+    'solver_seconds': re.compile(r"Time \(Wallclock seconds\):\s+([\d.]+)"),
+    'mip_gap': re.compile(r"Gap:\s+([\d.eE+-]+)"),
+    'objective': re.compile(r"Objective value:\s+([\d.eE+-]+)"),
+    'upper_bound': re.compile(r"Upper bound:\s+([\d.eE+-]+)")
+}
+
+# How CBC reports a search that ended before proving optimality
+CBC_STOP_REASONS = {
+    'Result - Stopped on time': 'time_limit',
+    'Result - User ctrl-c': 'user',
+    'within gap tolerance': 'gap',
+    'Result - Stopped': 'limit'
+}
+
+# Progress lines CBC prints during the search; objective values are
+# negated because the model is maximized
+CBC_INCUMBENT = re.compile(r"Integer solution of (-?[\d.]+(?:e[+-]?\d+)?) found")
+CBC_BOUND = re.compile(r"best possible (-?[\d.]+(?:e[+-]?\d+)?)")
+
+class PhaseTimer:
+    """Accumulate wall-clock time per named phase of a solve."""
+    
+    def __init__(self):
+        self.timings = {}
+        self._start = self._last = time.perf_counter()
+    
+    def lap(self, phase):
+        """Charge the time since the previous lap to `phase`."""
+        now = time.perf_counter()
+        self.timings[phase] = self.timings.get(phase, 0.0) + now - self._last
+        self._last = now
+    
+    def split(self, phase, remainder_phase, phase_seconds):
+        """
+        Keep `phase_seconds` of a measured phase and move the rest.
+        
+        Used when a solver reports its own run time, so the process start
+        and file reading around it can be told apart from the search.
+        """
+        measured = self.timings.get(phase, 0.0)
+        kept = min(max(phase_seconds, 0.0), measured)
+        self.timings[phase] = kept
+        self.timings[remainder_phase] = self.timings.get(remainder_phase, 0.0) + measured - kept
+    
+    def merge(self, timings):
+        """
+        Add the per-phase seconds of a nested solve's timings.
+        
+        Its total is skipped, and the next lap starts now, so the nested
+        solve's time is not charged twice.
+        """
+        for phase, seconds in timings.items():
+            if phase != 'total':
+                self.timings[phase] = self.timings.get(phase, 0.0) + seconds
+        self._last = time.perf_counter()
+    
+    def finish(self):
+        """Return the phase timings with the overall total."""
+        timings = dict(self.timings)
+        timings['total'] = time.perf_counter() - self._start
+        return timings
+
+def empty_stats():
+    """Stats dict with every field present, to be filled in by an engine."""
+    return {
+        'engine': None,
+        'method': None,
+        'timings': {},
+        'nodes': None,
+        'iterations': None,
+        'mip_gap': None,
+        'n_variables': None,
+        'n_constraints': None,
+        'n_nonzeros': None,
+        'cache': None,
+        'stopped': None
+    }
+
+def parse_cbc_log(text):
+    """
+    Extract node count, iterations, MIP gap and run time from a CBC log.
+    
+    Args:
+        text (str): CBC standard output
+    
+    Returns:
+        dict: nodes, iterations, mip_gap, solver_seconds and stopped
+            (the reason the search ended early); None if absent
+    """
+    stats = {}
+    for name, pattern in CBC_PATTERNS.items():
+        match = pattern.search(text)
+        stats[name] = float(match.group(1)) if match else None
+    
+    for name in ('nodes', 'iterations'):
+        if stats[name] is not None:
+            stats[name] = int(stats[name])
+    
+    # The printed gap is rounded to two decimals, so recompute it
+    objective, bound = stats.pop('objective'), stats.pop('upper_bound')
+    if objective is not None and bound is not None:
+        stats['mip_gap'] = max(bound - objective, 0.0) / max(abs(objective), 1e-9)
+    elif stats['mip_gap'] is None and "Optimal solution found" in text:
+        stats['mip_gap'] = 0.0
+    elif stats['mip_gap'] is not None:
+        stats['mip_gap'] = abs(stats['mip_gap'])
+    
+    stats['stopped'] = next((reason for marker, reason in CBC_STOP_REASONS.items() if marker in text), None)
+    return stats
+
+def parse_cbc_progress(line):
+    """
+    Read a new incumbent or bound from one line of a running CBC log.
+    
+    Returns:
+        dict: 'objective_value' and/or 'bound' of the maximization
+            problem, or None if the line reports neither
+    """
+    progress = {}
+    match = CBC_INCUMBENT.search(line)
+    if match:
+        progress['objective_value'] = -float(match.group(1))
+    match = CBC_BOUND.search(line)
+    if match:
+        progress['bound'] = -float(match.group(1))
+    return progress or None
+
+def register_solve_hook(hook):
+    """
+    Call `hook(result)` after every optimization, including cache hits.
+    
+    Hooks run in the solving thread; exceptions they raise are logged and
+    never fail the solve. Returns the hook so it can be used as a decorator.
+    """
+    _solve_hooks.append(hook)
+    return hook
+
+def unregister_solve_hook(hook):
+    """Stop calling a hook registered with register_solve_hook."""
+    if hook in _solve_hooks:
+        _solve_hooks.remove(hook)
+
+def notify_solve_hooks(result):
+    """Pass a finished optimization result to every registered hook."""
+    for hook in list(_solve_hooks):
+        try:
+            hook(result)
+        except Exception:
+            logger.exception("Solve hook %r failed", hook)
+
+@contextmanager
+def cache_status(status):
+    """Mark solves in this block with a cache status ('hit' or 'miss')."""
+    previous = getattr(_context, 'cache_status', None)
+    _context.cache_status = status
+    try:
+        yield
+    finally:
+        _context.cache_status = previous
+
+def current_cache_status():
+    """Cache status set by the innermost cache_status block, if any."""
+    return getattr(_context, 'cache_status', None)
@@ -1,77 +1,74 @@
 import streamlit as st
-import pandas as pd
 import json
 import os
-import base64
+
+from portfolio_io import export_bytes, export_filename, read_export
+from scenario_store import session_store
+from work_table import WorkTable, session_table
+
+# Export formats offered on the page and the portfolio_io format of each
+EXPORT_FORMATS = {
+    "JSON": 'json',
+    "Columnar (.npz)": 'npz'
+}
 
 def export_data():
-    """Export the current work types and results to a JSON file"""
-    if 'work_types' not in st.session_state or len(st.session_state.work_types) == 0:
+    """Export the current work types, results and scenarios as a download"""
+    table = session_table(st.session_state)
+    if len(table) == 0:
         st.warning("No data to export. Please add work types first.")
         return
     
-    export_data = {
-        "work_types": st.session_state.work_types
-    }
-    
-    if 'results' in st.session_state and st.session_state.results:
-        export_data["results"] = st.session_state.results
-    
-    if 'scenarios' in st.session_state and st.session_state.scenarios:
-        # Convert DataFrame objects to lists to make them JSON serializable
-        scenarios_json = {}
-        for name, scenario in st.session_state.scenarios.items():
-            scenarios_json[name] = {
-                "total_cost": scenario["total_cost"],
-                "objective_value": scenario["objective_value"],
-                "data": scenario["data"].to_dict('records')
-            }
-        export_data["scenarios"] = scenarios_json
+    col1, col2 = st.columns(2)
+    with col1:
+        fmt = EXPORT_FORMATS[st.radio("Format", list(EXPORT_FORMATS), horizontal=True)]
+    with col2:
+        compress = st.checkbox("Compress", value=True, help="gzip the JSON, or compress the arrays of an .npz file")
     
-    # Convert to JSON
-    json_str = json.dumps(export_data, indent=2)
+    # Encode only when asked, not on every rerun of the page; the file is
+    # served by the download button rather than embedded in the page
+    if st.button("Prepare Export"):
+        file_name, mime = export_filename(fmt, compress)
+        st.session_state.export_file = {
+            'data': export_bytes(
+                table.records(),
+                st.session_state.get('results'),
+                session_store(st.session_state),
+                fmt,
+                compress
+            ),
+            'file_name': file_name,
+            'mime': mime
+        }
     
-    # Create a download link
-    b64 = base64.b64encode(json_str.encode()).decode()
-    href = f'<a href="data:file/json;base64,{b64}" download="utility_work_plan.json">Download JSON File</a>'
-    
-    st.markdown(href, unsafe_allow_html=True)
-    
-    return json_str
+    prepared = st.session_state.get('export_file')
+    if prepared:
+        st.download_button(
+            f"Download {prepared['file_name']} ({len(prepared['data']) / 1024:,.1f} KB)",
+            data=prepared['data'],
+            file_name=prepared['file_name'],
+            mime=prepared['mime']
+        )
+        st.caption("Prepare the export again after changing work types, results or scenarios.")
 
 def import_data():
-    """Import work types and results from a JSON file"""
-    uploaded_file = st.file_uploader("Choose a JSON file", type="json")
+    """Import work types, results and scenarios from a JSON or .npz export"""
+    uploaded_file = st.file_uploader("Choose an exported file", type=["json", "gz", "npz"])
     
     if uploaded_file is not None:
         try:
-            # Load the JSON data
-            data = json.load(uploaded_file)
+            # Work types are validated before anything in the session changes
+            imported = read_export(uploaded_file, session_store(st.session_state))
             
             # Import work types
-            if "work_types" in data:
-                st.session_state.work_types = data["work_types"]
+            if imported["work_types"] is not None:
+                st.session_state.work_types = WorkTable.from_frame(imported["work_types"])
                 
             # Import results if present
-            if "results" in data:
-                st.session_state.results = data["results"]
-                
-            # Import scenarios if present
-            if "scenarios" in data:
-                if 'scenarios' not in st.session_state:
-                    st.session_state.scenarios = {}
-                    
-                for name, scenario in data["scenarios"].items():
-                    # Convert data back to DataFrame
-                    scenario_data = pd.DataFrame(scenario["data"])
-                    
-                    st.session_state.scenarios[name] = {
-                        "total_cost": scenario["total_cost"],
-                        "objective_value": scenario["objective_value"],
-                        "data": scenario_data
-                    }
-                    
-            st.success("Data imported successfully!")
+            if imported["results"] is not None:
+                st.session_state.results = imported["results"]
+            
+            st.success(f"Data imported successfully ({imported['scenarios']} scenarios)!")
             st.experimental_rerun()
             
         except Exception as e:
@@ -90,15 +87,15 @@ def load_example_data():
         
         # Import work types
         if "work_types" in data:
-            st.session_state.work_types = data["work_types"]
-            
+            st.session_state.work_types = WorkTable.from_records(data["work_types"])
+        
         # Import budget if present
         if "budget" in data:
             st.session_state.budget = data["budget"]
-            
+        
         st.success("Example data loaded successfully!")
         st.experimental_rerun()
-        
+    
     except Exception as e:
         st.error(f"Error loading example data: {str(e)}")
 
@@ -110,12 +107,12 @@ def render_import_export():
     
     with tab1:
         st.subheader("Export Current Data")
-        st.write("Export your current work types, results, and scenarios to a JSON file.")
+        st.write("Export your current work types, results, and scenarios as JSON or as a columnar .npz file.")
         export_data()
     
     with tab2:
         st.subheader("Import Data")
-        st.write("Import work types, results, and scenarios from a JSON file.")
+        st.write("Import work types, results, and scenarios from a JSON (optionally gzipped) or .npz file.")
         import_data()
     
     with tab3:
@@ -0,0 +1,340 @@
+"""
+Incremental re-optimization after edits to the work types.
+
+Planners edit one work type at a time and expect the allocation to follow
+at once. IncrementalSolver keeps the last problem and its allocation, and
+for a new version of the work types it:
+    - matches the rows of both versions, so edits, deletions and additions
+      are told apart
+    - keeps the previous allocation without solving when the change
+      provably cannot alter the optimum: on everything both versions allow,
+      the changed priorities can only favour it, and every allocation only
+      the new version allows is held below it by an LP relaxation bound
+    - otherwise solves again from the previous allocation as the starting
+      incumbent (a MIP start for CBC); problems presolve cannot reduce keep
+      their matrix model, updated in place when only values changed
+"""
+import difflib
+import threading
+
+import numpy as np
+
+from diagnostics import PhaseTimer, empty_stats, notify_solve_hooks
+from matrix_model import build_budget_model, update_budget_model
+from optimization import _model_columns, _optimize, _value_step, knapsack_supported
+from portfolio_io import WORK_TYPE_COLUMNS
+from solve_control import SolveControl
+
+# Solve paths recorded in stats['incremental']
+ACTIONS = ('skipped', 'warm_start', 'cold')
+
+# Model arrays matrix_model.update_budget_model writes to
+UPDATED_ARRAYS = ('values', 'objective', 'lower', 'upper', 'rhs')
+
+# Rows whose bounds widened that are bounded one by one; beyond this only
+# the bound of the whole relaxation is tried
+CERTIFY_MAX_REGIONS = 16
+
+def align_work_types(old_df, new_df):
+    """
+    Match the rows of two versions of the work types.
+    
+    Tables of the same length are matched row by row, as edits keep the
+    order. Otherwise the rows are diffed, so deleted and added work types
+    leave the others matched.
+    
+    Returns:
+        np.ndarray: For each row of new_df, the position of the same work
+            type in old_df, or -1 for an added work type
+    """
+    if len(old_df) == len(new_df):
+        return np.arange(len(new_df))
+    
+    old_rows = old_df[WORK_TYPE_COLUMNS].to_numpy(dtype=object)
+    new_rows = new_df[WORK_TYPE_COLUMNS].to_numpy(dtype=object)
+    source = np.full(len(new_rows), -1, dtype=np.int64)
+    
+    # Rows before and after the edited stretch line up without diffing
+    shortest = min(len(old_rows), len(new_rows))
+    head = _matching_run(old_rows[:shortest], new_rows[:shortest])
+    tail = _matching_run(old_rows[::-1][:shortest - head], new_rows[::-1][:shortest - head])
+    source[:head] = np.arange(head)
+    source[len(new_rows) - tail:] = np.arange(len(old_rows) - tail, len(old_rows))
+    
+    old_middle = list(map(tuple, old_rows[head:len(old_rows) - tail]))
+    new_middle = list(map(tuple, new_rows[head:len(new_rows) - tail]))
+    matcher = difflib.SequenceMatcher(None, old_middle, new_middle, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag in ('equal', 'replace'):
+            # Replaced rows are edited in place as far as both sides go
+            k = min(i2 - i1, j2 - j1)
+            source[head + j1:head + j1 + k] = np.arange(head + i1, head + i1 + k)
+    return source
+
+def certify_unchanged(old_df, old_budget, allocation, new_df, new_budget, source=None):
+    """
+    Check whether an optimal allocation stays optimal after a change.
+    
+    Work types are matched with align_work_types; a deleted work type
+    counts as fixed at zero units in the new problem and an added one as
+    fixed at zero in the old. The previous allocation, carried over (added
+    work types at their minimum), is proven optimal when it is feasible
+    and no allocation can beat it:
+        - allocations both problems allow gain at most the priority
+          increases at their upper bounds (and lose at least the decreases
+          at their lower bounds), so the carried allocation must sit on
+          those bounds
+        - allocations only the new problem allows, because a bound or the
+          budget widened or a cost fell, are bounded by the LP relaxation
+          with that widened bound cut off, rounded down to the values
+          integer allocations can take
+    Raising `max_units` on a work type the allocation did not fill is
+    usually settled by the second check without solving.
+    
+    Args:
+        old_df (pd.DataFrame): Work types the allocation is optimal for
+        old_budget (float): Budget the allocation is optimal for
+        allocation (array-like): Proven optimal units per old work type
+        new_df (pd.DataFrame): Changed work types
+        new_budget (float): Changed budget
+        source (np.ndarray): Result of align_work_types, if already known
+    
+    Returns:
+        np.ndarray: The allocation carried over to new_df, or None if it
+            cannot be proven optimal
+    """
+    if not (knapsack_supported(old_df, old_budget) and knapsack_supported(new_df, new_budget)):
+        return None
+    if source is None:
+        source = align_work_types(old_df, new_df)
+    
+    old = _columns(old_df)
+    new = _columns(new_df)
+    x_old = np.asarray(allocation, dtype=float)
+    matched = source >= 0
+    
+    carried = new['min_units'].copy()
+    carried[matched] = x_old[source[matched]]
+    c, p, l, u = (new[column] for column in ('cost', 'priority', 'min_units', 'max_units'))
+    tol = 1e-9 * max(1.0, abs(float(new_budget)))
+    if (carried < l).any() or (carried > u).any() or float(np.dot(c, carried)) > new_budget + tol:
+        return None
+    target = float(np.dot(p, carried))
+    eps = 1e-9 * max(1.0, abs(target))
+    step = _value_step(p)
+    
+    # Old bounds and costs seen from the new rows; added rows were fixed at zero
+    old_cost = np.where(matched, old['cost'][source], c)
+    old_priority = np.where(matched, old['priority'][source], p)
+    old_lower = np.where(matched, old['min_units'][source], 0.0)
+    old_upper = np.where(matched, old['max_units'][source], 0.0)
+    
+    # Allocations both problems allow: the old optimum plus what the
+    # priority changes can add on the common bounds
+    deleted = np.setdiff1d(np.arange(len(old_df)), source[matched])
+    common_lower = np.maximum(l, old_lower)
+    common_upper = np.minimum(u, old_upper)
+    if (old['min_units'][deleted] <= 0).all() and (common_lower <= common_upper).all():
+        delta = p - old_priority
+        gain = np.where(delta > 0, delta * common_upper, delta * common_lower).sum()
+        if float(np.dot(old['priority'], x_old)) + gain > target + eps:
+            return None
+    
+    # Allocations only the new problem allows
+    regions = [('min_units', i, old_upper[i] + 1) for i in np.flatnonzero(u > old_upper)]
+    regions += [('max_units', i, old_lower[i] - 1) for i in np.flatnonzero(l < old_lower)]
+    # A deleted work type with a minimum makes everything new
+    whole = (
+        (old['min_units'][deleted] > 0).any()
+        or new_budget > old_budget + tol
+        or (c < old_cost).any()
+        or len(regions) > CERTIFY_MAX_REGIONS
+    )
+    if whole:
+        regions = [None]
+    
+    for region in regions:
+        lower, upper = l, u
+        if region is not None:
+            column, i, value = region
+            lower, upper = l.copy(), u.copy()
+            (lower if column == 'min_units' else upper)[i] = value
+        bound = _relaxation_bound(c, p, lower, upper, float(new_budget))
+        if step is not None:
+            bound = np.floor(bound / step + 1e-9) * step
+        if bound > target + eps:
+            return None
+    
+    return carried.astype(np.int64)
+
+def proven_optimal(result):
+    """True if a result is optimal without a gap, so certify_unchanged applies."""
+    return (
+        result is not None
+        and result['status'] == 'Optimal'
+        and (result['stats'].get('mip_gap') or 0.0) <= 1e-9
+    )
+
+class IncrementalSolver:
+    """
+    Re-optimize a changing problem from its last solution.
+    
+    Keep one per session: remember() records a result solved elsewhere,
+    and solve() answers a new version of the work types and budget,
+    skipping the solve or warm starting it when it can. Calls are
+    serialized, so a solve started after an edit waits for an earlier one
+    to finish with the shared model.
+    """
+    
+    def __init__(self):
+        self.work_df = None
+        self.total_budget = None
+        self.result = None
+        # Matrix model kept for reuse and the work types it was built for
+        self.model = None
+        self.model_df = None
+        self.counts = {action: 0 for action in ACTIONS}
+        self._lock = threading.Lock()
+    
+    def remember(self, work_df, total_budget, result):
+        """Record the problem a result was solved for as the base of the next solve."""
+        with self._lock:
+            self._store(work_df, total_budget, result)
+            self.model = self.model_df = None
+    
+    def solve(self, work_df, total_budget, engine='auto', time_limit=None, mip_gap=None, on_incumbent=None, stop_event=None):
+        """
+        Optimize after a change to the work types or budget.
+        
+        Arguments and result are those of optimize_work_allocation;
+        stats['incremental'] tells which of ACTIONS was taken. A skipped
+        solve keeps the previous engine and reports method 'incremental'.
+        After rows are removed the problem is solved cold.
+        """
+        with self._lock:
+            timer = PhaseTimer()
+            work_df = work_df.reset_index(drop=True)
+            start = source = None
+            # Aligning the shifted rows, searching from a start and reusing the
+            # model cost more than the cold solve of a problem that lost rows
+            removed = self.work_df is not None and len(work_df) < len(self.work_df)
+            if not removed and self.result is not None and self.result['allocation'] is not None:
+                source = align_work_types(self.work_df, work_df)
+                start = work_df['min_units'].to_numpy(dtype=float).copy()
+                previous = np.asarray(self.result['allocation'], dtype=float)
+                start[source >= 0] = previous[source[source >= 0]]
+            
+            if start is not None and proven_optimal(self.result):
+                carried = certify_unchanged(
+                    self.work_df, self.total_budget, self.result['allocation'], work_df, total_budget, source
+                )
+                timer.lap('certify')
+                if carried is not None:
+                    result = self._skipped(work_df, carried, timer)
+                    self._store(work_df, total_budget, result)
+                    notify_solve_hooks(result)
+                    return result
+            
+            model = None if removed else self._model(work_df, total_budget, engine)
+            control = None
+            if any(option is not None for option in (time_limit, mip_gap, on_incumbent, stop_event)):
+                control = SolveControl(time_limit, mip_gap, on_incumbent, stop_event)
+            result = _optimize(work_df, total_budget, engine, control, start=start, model=model)
+            
+            action = 'cold' if start is None or engine == 'approx' else 'warm_start'
+            result['stats']['incremental'] = action
+            self.counts[action] += 1
+            self._store(work_df, total_budget, result)
+            if removed:
+                self.model = self.model_df = None
+            elif model is not None:
+                self.model, self.model_df = model, self.work_df
+            notify_solve_hooks(result)
+            return result
+    
+    def _store(self, work_df, total_budget, result):
+        self.work_df = work_df.reset_index(drop=True).copy()
+        self.total_budget = total_budget
+        self.result = result
+    
+    def _model(self, work_df, total_budget, engine):
+        """
+        The matrix model for the new problem.
+        
+        With the row count unchanged, a copy of the kept model is updated, so
+        the kept model still matches model_df if the solve fails; solve()
+        keeps the new model once it returns.
+        """
+        # Problems the knapsack engine accepts are presolved, which beats reusing the full model
+        if engine not in ('auto', 'matrix') or knapsack_supported(work_df, total_budget):
+            return None
+        if self.model is None or len(self.model_df) != len(work_df):
+            return build_budget_model(*_model_columns(work_df), total_budget)
+        
+        # Variables are positions, so only the rows whose values differ change
+        columns = WORK_TYPE_COLUMNS[1:]
+        changed = np.flatnonzero((self.model_df[columns].to_numpy() != work_df[columns].to_numpy()).any(axis=1))
+        costs, priorities, min_units, max_units = (array[changed] for array in _model_columns(work_df))
+        model = dict(self.model)
+        for key in UPDATED_ARRAYS:
+            model[key] = model[key].copy()
+        return update_budget_model(model, changed, costs, priorities, min_units, max_units, total_budget)
+    
+    def _skipped(self, work_df, carried, timer):
+        """Result for an allocation proven to stay optimal."""
+        priorities = work_df['priority'].to_numpy(dtype=float)
+        stats = empty_stats()
+        stats.update(
+            engine=self.result['stats'].get('engine'),
+            method='incremental',
+            mip_gap=0.0,
+            n_variables=len(work_df),
+            n_constraints=1,
+            n_nonzeros=len(work_df),
+            incremental='skipped',
+            timings=timer.finish()
+        )
+        self.counts['skipped'] += 1
+        return {
+            'status': 'Optimal',
+            'allocation': [int(units) for units in carried],
+            'objective_value': float(np.dot(priorities, carried)),
+            'stats': stats
+        }
+
+def _matching_run(old_rows, new_rows):
+    """Number of leading rows two equally long row arrays share."""
+    differs = (old_rows != new_rows).any(axis=1)
+    return int(np.argmax(differs)) if differs.any() else len(differs)
+
+def _columns(work_df):
+    return {column: work_df[column].to_numpy(dtype=float) for column in WORK_TYPE_COLUMNS[1:]}
+
+def _relaxation_bound(costs, priorities, lower, upper, budget):
+    """
+    Optimum of the LP relaxation of a single-budget problem.
+    
+    Returns:
+        float: The bound, or -inf if the minimum units do not fit
+    """
+    if (lower > upper).any():
+        return -np.inf
+    slack = budget - float(np.dot(costs, lower))
+    if slack < -1e-9 * max(1.0, abs(budget)):
+        return -np.inf
+    
+    value = float(np.dot(priorities, lower))
+    room = upper - lower
+    wanted = (priorities > 0) & (room > 0)
+    free = wanted & (costs == 0)
+    value += float(np.dot(priorities[free], room[free]))
+    
+    paid = np.flatnonzero(wanted & (costs > 0))
+    order = paid[np.argsort(-(priorities[paid] / costs[paid]), kind='stable')]
+    cum_w = np.concatenate(([0.0], np.cumsum(costs[order] * room[order])))
+    cum_v = np.concatenate(([0.0], np.cumsum(priorities[order] * room[order])))
+    stop = int(np.searchsorted(cum_w, max(slack, 0.0), side='right')) - 1
+    value += cum_v[stop]
+    if stop < len(order):
+        value += (max(slack, 0.0) - cum_w[stop]) * priorities[order[stop]] / costs[order[stop]]
+    return value
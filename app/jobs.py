@@ -0,0 +1,217 @@
+"""
+Background jobs for long solves and sweeps.
+
+Pages submit work to a process-wide thread pool and keep the returned Job
+in session state. The job outlives the script run that started it, so a
+rerun finds it again, renders whatever progress and partial results are
+ready, and never starts the same work twice:
+    
+    job = ensure_job(st.session_state, 'solve_job', key, run_solve, work_df, budget)
+    if not job.done:
+        render_progress(job.snapshot())
+"""
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Environment variable setting how many jobs run at once; later jobs queue.
+# Solve jobs mostly wait on the shared solver service, which bounds the
+# actual solving separately.
+JOB_WORKERS_ENV = 'WORK_PLANNER_JOB_WORKERS'
+DEFAULT_JOB_WORKERS = 16
+
+# Job states; the last three are final
+STATES = ('queued', 'running', 'done', 'failed', 'cancelled')
+
+class Job:
+    """
+    Handle on one background job.
+    
+    The job function receives the handle as its first argument and uses
+    it to publish progress and partial results and to notice a cancel
+    request. Readers use snapshot() to get a consistent view.
+    """
+    
+    def __init__(self, key=None, total=None):
+        """
+        Args:
+            key: Identifies the work, so an unfinished job with the same key
+                is reused instead of started again
+            total (int): Number of steps the job reports progress against
+                (None if unknown)
+        """
+        self.key = key
+        self.total = total
+        self.completed = 0
+        self.state = 'queued'
+        self.partial = []
+        self.latest = None
+        self.result = None
+        self.error = None
+        self.stop_event = threading.Event()
+        self.submitted = time.time()
+        self.started = None
+        self.finished = None
+        self._lock = threading.Lock()
+        self._future = None
+    
+    @property
+    def done(self):
+        """True once the job has finished, failed or been cancelled."""
+        return self.state in ('done', 'failed', 'cancelled')
+    
+    @property
+    def cancelled(self):
+        return self.stop_event.is_set()
+    
+    def elapsed(self):
+        """Seconds the job has been running (0 while queued)."""
+        if self.started is None:
+            return 0.0
+        return (self.finished or time.time()) - self.started
+    
+    def progress(self):
+        """Fraction of steps completed, or None if the total is unknown."""
+        if not self.total:
+            return None
+        return min(self.completed / self.total, 1.0)
+    
+    def publish(self, item=None, advance=1):
+        """
+        Record a partial result from the job function.
+        
+        Args:
+            item: Partial result (a row of a sweep, or an incumbent), kept
+                in `partial` and as `latest`; None only advances progress
+            advance (int): Steps completed by this item
+        """
+        with self._lock:
+            if item is not None:
+                self.partial.append(item)
+                self.latest = item
+            self.completed += advance
+    
+    def set_latest(self, item):
+        """Replace the latest partial result without keeping a history."""
+        with self._lock:
+            self.latest = item
+    
+    def snapshot(self):
+        """
+        Consistent copy of the job's progress for rendering.
+        
+        Returns:
+            dict: state, progress, completed, total, elapsed, partial
+                (a copy of the list), latest, result and error
+        """
+        with self._lock:
+            return {
+                'state': self.state,
+                'progress': self.progress(),
+                'completed': self.completed,
+                'total': self.total,
+                'elapsed': self.elapsed(),
+                'partial': list(self.partial),
+                'latest': self.latest,
+                'result': self.result,
+                'error': self.error
+            }
+    
+    def cancel(self):
+        """
+        Ask the job to stop.
+        
+        A queued job never starts. A running job sees `stop_event` set and
+        should return its best result so far; that result is kept and the
+        job ends in state 'cancelled'.
+        """
+        self.stop_event.set()
+        if self._future is not None and self._future.cancel():
+            self._finish('cancelled')
+    
+    def wait(self, timeout=None):
+        """Block until the job is done; returns True if it is."""
+        if self._future is not None:
+            try:
+                self._future.exception(timeout=timeout)
+            except Exception:
+                pass
+        return self.done
+    
+    def _run(self, fn, args, kwargs):
+        with self._lock:
+            if self.done:
+                return
+            self.state = 'running'
+            self.started = time.time()
+        try:
+            result = fn(self, *args, **kwargs)
+        except Exception as e:
+            self.error = e
+            self._finish('failed')
+        else:
+            self.result = result
+            self._finish('cancelled' if self.cancelled else 'done')
+    
+    def _finish(self, state):
+        with self._lock:
+            self.state = state
+            self.finished = time.time()
+            if self.started is None:
+                self.started = self.finished
+
+_executor = None
+_executor_lock = threading.Lock()
+
+def get_executor():
+    """Return the process-wide thread pool shared by all sessions."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            workers = int(os.environ.get(JOB_WORKERS_ENV) or DEFAULT_JOB_WORKERS)
+            _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='job')
+        return _executor
+
+def submit_job(fn, *args, key=None, total=None, **kwargs):
+    """
+    Run `fn(job, *args, **kwargs)` in the background.
+    
+    Args:
+        fn (callable): Job function; its return value becomes job.result
+        key: Identifies the work (see ensure_job)
+        total (int): Number of progress steps, if known
+    
+    Returns:
+        Job: Handle on the submitted job
+    """
+    job = Job(key=key, total=total)
+    job._future = get_executor().submit(job._run, fn, args, kwargs)
+    return job
+
+def ensure_job(state, slot, key, fn, *args, total=None, **kwargs):
+    """
+    Return the job for `key` in `state[slot]`, submitting it if needed.
+    
+    An unfinished job for the same key is returned as is, so a rerun of
+    the page never duplicates work. An unfinished job for a different key
+    is cancelled and replaced.
+    
+    Args:
+        state (dict-like): Where the handle is kept (st.session_state)
+        slot (str): Key of the handle in `state`
+        key: Identifies the work
+        fn (callable): Job function, called as fn(job, *args, **kwargs)
+        total (int): Number of progress steps, if known
+    
+    Returns:
+        Job: The running or newly submitted job
+    """
+    job = state.get(slot)
+    if job is not None and not job.done:
+        if job.key == key:
+            return job
+        job.cancel()
+    
+    state[slot] = submit_job(fn, *args, key=key, total=total, **kwargs)
+    return state[slot]
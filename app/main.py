@@ -1,8 +1,30 @@
+import time
+import uuid
+
 import streamlit as st
 import pandas as pd
-import numpy as np
-import plotly.express as px
-from optimization import optimize_work_allocation
+from incremental import IncrementalSolver
+from jobs import ensure_job
+from solve_cache import get_default_cache
+from solver_service import get_solver_service
+from work_table import BULK_COLUMNS, session_table
+
+# Seconds between refreshes of the live solve progress
+PROGRESS_INTERVAL = 0.25
+
+# Solve modes offered in the sidebar and the engine each one uses
+SOLVE_MODES = {
+    "Fast (approximate)": 'approx',
+    "Exact": 'auto'
+}
+
+# Labels of the columns offered by the bulk update form
+BULK_LABELS = {
+    'cost': "Cost per Unit ($)",
+    'priority': "Priority",
+    'min_units': "Minimum Units Required",
+    'max_units': "Maximum Units Possible"
+}
 
 def main():
     st.title("Utility Work Management Optimization")
@@ -11,6 +33,20 @@ def main():
         st.header("Configuration")
         total_budget = st.number_input("Total Budget ($)", min_value=0, value=1000000, step=10000)
         
+        st.subheader("Solver Settings")
+        solve_mode = st.radio(
+            "Solve Mode", list(SOLVE_MODES),
+            help="Fast mode rounds the continuous relaxation and reports how far it can be from the optimum"
+        )
+        time_limit = st.number_input(
+            "Time Limit (seconds)", min_value=0.0, value=5.0, step=1.0,
+            help="Return the best allocation found within this time (0 for no limit)"
+        )
+        gap_percent = st.number_input(
+            "Target Optimality Gap (%)", min_value=0.0, max_value=100.0, value=0.0, step=0.1,
+            help="Stop once the allocation is proven to be within this distance of the optimum"
+        )
+        
         st.subheader("Add Work Types")
         with st.form("work_type_form"):
             work_name = st.text_input("Work Type Name")
@@ -21,82 +57,112 @@ def main():
             submitted = st.form_submit_button("Add Work Type")
         
         if submitted and work_name:
-            if 'work_types' not in st.session_state:
-                st.session_state.work_types = []
-            
-            st.session_state.work_types.append({
-                'name': work_name,
-                'cost': work_cost,
-                'priority': work_priority,
-                'min_units': work_min,
-                'max_units': work_max
-            })
-            st.success(f"Added {work_name}")
-    
-    # Main content area
-    if 'work_types' in st.session_state and len(st.session_state.work_types) > 0:
-        work_df = pd.DataFrame(st.session_state.work_types)
+            try:
+                st.session_state.work_types = session_table(st.session_state).append({
+                    'name': work_name,
+                    'cost': work_cost,
+                    'priority': work_priority,
+                    'min_units': work_min,
+                    'max_units': work_max
+                })
+                st.success(f"Added {work_name}")
+            except ValueError as e:
+                st.error(f"Could not add work type: {str(e)}")
+    
+    # Main content area; the table's DataFrame is built once per change,
+    # not on every rerun
+    table = session_table(st.session_state)
+    if len(table) > 0:
+        work_df = table.frame()
         
         st.subheader("Work Types")
         st.dataframe(work_df)
         
+        solve_options = {
+            'engine': SOLVE_MODES[solve_mode],
+            'time_limit': time_limit or None,
+            'mip_gap': gap_percent / 100 or None
+        }
+        render_work_type_editor(table, total_budget, solve_options)
+        
         if st.button("Optimize Work Allocation"):
-            with st.spinner("Optimizing work allocation..."):
-                try:
-                    result = optimize_work_allocation(
-                        work_df, 
-                        total_budget
-                    )
-                    
-                    if 'results' not in st.session_state:
-                        st.session_state.results = {}
-                    
-                    st.session_state.results = result
-                    
-                except Exception as e:
-                    st.error(f"Optimization failed: {str(e)}")
+            start_solve(table, total_budget, **solve_options)
+        
+        # A running solve survives reruns, including the one the stop button triggers
+        if 'solve_job' in st.session_state:
+            job = st.session_state.solve_job
+            watch_job(job, lambda snapshot: render_solve_progress(snapshot, table), "Stop and Keep Best", 'stop_solve')
+            del st.session_state.solve_job
+            
+            if job.error is not None:
+                st.error(f"Optimization failed: {str(job.error)}")
+            elif job.result is not None:
+                st.session_state.results = job.result
         
         if 'results' in st.session_state and st.session_state.results:
             st.subheader("Optimization Results")
             
-            results_df = pd.DataFrame({
-                'Work Type': [w['name'] for w in st.session_state.work_types],
-                'Units Allocated': st.session_state.results['allocation'],
-                'Cost': [u * w['cost'] for u, w in zip(st.session_state.results['allocation'], st.session_state.work_types)]
-            })
+            stats = st.session_state.results.get('stats', {})
+            if stats.get('incremental') == 'skipped':
+                st.caption("The last edit provably cannot change the optimum, so the allocation was kept without solving.")
+            if st.session_state.results['status'] == 'Feasible' and stats.get('engine') == 'approx':
+                st.info(f"Fast approximate allocation, within {stats['mip_gap']:.2%} of the optimum.")
+                if st.button("Re-solve Exactly"):
+                    start_solve(
+                        table,
+                        total_budget,
+                        time_limit=time_limit or None,
+                        mip_gap=gap_percent / 100 or None
+                    )
+                    st.experimental_rerun()
+            elif st.session_state.results['status'] == 'Feasible':
+                reason = "stopped" if stats.get('stopped') == 'user' else "hit the time limit"
+                st.warning(
+                    f"The solver {reason} before proving optimality; showing the best allocation found "
+                    f"(within {stats.get('mip_gap') or 0:.2%} of the optimum)."
+                )
+            
+            results_df = table.allocation_frame(st.session_state.results['allocation'])
             
             st.dataframe(results_df)
             
+            cache_stats = get_default_cache().stats()
+            service_stats = get_solver_service().stats()
+            st.caption(
+                f"Solve cache: {cache_stats['hits'] + cache_stats['disk_hits']} hits, "
+                f"{cache_stats['misses']} misses. Solver service: {service_stats['running']} running, "
+                f"{service_stats['queued']} queued, {service_stats['deduplicated']} shared"
+            )
+            
+            if stats:
+                render_diagnostics(stats)
+            
             # Budget utilization
             total_cost = results_df['Cost'].sum()
             st.metric("Total Budget", f"${total_budget:,.2f}")
             st.metric("Total Cost", f"${total_cost:,.2f}")
             st.metric("Remaining Budget", f"${total_budget - total_cost:,.2f}")
             
-            # Visualizations
+            # Visualizations; Plotly loads only once there is something to chart.
+            # Large portfolios are summed into their top work types plus "Other"
+            from charts import allocation_figures
+            categories = table.column('category') if 'category' in table.columns else None
+            fig1, fig2 = table.derive(
+                'allocation_figures',
+                lambda table, allocation: allocation_figures(table.allocation_frame(allocation), categories),
+                st.session_state.results['allocation']
+            )
+            
             col1, col2 = st.columns(2)
             
             with col1:
                 st.subheader("Units by Work Type")
-                fig1 = px.bar(
-                    results_df, 
-                    x='Work Type', 
-                    y='Units Allocated',
-                    color='Work Type',
-                    title="Allocation of Work Units"
-                )
                 st.plotly_chart(fig1, use_container_width=True)
             
             with col2:
                 st.subheader("Budget Allocation")
-                fig2 = px.pie(
-                    results_df,
-                    names='Work Type',
-                    values='Cost',
-                    title="Cost Distribution"
-                )
                 st.plotly_chart(fig2, use_container_width=True)
-                
+        
         # Option to clear data
         if st.button("Clear All Data"):
             st.session_state.clear()
@@ -104,5 +170,238 @@ def main():
     else:
         st.info("Add work types using the sidebar to begin optimization.")
 
+def render_work_type_editor(table, total_budget, solve_options):
+    """Edit, delete and bulk-update work types, re-optimizing from the current results."""
+    labels = table.labels()
+    
+    with st.expander("Edit Work Types"):
+        tab1, tab2 = st.tabs(["Edit or Delete", "Bulk Update"])
+        
+        with tab1:
+            index = st.selectbox("Work Type", range(len(table)), format_func=labels.__getitem__)
+            current = table.row(index)
+            with st.form("edit_work_type_form"):
+                name = st.text_input("Work Type Name", value=current['name'])
+                cost = st.number_input("Cost per Unit ($)", min_value=0.0, value=float(current['cost']))
+                priority = st.number_input("Priority", value=float(current['priority']))
+                min_units = st.number_input("Minimum Units Required", min_value=0, value=int(current['min_units']))
+                max_units = st.number_input("Maximum Units Possible", min_value=0, value=int(current['max_units']))
+                col1, col2 = st.columns(2)
+                save = col1.form_submit_button("Save Changes")
+                delete = col2.form_submit_button("Delete Work Type")
+            
+            if save:
+                apply_work_type_change(
+                    lambda table: table.edit(
+                        index, name=name, cost=cost, priority=priority, min_units=min_units, max_units=max_units
+                    ),
+                    total_budget, solve_options
+                )
+            if delete:
+                apply_work_type_change(lambda table: table.delete([index]), total_budget, solve_options)
+        
+        with tab2:
+            with st.form("bulk_update_form"):
+                selected = st.multiselect("Work Types", range(len(table)), format_func=labels.__getitem__)
+                column = st.selectbox("Field", BULK_COLUMNS, format_func=BULK_LABELS.__getitem__)
+                operation = st.radio("Change", ["Set to", "Multiply by"], horizontal=True)
+                amount = st.number_input("Value", min_value=0.0, value=1.0)
+                col1, col2 = st.columns(2)
+                update = col1.form_submit_button("Update Selected")
+                delete_selected = col2.form_submit_button("Delete Selected")
+            
+            if update and selected:
+                if operation == "Set to":
+                    change = lambda table: table.bulk_update(selected, column, value=amount)
+                else:
+                    change = lambda table: table.bulk_update(selected, column, factor=amount)
+                apply_work_type_change(change, total_budget, solve_options)
+            if delete_selected and selected:
+                apply_work_type_change(lambda table: table.delete(selected), total_budget, solve_options)
+
+def apply_work_type_change(change, total_budget, solve_options):
+    """
+    Apply an edit to the work types and re-optimize incrementally.
+    
+    Results shown for the old work types are replaced by an incremental
+    solve from them, which keeps the allocation without solving when the
+    edit provably cannot change the optimum.
+    
+    Args:
+        change (callable): Maps the WorkTable to the edited WorkTable
+        total_budget (float): Total available budget
+        solve_options (dict): engine, time_limit and mip_gap of the solve
+    """
+    try:
+        table = change(session_table(st.session_state))
+    except ValueError as e:
+        st.error(f"Could not update work types: {str(e)}")
+        return
+    
+    st.session_state.work_types = table
+    if st.session_state.pop('results', None) and len(table) > 0:
+        start_incremental_solve(table, total_budget, **solve_options)
+    st.experimental_rerun()
+
+def incremental_solver():
+    """The session's IncrementalSolver, which remembers the last result."""
+    return st.session_state.setdefault('incremental_solver', IncrementalSolver())
+
+def start_solve(table, total_budget, engine='auto', time_limit=None, mip_gap=None):
+    """
+    Optimize in a background job kept in the session as 'solve_job'.
+    
+    Clicking again while the same solve is running reuses the job.
+    
+    Args:
+        table (WorkTable): Work types to optimize
+    
+    Returns:
+        jobs.Job: The solve job; its result is the optimization result
+    """
+    key = (table.version, total_budget, engine, time_limit, mip_gap)
+    session = st.session_state.setdefault('session_id', uuid.uuid4().hex)
+    return ensure_job(
+        st.session_state, 'solve_job', key, run_solve,
+        table.frame(), total_budget, session=session, solver=incremental_solver(),
+        engine=engine, time_limit=time_limit, mip_gap=mip_gap
+    )
+
+def start_incremental_solve(table, total_budget, engine='auto', time_limit=None, mip_gap=None):
+    """
+    Re-optimize from the last result in the 'solve_job' background job.
+    
+    Args:
+        table (WorkTable): Edited work types
+    
+    Returns:
+        jobs.Job: The solve job; its result is the optimization result
+    """
+    key = ('incremental', table.version, total_budget, engine, time_limit, mip_gap)
+    return ensure_job(
+        st.session_state, 'solve_job', key, run_incremental_solve,
+        incremental_solver(), table.frame(), total_budget, engine=engine, time_limit=time_limit, mip_gap=mip_gap
+    )
+
+def run_incremental_solve(job, solver, work_df, total_budget, **options):
+    """Job function: re-optimize with the session's IncrementalSolver, publishing each improving incumbent."""
+    return solver.solve(work_df, total_budget, on_incumbent=job.set_latest, stop_event=job.stop_event, **options)
+
+def run_solve(job, work_df, total_budget, session=None, solver=None, engine='auto', time_limit=None, mip_gap=None):
+    """
+    Job function: optimize on the shared solver service, publishing each improving incumbent.
+    
+    The result is remembered by `solver` (an IncrementalSolver) as the
+    starting point of later edits.
+    """
+    # Cached problems are answered at once; one already being solved for
+    # another session is shared rather than solved twice
+    ticket = get_solver_service().submit(
+        work_df,
+        total_budget,
+        session=session,
+        on_incumbent=job.set_latest,
+        engine=engine,
+        time_limit=time_limit,
+        mip_gap=mip_gap
+    )
+    while not ticket.wait(PROGRESS_INTERVAL):
+        if job.cancelled:
+            ticket.cancel()
+    
+    result = ticket.result()
+    if solver is not None and result is not None:
+        solver.remember(work_df, total_budget, result)
+    return result
+
+def watch_job(job, render, stop_label, stop_key):
+    """
+    Render a background job's progress until it finishes.
+    
+    A rerun interrupts this loop but not the job; the next run finds the
+    job in session state and resumes watching it.
+    
+    Args:
+        job (jobs.Job): Job to watch
+        render (callable): Called with job.snapshot() to draw the progress
+        stop_label (str): Label of the button that cancels the job
+        stop_key (str): Widget key of that button
+    """
+    stop_slot = st.empty()
+    stop_slot.button(stop_label, key=stop_key, on_click=job.cancel)
+    progress = st.empty()
+    
+    while True:
+        finished = job.done
+        with progress.container():
+            render(job.snapshot())
+        
+        if finished:
+            break
+        time.sleep(PROGRESS_INTERVAL)
+    
+    stop_slot.empty()
+    progress.empty()
+
+def render_solve_progress(snapshot, table):
+    """Show the best allocation found so far by a running solve."""
+    latest = snapshot['latest']
+    if snapshot['state'] == 'queued':
+        st.caption("Waiting for a free solver...")
+    else:
+        st.caption(f"Optimizing... {snapshot['elapsed']:.1f}s elapsed")
+    
+    if latest is not None:
+        gap = latest['stats']['mip_gap']
+        col1, col2 = st.columns(2)
+        col1.metric("Best Priority Value So Far", f"{latest['objective_value']:,.2f}")
+        col2.metric("Optimality Gap", "-" if gap is None else f"{gap:.2%}")
+        if latest['allocation'] is not None:
+            st.dataframe(pd.DataFrame({
+                'Work Type': table.column('name'),
+                'Units Allocated': latest['allocation']
+            }))
+
+def render_diagnostics(stats):
+    """Show the timings and solver statistics of the last solve."""
+    with st.expander("Diagnostics"):
+        col1, col2, col3 = st.columns(3)
+        col1.metric("Engine", stats['engine'] or "-")
+        col2.metric("Method", stats['method'] or "-")
+        col3.metric("Cache", stats['cache'] or "not used")
+        
+        timings = stats['timings']
+        timings_df = pd.DataFrame({
+            'Phase': list(timings),
+            'Seconds': list(timings.values())
+        })
+        st.dataframe(timings_df)
+        
+        counts = {
+            'Stopped Early': stats.get('stopped'),
+            'Variables': stats['n_variables'],
+            'Constraints': stats['n_constraints'],
+            'Nonzeros': stats['n_nonzeros'],
+            'Incremental': stats.get('incremental'),
+            'Nodes': stats['nodes'],
+            'Iterations': stats['iterations'],
+            'MIP Gap': stats['mip_gap']
+        }
+        st.table(pd.DataFrame({
+            'Statistic': list(counts),
+            'Value': ["-" if v is None else str(v) for v in counts.values()]
+        }))
+        
+        presolve = stats.get('presolve')
+        if presolve:
+            st.caption(
+                f"Presolve reduced {presolve['rows']} work types to {presolve['reduced_rows']}: "
+                f"{presolve['fixed_rows']} fixed, {presolve['aggregated_rows']} merged with an identical one, "
+                f"{presolve['dominated_rows']} dropped as dominated."
+            )
+        
+        if stats.get('fallback_from'):
+            st.caption(f"The {stats['fallback_from']} engine gave up; solved with {stats['engine']} instead.")
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
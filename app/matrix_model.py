@@ -0,0 +1,391 @@
+import os
+import queue
+import signal
+import subprocess
+import tempfile
+import threading
+
+import numpy as np
+
+from diagnostics import PhaseTimer, empty_stats, parse_cbc_log, parse_cbc_progress
+from solve_control import relative_gap
+
+# Map the first word of a CBC solution file to a PuLP status string
+CBC_STATUS = {
+    'Optimal': 'Optimal',
+    'Infeasible': 'Infeasible',
+    'Integer': 'Infeasible',
+    'Unbounded': 'Unbounded',
+    'Stopped': 'Not Solved'
+}
+
+# Seconds between checks for a stop request while CBC runs
+CBC_POLL_INTERVAL = 0.1
+
+def build_matrix_model(objective, lower, upper, rows, cols, values, rhs, row_names=None):
+    """
+    Build an integer program in matrix form: maximize c'x subject to Ax <= b.
+    
+    Variables are identified by position only, so work types with the same
+    name stay distinct. The constraint matrix is given in coordinate form.
+    
+    Args:
+        objective (np.ndarray): Objective coefficient per variable
+        lower (np.ndarray): Lower bound per variable
+        upper (np.ndarray): Upper bound per variable (np.inf for none)
+        rows (np.ndarray): Row index of each nonzero of A
+        cols (np.ndarray): Column index of each nonzero of A
+        values (np.ndarray): Value of each nonzero of A
+        rhs (np.ndarray): Right-hand side per constraint row
+        row_names (list): Constraint names (default R0, R1, ...)
+    
+    Returns:
+        dict: Matrix model with objective, bounds, sparse constraints and rhs
+    """
+    rhs = np.atleast_1d(np.asarray(rhs, dtype=float))
+    if row_names is None:
+        row_names = [f"R{i}" for i in range(len(rhs))]
+    
+    rows = np.asarray(rows, dtype=np.int64)
+    cols = np.asarray(cols, dtype=np.int64)
+    values = np.asarray(values, dtype=float)
+    
+    # The MPS COLUMNS section lists the nonzeros column by column
+    order = np.lexsort((rows, cols))
+    
+    return {
+        'objective': np.asarray(objective, dtype=float),
+        'lower': np.asarray(lower, dtype=float),
+        'upper': np.asarray(upper, dtype=float),
+        'rows': rows[order],
+        'cols': cols[order],
+        'values': values[order],
+        'rhs': rhs,
+        'row_names': list(row_names)
+    }
+
+def build_budget_model(costs, priorities, min_units, max_units, total_budget):
+    """
+    Build the single-budget work allocation model from column arrays.
+    
+    Args:
+        costs (np.ndarray): Cost per unit of each work type
+        priorities (np.ndarray): Priority score of each work type
+        min_units (np.ndarray): Minimum required units of each work type
+        max_units (np.ndarray): Maximum possible units of each work type
+        total_budget (float): Total available budget
+    
+    Returns:
+        dict: Matrix model (see build_matrix_model)
+    """
+    costs = np.asarray(costs, dtype=float)
+    n = len(costs)
+    
+    return build_matrix_model(
+        objective=priorities,
+        lower=min_units,
+        upper=max_units,
+        rows=np.zeros(n, dtype=np.int64),
+        cols=np.arange(n),
+        values=costs,
+        rhs=[total_budget],
+        row_names=['Budget_Constraint']
+    )
+
+def update_budget_model(model, index, costs=None, priorities=None, min_units=None, max_units=None, total_budget=None):
+    """
+    Change coefficients and bounds of a single-budget model in place.
+    
+    The model keeps its arrays, so the next solve skips the build; adding
+    or removing work types still needs a new model.
+    
+    Args:
+        model (dict): Model from build_budget_model
+        index (array-like): Positions of the work types to change
+        costs, priorities, min_units, max_units (array-like): New values
+            for those work types (None leaves a column unchanged)
+        total_budget (float): New budget (None leaves it unchanged)
+    
+    Returns:
+        dict: The same model
+    """
+    index = np.asarray(index, dtype=np.int64)
+    if costs is not None:
+        # The budget row has exactly one nonzero per column, in column order
+        model['values'][np.searchsorted(model['cols'], index)] = costs
+    if priorities is not None:
+        model['objective'][index] = priorities
+    if min_units is not None:
+        model['lower'][index] = min_units
+    if max_units is not None:
+        model['upper'][index] = max_units
+    if total_budget is not None:
+        model['rhs'][0] = total_budget
+    return model
+
+def write_mps(model, path):
+    """
+    Write a matrix model to a free-format MPS file in bulk.
+    
+    All lines of a section are formatted with vectorized string operations
+    rather than one Python object per variable.
+    
+    Args:
+        model (dict): Matrix model (see build_matrix_model)
+        path (str): Output file path
+    """
+    n = len(model['objective'])
+    names = np.char.add('x', np.arange(n).astype(str))
+    row_names = np.array(model['row_names'])
+    
+    # Objective entries for every variable, then the constraint nonzeros,
+    # merged so each column's entries are contiguous
+    entry_col = np.concatenate((np.arange(n), model['cols']))
+    entry_row = np.concatenate((np.full(n, 'OBJ'), row_names[model['rows']]))
+    entry_val = np.concatenate((model['objective'], model['values']))
+    order = np.argsort(entry_col, kind='stable')
+    
+    columns = _join_fields('    ', names[entry_col[order]], entry_row[order], _format_numbers(entry_val[order]))
+    rhs = _join_fields('    RHS ', row_names, _format_numbers(model['rhs']))
+    
+    finite = np.isfinite(model['lower'])
+    lower = _join_fields(' LO BND ', names[finite], _format_numbers(model['lower'][finite]))
+    minus_infinity = np.char.add(' MI BND ', names[~finite])
+    finite = np.isfinite(model['upper'])
+    upper = _join_fields(' UP BND ', names[finite], _format_numbers(model['upper'][finite]))
+    plus_infinity = np.char.add(' PL BND ', names[~finite])
+    
+    with open(path, 'w') as f:
+        f.write("NAME Utility_Work_Optimization\nROWS\n N OBJ\n")
+        f.write(''.join(np.char.add(np.char.add(' L ', row_names), '\n')))
+        f.write("COLUMNS\n    MARKER 'MARKER' 'INTORG'\n")
+        _write_lines(f, columns)
+        f.write("    MARKER 'MARKER' 'INTEND'\nRHS\n")
+        _write_lines(f, rhs)
+        f.write("BOUNDS\n")
+        _write_lines(f, lower)
+        _write_lines(f, minus_infinity)
+        _write_lines(f, upper)
+        _write_lines(f, plus_infinity)
+        f.write("ENDATA\n")
+
+def write_start(path, start):
+    """
+    Write a starting allocation in the CBC solution format read by -mips.
+    
+    Args:
+        path (str): Output file path
+        start (array-like): Value of every variable
+    """
+    values = np.asarray(start, dtype=float).tolist()
+    with open(path, 'w') as f:
+        f.write("Stopped on time - objective value 0\n")
+        f.write(''.join(f"{i} x{i} {value:.12g} 0\n" for i, value in enumerate(values)))
+
+def cbc_path():
+    """Path of the CBC binary bundled with PuLP, which is imported on first use."""
+    from pulp import PULP_CBC_CMD
+    return PULP_CBC_CMD().path
+
+def solve_matrix_model(model, msg=False, timer=None, control=None, start=None):
+    """
+    Solve a matrix model with the CBC binary bundled with PuLP.
+    
+    Args:
+        model (dict): Matrix model (see build_matrix_model)
+        msg (bool): Show the CBC log
+        timer (PhaseTimer): Timer to charge the build, solve and extract
+            phases to (default: a new one)
+        control (solve_control.SolveControl): Time limit, gap target, stop
+            request and incumbent callback. CBC only reports the objective
+            of an incumbent while it runs, so the callback gets results
+            with `allocation` set to None.
+        start (array-like): Feasible values of the variables to start the
+            search from (a MIP start)
+    
+    Returns:
+        dict: Optimization results containing:
+            - status: Optimization status ('Feasible' if the search was
+              stopped early with a solution)
+            - allocation: List of units per variable
+            - objective_value: Objective value achieved
+            - stats: Solver statistics (see diagnostics.empty_stats)
+    """
+    timer = timer or PhaseTimer()
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        mps_path = os.path.join(tmp, 'model.mps')
+        solution_path = os.path.join(tmp, 'model.sol')
+        write_mps(model, mps_path)
+        command = [cbc_path(), mps_path]
+        if start is not None:
+            start_path = os.path.join(tmp, 'start.sol')
+            write_start(start_path, start)
+            command += ['-mips', start_path]
+        timer.lap('build')
+        
+        if control is None:
+            command += ['-max', '-solve', '-solution', solution_path]
+            log = subprocess.run(command, check=True, stdout=subprocess.PIPE, text=True).stdout
+        else:
+            if control.remaining() is not None:
+                # CBC reads a zero time limit as no limit
+                command += ['-sec', str(max(control.remaining(), 0.01))]
+            if control.mip_gap is not None:
+                command += ['-ratioGap', str(control.mip_gap)]
+            command += ['-max', '-solve', '-solution', solution_path]
+            log = _run_cbc(command, control)
+        timer.lap('solve')
+        if msg:
+            print(log)
+        
+        if not os.path.exists(solution_path):
+            raise RuntimeError("CBC did not write a solution; check the work types for missing or invalid values")
+        
+        result = read_solution(solution_path, model)
+        timer.lap('extract')
+    
+    cbc_stats = parse_cbc_log(log)
+    if cbc_stats['solver_seconds'] is not None:
+        timer.split('solve', 'solver_start', cbc_stats['solver_seconds'])
+    
+    result['stats'] = model_stats(model, engine='matrix', method='cbc')
+    result['stats'].update(
+        nodes=cbc_stats['nodes'],
+        iterations=cbc_stats['iterations'],
+        mip_gap=cbc_stats['mip_gap'],
+        stopped=cbc_stats['stopped'],
+        timings=timer.finish()
+    )
+    return result
+
+def _run_cbc(command, control):
+    """
+    Run CBC while relaying incumbents and honouring stop requests.
+    
+    A stop request interrupts CBC like Ctrl-C, which makes it write the
+    best solution found so far.
+    
+    Returns:
+        str: CBC standard output
+    """
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, text=True)
+    lines = queue.Queue()
+    
+    def read_output():
+        for line in process.stdout:
+            lines.put(line)
+        lines.put(None)
+    
+    reader = threading.Thread(target=read_output, daemon=True)
+    reader.start()
+    
+    log = []
+    best = {'objective_value': None, 'bound': None}
+    interrupted = False
+    try:
+        while True:
+            try:
+                line = lines.get(timeout=CBC_POLL_INTERVAL)
+            except queue.Empty:
+                line = ''
+            if line is None:
+                break
+            log.append(line)
+            
+            progress = parse_cbc_progress(line)
+            if progress:
+                improved = 'objective_value' in progress and (
+                    best['objective_value'] is None or progress['objective_value'] > best['objective_value']
+                )
+                best.update(progress)
+                if improved:
+                    control.report(_incumbent_result(best, control))
+            
+            if not interrupted and control.check() == 'user':
+                process.send_signal(signal.SIGINT)
+                interrupted = True
+    finally:
+        # Never leave CBC running if the caller is interrupted
+        if process.poll() is None and not interrupted:
+            process.kill()
+        process.wait()
+        reader.join()
+    
+    if process.returncode != 0:
+        raise subprocess.CalledProcessError(process.returncode, command, ''.join(log))
+    return ''.join(log)
+
+def _incumbent_result(best, control):
+    """Result passed to the incumbent callback while CBC is running."""
+    stats = empty_stats()
+    stats.update(engine='matrix', method='cbc', timings={'total': control.elapsed()})
+    if best['bound'] is not None:
+        stats['mip_gap'] = relative_gap(best['objective_value'], best['bound'])
+    return {
+        'status': 'Feasible',
+        'allocation': None,
+        'objective_value': best['objective_value'],
+        'stats': stats
+    }
+
+def model_stats(model, **fields):
+    """Stats dict pre-filled with the size of a matrix model."""
+    stats = empty_stats()
+    stats.update(
+        n_variables=len(model['objective']),
+        n_constraints=len(model['rhs']),
+        n_nonzeros=int(np.count_nonzero(model['values']))
+    )
+    stats.update(fields)
+    return stats
+
+def read_solution(path, model):
+    """
+    Read a CBC solution file into a result dict.
+    
+    Args:
+        path (str): CBC solution file
+        model (dict): Matrix model the solution belongs to
+    
+    Returns:
+        dict: Optimization results (see solve_matrix_model)
+    """
+    with open(path) as f:
+        header = f.readline()
+        lines = f.read().replace('**', '').split('\n')
+    
+    status = CBC_STATUS.get(header.split()[0], 'Undefined') if header.strip() else 'Not Solved'
+    if status == 'Not Solved' and 'objective value' in header:
+        # Stopped early, but with an integer solution
+        status = 'Feasible'
+    
+    values = np.zeros(len(model['objective']))
+    for line in lines:
+        fields = line.split()
+        if len(fields) >= 3 and fields[1].startswith('x'):
+            values[int(fields[1][1:])] = float(fields[2])
+    
+    allocation = np.round(values).astype(np.int64)
+    
+    return {
+        'status': status,
+        'allocation': allocation.tolist(),
+        'objective_value': float(np.dot(model['objective'], allocation))
+    }
+
+def _format_numbers(values):
+    """Format numbers for MPS with full precision."""
+    return np.char.mod('%.12g', np.asarray(values, dtype=float))
+
+def _join_fields(prefix, *fields):
+    """Join string arrays field by field with single spaces."""
+    line = np.char.add(prefix, fields[0])
+    for field in fields[1:]:
+        line = np.char.add(np.char.add(line, ' '), field)
+    return line
+
+def _write_lines(f, lines):
+    if len(lines) > 0:
+        f.write('\n'.join(lines.tolist()))
+        f.write('\n')
@@ -0,0 +1,329 @@
+"""
+Multi-period planning over a horizon of period budgets.
+
+Programmes run for several years with a budget per year. One MIP over
+every period grows with the horizon, so the horizon is planned as a
+rolling sequence of single-budget problems in the data model of
+optimize_work_allocation:
+    - every period allows up to `max_units` of each work type and requires
+      `min_units` more, which may be done up to `window - 1` periods later
+      (an optional `window` column; by default work is due in the period
+      it is required)
+    - required units a period does not do are carried over as backlog and
+      done oldest first; units past their window stay due as overdue
+    - before a period is solved, backlog due in the next `lookahead`
+      periods that their budgets cannot fund is pulled forward into it
+    - each period is solved from the previous period's allocation as the
+      starting incumbent (a MIP start for CBC)
+Independent what-if horizons run in parallel processes with
+iter_horizons(). horizon_sensitivity() yields rows in the shape of
+optimization.iter_sensitivity, and save_plan_scenarios() stores each
+period as a scenario, so plans feed the sensitivity and scenario views.
+"""
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import ExitStack
+from functools import partial
+
+import numpy as np
+import pandas as pd
+
+from diagnostics import PhaseTimer, empty_stats, notify_solve_hooks
+from optimization import ENGINES, _model_columns, _optimize, _optional_column
+from solve_control import SolveControl
+
+# Periods looked ahead for backlog to pull forward (1 looks at the
+# current period only)
+LOOKAHEAD = 3
+
+SUMMARY_COLUMNS = [
+    'Period', 'Budget', 'Spend', 'Priority Value', 'Due Units', 'Pulled Forward', 'Overdue Units', 'Backlog Units', 'Status'
+]
+
+def plan_horizon(work_df, budgets, engine='auto', lookahead=LOOKAHEAD, time_limit=None, mip_gap=None,
+                 starts=None, on_progress=None, stop_event=None):
+    """
+    Plan work over consecutive periods, one budget each.
+    
+    Every period's allocation is optimal for its budget given the earlier
+    periods (or within mip_gap); the rolling horizon does not prove the
+    plan optimal over the whole horizon.
+    
+    Args:
+        work_df (pd.DataFrame): Work types with name, cost, priority,
+            min_units (required each period) and max_units (possible each
+            period), and optionally window (periods a requirement may
+            take, default 1)
+        budgets (array-like): Budget of each period
+        engine (str): Solver engine for each period (see
+            optimize_work_allocation)
+        lookahead (int): Periods, counting the current one, whose due
+            backlog is checked against their budgets
+        time_limit (float): Seconds allowed per period
+        mip_gap (float): Relative gap at which each period's search stops
+        starts (array-like): Allocations per period from an earlier plan to
+            start each period's search from, instead of the previous period
+        on_progress (callable): Called with the number of periods planned
+        stop_event (threading.Event): Set to stop after the current period;
+            the plan then covers the periods done so far
+    
+    Returns:
+        dict: Plan with:
+            - status: 'Infeasible' if any required units went overdue,
+              'Feasible' if a period was not solved to optimality,
+              otherwise 'Optimal'
+            - allocations: np.ndarray of units, periods x work types
+            - objective_value: Priority value over all periods
+            - periods: Optimization result of each period
+            - summary: DataFrame with SUMMARY_COLUMNS, one row per period
+            - backlog: Required units still open after the horizon and not
+              yet due
+            - stats: engine, method 'rolling_horizon', periods, warm_starts
+              and timings
+    
+    Raises:
+        ValueError: If the engine is unknown, there are no budgets or the
+            lookahead is below 1
+    """
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown optimization engine: {engine}")
+    budgets = np.asarray(budgets, dtype=float)
+    if len(budgets) == 0:
+        raise ValueError("Give at least one period budget")
+    if lookahead < 1:
+        raise ValueError("The lookahead must be at least 1 period")
+    
+    timer = PhaseTimer()
+    costs, priorities, min_units, max_units = _model_columns(work_df)
+    min_units = min_units.astype(np.int64)
+    max_units = max_units.astype(np.int64)
+    windows = np.maximum(_optional_column(work_df, 'window', 1).astype(np.int64), 1)
+    n_periods, n = len(budgets), len(work_df)
+    columns = {'name': work_df['name'].to_numpy(), 'cost': costs, 'priority': priorities}
+    timer.lap('extract_data')
+    
+    # Required units by the period they are due in; the last row holds
+    # requirements due after the horizon
+    pending = np.zeros((n_periods + 1, n), dtype=np.int64)
+    limited = any(option is not None for option in (time_limit, mip_gap, stop_event))
+    
+    allocations, periods, rows = [], [], []
+    start = None
+    warm_starts = 0
+    for t in range(n_periods):
+        if t > 0 and stop_event is not None and stop_event.is_set():
+            break
+        
+        np.add.at(pending, (np.minimum(t + windows - 1, n_periods), np.arange(n)), min_units)
+        overdue = pending[:t].sum(axis=0)
+        pending[t] += overdue
+        pending[:t] = 0
+        
+        due = np.minimum(pending[t], max_units)
+        pulled = _pull_forward(pending, t, due, costs, max_units, min_units, windows, budgets, lookahead)
+        if starts is not None and t < len(starts):
+            start = starts[t]
+        
+        # Limits apply to each period's search
+        control = SolveControl(time_limit, mip_gap, stop_event=stop_event) if limited else None
+        warm_starts += start is not None
+        result = _solve_period(columns, budgets[t], due, pulled, max_units, engine, control, start)
+        timer.merge(result['stats']['timings'])
+        periods.append(result)
+        
+        allocation = np.asarray(result['allocation'], dtype=np.int64)
+        allocations.append(allocation)
+        # Work done clears the requirements due soonest first
+        cleared = np.minimum(np.cumsum(pending[t:], axis=0), allocation)
+        pending[t:] -= np.diff(cleared, axis=0, prepend=0)
+        
+        rows.append([
+            t + 1, budgets[t], float(np.dot(costs, allocation)), result['objective_value'], int(due.sum()),
+            int(pulled.sum()), int(pending[t].sum()), int(pending[t + 1:].sum()), result['status']
+        ])
+        start = allocation
+        if on_progress is not None:
+            on_progress(t + 1)
+    
+    allocations = np.array(allocations, dtype=np.int64).reshape(len(allocations), n)
+    summary = pd.DataFrame(rows, columns=SUMMARY_COLUMNS)
+    if (summary['Overdue Units'] > 0).any():
+        status = 'Infeasible'
+    elif all(result['status'] == 'Optimal' for result in periods):
+        status = 'Optimal'
+    else:
+        status = 'Feasible'
+    
+    stats = empty_stats()
+    stats.update(
+        engine=engine,
+        method='rolling_horizon',
+        n_variables=n,
+        n_constraints=1,
+        periods=len(periods),
+        warm_starts=warm_starts,
+        timings=timer.finish()
+    )
+    return {
+        'status': status,
+        'allocations': allocations,
+        'objective_value': float(sum(result['objective_value'] for result in periods)),
+        'periods': periods,
+        'summary': summary,
+        'backlog': pending[n_periods],
+        'stats': stats
+    }
+
+def iter_horizons(work_df, horizons, engine='auto', lookahead=LOOKAHEAD, workers=None, time_limit=None, mip_gap=None):
+    """
+    Plan independent horizons, such as what-if budget profiles.
+    
+    Like iter_sensitivity, plans run in this process or on a pool of
+    spawned worker processes and are yielded in order, and closing the
+    generator early drops horizons not yet started.
+    
+    Args:
+        work_df (pd.DataFrame): Work types (see plan_horizon)
+        horizons (list): Budgets per period of each horizon
+        engine (str): Solver engine for each period
+        lookahead (int): Periods looked ahead (see plan_horizon)
+        workers (int): Number of worker processes (None or 1 plans serially)
+        time_limit (float): Seconds allowed per period
+        mip_gap (float): Relative gap at which each period's search stops
+    
+    Yields:
+        dict: Plan of each horizon (see plan_horizon)
+    """
+    plan = partial(_plan_worker, work_df, engine, lookahead, time_limit, mip_gap)
+    
+    with ExitStack() as stack:
+        if workers is None or workers <= 1 or len(horizons) <= 1:
+            planned = map(plan, horizons)
+        else:
+            context = multiprocessing.get_context('spawn')
+            pool = stack.enter_context(ProcessPoolExecutor(max_workers=workers, mp_context=context))
+            stack.callback(pool.shutdown, wait=False, cancel_futures=True)
+            planned = pool.map(plan, horizons)
+        
+        for result in planned:
+            for period in result['periods']:
+                notify_solve_hooks(period)
+            yield result
+
+def horizon_sensitivity(work_df, budgets, steps=10, engine='auto', lookahead=LOOKAHEAD, workers=None):
+    """
+    Yield sensitivity rows for the horizon with every budget scaled alike.
+    
+    Budgets are scaled from 50% to 150%, as in iter_sensitivity, and the
+    rows have the same shape, so the sensitivity charts and tables show
+    them unchanged.
+    
+    Yields:
+        dict: Row with budget (total over the horizon), objective_value and
+            budget_utilization
+    """
+    budgets = np.asarray(budgets, dtype=float)
+    scales = np.linspace(0.5, 1.5, steps)
+    costs = work_df['cost'].to_numpy(dtype=float)
+    
+    plans = iter_horizons(work_df, [budgets * scale for scale in scales], engine, lookahead, workers)
+    try:
+        for scale, plan in zip(scales, plans):
+            total = float(budgets.sum() * scale)
+            spend = float((plan['allocations'] @ costs).sum())
+            yield {
+                'budget': total,
+                'objective_value': plan['objective_value'],
+                'budget_utilization': spend / total if total > 0 else 0
+            }
+    finally:
+        plans.close()
+
+def save_plan_scenarios(store, work_df, plan, prefix="Plan"):
+    """
+    Save each period of a plan as a scenario named "<prefix> P<period>".
+    
+    Args:
+        store (ScenarioStore): Store to save into
+        work_df (pd.DataFrame): Work types of the plan
+        plan (dict): Result of plan_horizon
+        prefix (str): Start of the scenario names
+    
+    Returns:
+        list: Names of the saved scenarios
+    """
+    names = []
+    for t, (allocation, result) in enumerate(zip(plan['allocations'], plan['periods'])):
+        name = f"{prefix} P{t + 1}"
+        store.save(name, work_df, allocation, result['objective_value'])
+        names.append(name)
+    return names
+
+def _solve_period(columns, budget, due, pulled, max_units, engine, control, start):
+    """
+    Solve one period, dropping pulled-forward units and then due units that do not fit.
+    
+    When even the due units cannot all be funded, the most valuable of them
+    are done and the budget left is filled as usual.
+    """
+    def solve(lower):
+        work_df = pd.DataFrame(dict(columns, min_units=lower, max_units=max_units))
+        return _optimize(work_df, budget, engine, control, start=start)
+    
+    result = None
+    if pulled.any():
+        result = solve(due + pulled)
+    if result is None or result['status'] == 'Infeasible':
+        result = solve(due)
+    if result['status'] == 'Infeasible':
+        funded = _optimize(pd.DataFrame(dict(columns, min_units=0, max_units=due)), budget, engine, control, start=start)
+        timings = funded['stats']['timings']
+        result = solve(np.asarray(funded['allocation'], dtype=np.int64))
+        for phase, seconds in timings.items():
+            result['stats']['timings'][phase] = result['stats']['timings'].get(phase, 0.0) + seconds
+    return result
+
+def _pull_forward(pending, t, due, costs, max_units, min_units, windows, budgets, lookahead):
+    """
+    Backlog units to do in period t because later budgets cannot fund them.
+    
+    Walking back from the end of the lookahead, each period passes on the
+    spend of its due work that its budget cannot cover. The spend passed
+    on to period t is met from the backlog due soonest, within the budget
+    left in period t.
+    
+    Returns:
+        np.ndarray: Units per work type
+    """
+    last = min(t + lookahead, len(budgets))
+    pulled = np.zeros(len(costs), dtype=np.int64)
+    if last <= t + 1:
+        return pulled
+    
+    excess = 0.0
+    for k in range(last - 1, t, -1):
+        # Requirements arriving after period t and due in period k
+        arriving = k - windows + 1 > t
+        due_k = pending[k] + np.where(arriving, min_units, 0)
+        excess = max(float(np.dot(costs, np.minimum(due_k, max_units))) + excess - budgets[k], 0.0)
+    
+    target = min(excess, budgets[t] - float(np.dot(costs, due)))
+    if target <= 0:
+        return pulled
+    
+    # Backlog due soonest first, within each work type's capacity this period
+    backlog = np.diff(np.minimum(np.cumsum(pending[t + 1:last], axis=0), max_units - due), axis=0, prepend=0)
+    units = backlog.ravel()
+    spend = units * np.tile(costs, last - t - 1)
+    before = np.cumsum(spend) - spend
+    taken = np.where(before + spend <= target, units, 0)
+    partial_block = np.flatnonzero((before < target) & (before + spend > target))
+    if len(partial_block):
+        i = partial_block[0]
+        cost = costs[i % len(costs)]
+        room = budgets[t] - float(np.dot(costs, due)) - before[i]
+        taken[i] = min(units[i], int(np.ceil((target - before[i]) / cost - 1e-9)), int(np.floor(room / cost + 1e-9)))
+    return taken.reshape(backlog.shape).sum(axis=0)
+
+def _plan_worker(work_df, engine, lookahead, time_limit, mip_gap, budgets):
+    return plan_horizon(work_df, budgets, engine, lookahead, time_limit, mip_gap)
@@ -0,0 +1,392 @@
+"""
+Work allocation under several resources, with per-region limits.
+
+Every work type consumes each resource per unit: the budget is the
+`cost` column, and crew hours, equipment or any other resource is a
+further column of the same name. Limits apply within each region
+(region caps) and across all regions (linking limits).
+
+Problems with up to a couple of hundred regions are solved as one MIP.
+With more regions the model is solved by Lagrangian decomposition: the linking limits are priced into
+the objective, so every region becomes an independent subproblem solved
+in parallel, and the prices are updated by subgradient steps until the
+dual bound and the best repaired allocation meet. Work per iteration
+grows linearly with the number of regions.
+"""
+import math
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from diagnostics import PhaseTimer, empty_stats, notify_solve_hooks
+from matrix_model import build_matrix_model, model_stats, solve_matrix_model
+from optimization import _optimize
+from solve_control import SolveControl, relative_gap
+
+METHODS = ('auto', 'monolithic', 'lagrangian')
+
+# 'auto' decomposes once there are this many regions. Below it CBC solves
+# the single MIP faster and to proven optimality (2.7s against 14s for the
+# decomposition at 192 regions of 50 work types); at 256 regions the MIP
+# takes minutes and the decomposition 21s
+DECOMPOSE_MIN_REGIONS = 256
+
+# Subgradient iterations before the best allocation found is returned
+LAGRANGIAN_MAX_ITERATIONS = 100
+
+# Relative gap at which decomposition stops when no gap target is given
+LAGRANGIAN_GAP = 1e-3
+
+# Iterations without a better dual bound before the step size is halved
+STEP_PATIENCE = 5
+
+# Label of the single region used when work types have no region column
+DEFAULT_REGION = 'all'
+
+def optimize_multi_resource(work_df, limits, region_limits=None, region_column='region', method='auto',
+                            workers=None, time_limit=None, mip_gap=None, max_iterations=LAGRANGIAN_MAX_ITERATIONS):
+    """
+    Allocate work units under linking and per-region resource limits.
+    
+    Args:
+        work_df (pd.DataFrame): Work types with name, cost, priority,
+            min_units and max_units, a region column, and one column of
+            per-unit consumption for every limited resource other than cost
+        limits (dict): Resource name to its limit across all regions, e.g.
+            {'cost': 1000000, 'crew_hours': 5000}
+        region_limits (dict or pd.DataFrame): Region to {resource: limit},
+            or a DataFrame indexed by region with one column per resource
+            (missing or NaN entries are unlimited)
+        region_column (str): Column naming each work type's region; without
+            it all work types share one region
+        method (str): 'monolithic' (one MIP), 'lagrangian' (decompose by
+            region) or 'auto' (decompose from DECOMPOSE_MIN_REGIONS regions)
+        workers (int): Threads solving region subproblems (default: CPUs)
+        time_limit (float): Seconds before the best allocation so far is
+            returned
+        mip_gap (float): Relative gap at which to stop
+        max_iterations (int): Subgradient iterations of the decomposition
+    
+    Returns:
+        dict: Optimization results (see optimization.optimize_work_allocation)
+            plus resource_usage (resource to amount used across regions).
+            Stats report method 'monolithic' or 'lagrangian' and the number
+            of regions; a decomposition also reports its dual bound.
+    
+    Raises:
+        ValueError: If a limited resource has no column or negative
+            consumption, or the method is unknown
+    """
+    if method not in METHODS:
+        raise ValueError(f"Unknown method: {method}. Expected one of {METHODS}")
+    
+    timer = PhaseTimer()
+    problem = build_problem(work_df, limits, region_limits, region_column)
+    timer.lap('build')
+    
+    control = SolveControl(time_limit=time_limit, mip_gap=mip_gap)
+    if method == 'auto':
+        method = 'lagrangian' if len(problem['regions']) >= DECOMPOSE_MIN_REGIONS else 'monolithic'
+    
+    if not _minimum_feasible(problem):
+        result = _result(problem, 'Infeasible', problem['lower'].copy(), empty_stats())
+    elif method == 'monolithic':
+        result = _solve_monolithic(problem, control)
+    else:
+        result = _solve_lagrangian(problem, control, workers, max_iterations)
+    timer.lap('solve')
+    
+    result['stats'].update(engine='multi_resource', method=method, regions=len(problem['regions']))
+    result['stats']['timings'] = timer.finish()
+    notify_solve_hooks(result)
+    return result
+
+def build_problem(work_df, limits, region_limits=None, region_column='region'):
+    """
+    Collect the arrays of a multi-resource problem.
+    
+    Returns:
+        dict: priorities, lower, upper, resources (names), consumption
+            (work types x resources), caps (linking limit per resource,
+            inf if none), region_of (region position per work type) and
+            regions (list of (label, work type indices, limit per resource))
+    """
+    region_limits = _region_limit_dict(region_limits)
+    resources = list(dict.fromkeys(list(limits) + [r for caps in region_limits.values() for r in caps]))
+    
+    missing = [resource for resource in resources if resource not in work_df.columns]
+    if missing:
+        raise ValueError(f"Work types have no consumption column for: {', '.join(missing)}")
+    
+    consumption = work_df[resources].to_numpy(dtype=float).reshape(len(work_df), len(resources))
+    if (consumption < 0).any() or not np.isfinite(consumption).all():
+        raise ValueError("Resource consumption must be finite and non-negative")
+    
+    if region_column in work_df.columns:
+        labels, region_of = np.unique(work_df[region_column].astype(str).to_numpy(), return_inverse=True)
+    else:
+        labels, region_of = np.array([DEFAULT_REGION]), np.zeros(len(work_df), dtype=np.int64)
+    
+    region_order = np.argsort(region_of, kind='stable')
+    bounds = np.searchsorted(region_of[region_order], np.arange(len(labels) + 1))
+    regions = []
+    for position, label in enumerate(labels):
+        caps = region_limits.get(label, {})
+        regions.append((
+            label,
+            region_order[bounds[position]:bounds[position + 1]],
+            np.array([_limit(caps.get(resource)) for resource in resources])
+        ))
+    
+    return {
+        'priorities': work_df['priority'].to_numpy(dtype=float),
+        'lower': work_df['min_units'].to_numpy(dtype=float).round().astype(np.int64),
+        'upper': work_df['max_units'].to_numpy(dtype=float).round().astype(np.int64),
+        'resources': resources,
+        'consumption': consumption,
+        'caps': np.array([_limit(limits.get(resource)) for resource in resources]),
+        'region_of': region_of,
+        'regions': regions
+    }
+
+def build_monolithic_model(problem):
+    """
+    Build the whole problem as one matrix model.
+    
+    Rows are the finite linking limits followed by the finite limits of
+    each region.
+    """
+    consumption = problem['consumption']
+    rows, cols, values, rhs, names = [], [], [], [], []
+    
+    def add_row(items, k, cap, name):
+        used = items[consumption[items, k] != 0]
+        rows.append(np.full(len(used), len(rhs), dtype=np.int64))
+        cols.append(used)
+        values.append(consumption[used, k])
+        rhs.append(cap)
+        names.append(name)
+    
+    everything = np.arange(len(problem['priorities']))
+    for k, resource in enumerate(problem['resources']):
+        if np.isfinite(problem['caps'][k]):
+            add_row(everything, k, problem['caps'][k], f"Total_{resource}")
+    for position, (_, items, caps) in enumerate(problem['regions']):
+        for k, resource in enumerate(problem['resources']):
+            if np.isfinite(caps[k]):
+                add_row(items, k, caps[k], f"Region{position}_{resource}")
+    
+    empty = np.zeros(0, dtype=np.int64)
+    return build_matrix_model(
+        objective=problem['priorities'],
+        lower=problem['lower'],
+        upper=problem['upper'],
+        rows=np.concatenate(rows or [empty]),
+        cols=np.concatenate(cols or [empty]),
+        values=np.concatenate(values or [np.zeros(0)]),
+        rhs=rhs,
+        row_names=names
+    )
+
+def _solve_monolithic(problem, control):
+    model = build_monolithic_model(problem)
+    if len(model['rhs']) == 0:
+        # Nothing is limited: fund every work type with positive priority
+        allocation = np.where(problem['priorities'] > 0, problem['upper'], problem['lower'])
+        return _result(problem, 'Optimal', allocation, model_stats(model, mip_gap=0.0))
+    
+    solved = solve_matrix_model(model, control=control if control.limited else None)
+    return _result(problem, solved['status'], np.asarray(solved['allocation'], dtype=np.int64), solved['stats'])
+
+def _solve_lagrangian(problem, control, workers, max_iterations):
+    """
+    Price the linking limits and solve the regions independently.
+    
+    Every iteration solves all region subproblems at the current prices
+    (an upper bound on the optimum), repairs their allocations into a
+    feasible one (a lower bound), and moves the prices along the
+    subgradient with a Polyak step.
+    """
+    consumption = problem['consumption']
+    linked = np.flatnonzero(np.isfinite(problem['caps']))
+    linked_use = consumption[:, linked]
+    linked_caps = problem['caps'][linked]
+    target_gap = control.mip_gap if control.mip_gap is not None else LAGRANGIAN_GAP
+    
+    prices = np.zeros(len(linked))
+    best = _repair(problem, problem['lower'])
+    best_value = float(problem['priorities'] @ best)
+    bound = math.inf
+    step_scale, stalled = 2.0, 0
+    stats = empty_stats()
+    stats['iterations'] = 0
+    
+    with ThreadPoolExecutor(max_workers=workers or os.cpu_count() or 1) as pool:
+        for iteration in range(max_iterations):
+            reduced = problem['priorities'] - linked_use @ prices
+            units = problem['lower'].copy()
+            dual = float(prices @ linked_caps)
+            for items, chosen, value in pool.map(lambda region: _solve_region(problem, region, reduced), problem['regions']):
+                units[items] = chosen
+                dual += value
+            stats['iterations'] = iteration + 1
+            
+            if dual < bound - 1e-9 * max(abs(dual), 1.0):
+                bound, stalled = dual, 0
+            else:
+                stalled += 1
+                if stalled >= STEP_PATIENCE:
+                    step_scale, stalled = step_scale / 2, 0
+            
+            candidate = _repair(problem, units)
+            value = float(problem['priorities'] @ candidate)
+            if value > best_value:
+                best, best_value = candidate, value
+                control.report(_result(problem, 'Feasible', best.copy(), empty_stats()))
+            
+            if relative_gap(best_value, bound) <= target_gap:
+                if control.mip_gap is not None:
+                    control.stopped = 'gap'
+                break
+            if control.check():
+                break
+            
+            slack = linked_caps - units @ linked_use
+            norm = float(slack @ slack)
+            if norm == 0:
+                break
+            prices = np.maximum(prices - step_scale * (bound - best_value) / norm * slack, 0.0)
+    
+    stats.update(mip_gap=relative_gap(best_value, bound), bound=bound, stopped=control.stopped)
+    status = 'Optimal' if stats['mip_gap'] <= 1e-9 or control.stopped == 'gap' else 'Feasible'
+    return _result(problem, status, best, stats)
+
+def _solve_region(problem, region, reduced):
+    """
+    Solve one region's subproblem at the current prices.
+    
+    Work types whose priced priority is not positive stay at their
+    minimum, which never breaks a limit since consumption is
+    non-negative. The rest form a bounded knapsack if the region has one
+    limit and a small MIP otherwise.
+    
+    Returns:
+        tuple: (work type indices, units chosen, priced objective value)
+    """
+    _, items, caps = region
+    lower, upper = problem['lower'][items], problem['upper'][items]
+    gain = reduced[items]
+    chosen = lower.copy()
+    free = np.flatnonzero((gain > 0) & (upper > lower))
+    limited = np.flatnonzero(np.isfinite(caps))
+    
+    if len(free) and len(limited) == 0:
+        chosen[free] = upper[free]
+    elif len(free):
+        use = problem['consumption'][items][:, limited]
+        room = caps[limited] - lower @ use
+        if len(limited) == 1:
+            block = pd.DataFrame({
+                'cost': use[free, 0],
+                'priority': gain[free],
+                'min_units': 0,
+                'max_units': upper[free] - lower[free]
+            })
+            result = _optimize(block, room[0], 'auto')
+        else:
+            result = solve_matrix_model(build_matrix_model(
+                objective=gain[free],
+                lower=np.zeros(len(free)),
+                upper=upper[free] - lower[free],
+                rows=np.repeat(np.arange(len(limited)), len(free)),
+                cols=np.tile(np.arange(len(free)), len(limited)),
+                values=use[free].T.ravel(),
+                rhs=room
+            ))
+        chosen[free] += np.asarray(result['allocation'], dtype=np.int64)
+    
+    return items, chosen, float(gain @ chosen)
+
+def _repair(problem, units):
+    """
+    Turn any allocation into one that meets every limit.
+    
+    Starting from the minimum units, work types are funded in order of
+    priority per share of the limits they use: first up to `units`, then
+    up to their maximum while room remains.
+    """
+    consumption = problem['consumption']
+    caps = problem['caps']
+    region_caps = np.array([caps for _, _, caps in problem['regions']])
+    region_of = problem['region_of']
+    lower, upper = problem['lower'], problem['upper']
+    
+    allocation = lower.copy()
+    total_room = caps - lower @ consumption
+    region_room = region_caps - np.array([lower[items] @ consumption[items] for _, items, _ in problem['regions']])
+    
+    # Share of each limit a unit takes, summed over the limits a work type is under
+    shares = consumption / np.where(np.isfinite(caps) & (caps > 0), caps, np.inf)
+    shares += consumption / np.where(np.isfinite(region_caps) & (region_caps > 0), region_caps, np.inf)[region_of]
+    efficiency = problem['priorities'] / np.maximum(shares.sum(axis=1), 1e-12)
+    order = np.argsort(-efficiency, kind='stable')
+    order = order[problem['priorities'][order] > 0]
+    
+    for target in (np.minimum(units, upper), upper):
+        for i in order:
+            wanted = target[i] - allocation[i]
+            if wanted <= 0:
+                continue
+            use = consumption[i]
+            positive = use > 0
+            if positive.any():
+                room = np.minimum(total_room, region_room[region_of[i]])[positive]
+                wanted = min(wanted, int(np.floor((room / use[positive]).min() + 1e-9)))
+            if wanted > 0:
+                allocation[i] += wanted
+                total_room -= wanted * use
+                region_room[region_of[i]] -= wanted * use
+    return allocation
+
+def _minimum_feasible(problem):
+    """True if funding only the minimum units meets every limit."""
+    consumption = problem['consumption']
+    lower = problem['lower']
+    tolerance = 1e-9
+    if ((lower @ consumption) > problem['caps'] * (1 + tolerance) + tolerance).any():
+        return False
+    return all(
+        not ((lower[items] @ consumption[items]) > caps * (1 + tolerance) + tolerance).any()
+        for _, items, caps in problem['regions']
+    )
+
+def _result(problem, status, allocation, stats):
+    allocation = np.asarray(allocation, dtype=np.int64)
+    usage = allocation @ problem['consumption']
+    return {
+        'status': status,
+        'allocation': allocation.tolist(),
+        'objective_value': float(problem['priorities'] @ allocation),
+        'resource_usage': {resource: float(used) for resource, used in zip(problem['resources'], usage)},
+        'stats': stats
+    }
+
+def _region_limit_dict(region_limits):
+    """Normalize region limits to {region label: {resource: limit}}."""
+    if region_limits is None:
+        return {}
+    if isinstance(region_limits, pd.DataFrame):
+        region_limits = region_limits.to_dict('index')
+    return {
+        str(region): {resource: limit for resource, limit in caps.items() if _limit(limit) != math.inf}
+        for region, caps in region_limits.items()
+    }
+
+def _limit(value):
+    """A limit as a float, with None and NaN meaning unlimited."""
+    if value is None:
+        return math.inf
+    value = float(value)
+    return math.inf if math.isnan(value) else value
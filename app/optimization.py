@@ -1,8 +1,40 @@
+import bisect
+import copy
+import math
+import multiprocessing
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import ExitStack
+from functools import partial
+
 import numpy as np
 import pandas as pd
-from pulp import LpMaximize, LpProblem, LpVariable, LpStatus, value
 
-def optimize_work_allocation(work_df, total_budget):
+from diagnostics import PhaseTimer, current_cache_status, empty_stats, notify_solve_hooks, parse_cbc_log
+from matrix_model import build_budget_model, solve_matrix_model
+from presolve import postsolve, reduce_problem, reduce_start
+from solve_control import SolveControl, relative_gap
+
+# Upper limit on the size of the dynamic programming table (one bit per
+# budget cell per binary-split item) before the knapsack engine switches
+# to branch-and-bound.
+KNAPSACK_DP_MAX_CELLS = 200_000_000
+
+# Node limit for the branch-and-bound search of the knapsack engine.
+KNAPSACK_NODE_LIMIT = 2_000_000
+
+# Dynamic programs above this many cells first try a short branch-and-bound
+# run, which usually proves optimality long before the table is filled.
+KNAPSACK_DP_QUICK_CELLS = 2_000_000
+KNAPSACK_QUICK_NODE_LIMIT = 50_000
+
+# Branch-and-bound nodes between checks of the time limit and stop request
+KNAPSACK_CHECK_INTERVAL = 1024
+
+ENGINES = ('auto', 'knapsack', 'matrix', 'pulp', 'approx')
+
+def optimize_work_allocation(work_df, total_budget, engine='auto', time_limit=None, mip_gap=None, on_incumbent=None, stop_event=None, presolve=True):
     """
     Optimize work allocation based on priorities, costs, and constraints.
     
@@ -14,55 +46,1071 @@ def optimize_work_allocation(work_df, total_budget):
             - min_units: Minimum required units
             - max_units: Maximum possible units
         total_budget (float): Total available budget
+        engine (str): Solver engine to use:
+            - 'knapsack': Built-in bounded knapsack solver (no subprocess)
+            - 'matrix': Vectorized matrix model written as MPS and solved with CBC
+            - 'pulp': PuLP model solved with CBC
+            - 'auto': Use the knapsack solver when the problem allows it,
+              otherwise the matrix model
+            - 'approx': LP relaxation with greedy repair; fast, with the
+              gap to the relaxation bound in stats (falls back to the
+              matrix model when the knapsack engine does not apply)
+        time_limit (float): Seconds after which the best allocation found
+            so far is returned (None searches until optimal)
+        mip_gap (float): Relative optimality gap at which the search stops
+            (None proves optimality)
+        on_incumbent (callable): Called from the solving thread with a
+            result dict (status 'Feasible') for every improving allocation
+            found during the search. The CBC engines only report the
+            objective value, with `allocation` set to None.
+        stop_event (threading.Event): Set from another thread to stop the
+            search and return the best allocation found so far (not
+            supported by the 'pulp' engine)
+        presolve (bool): Fix forced units, merge identical work types and
+            drop dominated ones before solving (see presolve.py); applies to
+            problems the knapsack engine accepts, whatever the engine. A
+            target gap then applies to the value of the units presolve did
+            not fix, which is stricter.
     
     Returns:
         dict: Optimization results containing:
-            - status: Optimization status
+            - status: Optimization status ('Feasible' if the allocation is
+              not proven optimal: an 'approx' result with a gap, or a search
+              stopped by the time limit or stop_event before reaching the
+              gap target)
             - allocation: List of allocated units for each work type
             - objective_value: Total priority value achieved
+            - stats: Engine, per-phase timings in seconds, solver node and
+              iteration counts, MIP gap, problem size, cache status and why
+              the search stopped early (see diagnostics.empty_stats);
+              stats['presolve'] tells how much presolve shrank the problem
+    """
+    control = None
+    if any(option is not None for option in (time_limit, mip_gap, on_incumbent, stop_event)):
+        control = SolveControl(time_limit, mip_gap, on_incumbent, stop_event)
+    
+    result = _optimize(work_df, total_budget, engine, control, presolve=presolve)
+    notify_solve_hooks(result)
+    return result
+
+def _optimize(work_df, total_budget, engine, control=None, start=None, model=None, presolve=True):
+    """
+    Run optimize_work_allocation without notifying the solve hooks.
+    
+    Args:
+        start (array-like): Allocation to start the exact search from, such
+            as the optimum before an edit; units that no longer fit are
+            dropped
+        model (dict): Matrix model of this exact problem to solve instead
+            of building a new one when the matrix engine is used (presolve
+            is skipped)
+        presolve (bool): Solve the presolved problem when it applies
+    """
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown optimization engine: {engine}")
+    if presolve and model is None and knapsack_supported(work_df, total_budget):
+        return _optimize_presolved(work_df, total_budget, engine, control, start)
+    
+    timer = PhaseTimer()
+    fallback_from = None
+    
+    if engine == 'auto':
+        engine = 'knapsack' if knapsack_supported(work_df, total_budget) else 'matrix'
+        timer.lap('extract_data')
+    
+    if engine == 'approx':
+        supported = knapsack_supported(work_df, total_budget)
+        timer.lap('extract_data')
+        if supported:
+            result = solve_approx(work_df, total_budget, timer)
+        else:
+            engine, fallback_from = 'matrix', 'approx'
+    
+    if engine == 'knapsack':
+        if not knapsack_supported(work_df, total_budget):
+            raise ValueError("Problem cannot be solved by the knapsack engine")
+        result = solve_knapsack(work_df, total_budget, timer, control, start)
+        if result is None:
+            # Branch-and-bound gave up before proving optimality
+            engine, fallback_from = 'matrix', 'knapsack'
+    
+    if engine == 'matrix':
+        if model is None:
+            columns = _model_columns(work_df)
+            timer.lap('extract_data')
+            model = build_budget_model(*columns, total_budget)
+            timer.lap('build')
+        if start is not None:
+            start = _feasible_start(model, start)
+        result = solve_matrix_model(model, timer=timer, control=control, start=start)
+    elif engine == 'pulp':
+        result = solve_pulp(work_df, total_budget, timer, control)
+    
+    result['stats']['timings'] = timer.finish()
+    result['stats']['cache'] = current_cache_status()
+    if fallback_from is not None:
+        result['stats']['fallback_from'] = fallback_from
+    return result
+
+def _optimize_presolved(work_df, total_budget, engine, control=None, start=None):
+    """Presolve, solve the reduced problem with `engine` and map the result back."""
+    timer = PhaseTimer()
+    reduction = reduce_problem(work_df, total_budget)
+    timer.lap('presolve')
+    
+    if reduction['status'] == 'Infeasible' or len(reduction['work_df']) == 0:
+        # Settled by presolve alone
+        if reduction['status'] == 'Infeasible':
+            result = _infeasible_result(work_df)
+        else:
+            result = _knapsack_result('Optimal', reduction['base'], work_df['priority'].to_numpy(dtype=float))
+        stats = empty_stats()
+        stats.update(
+            engine='knapsack' if engine == 'auto' else engine, method='presolve', mip_gap=0.0,
+            n_variables=0, n_constraints=1, n_nonzeros=0, timings=timer.finish(), cache=current_cache_status()
+        )
+        result['stats'] = stats
+    else:
+        if control is not None and control.on_incumbent is not None:
+            report = control.on_incumbent
+            control = copy.copy(control)
+            control.on_incumbent = lambda incumbent: report(_postsolved(reduction, incumbent))
+        if start is not None:
+            start = reduce_start(reduction, start)
+        
+        result = _optimize(
+            reduction['work_df'], reduction['total_budget'], engine, control, start=start, presolve=False
+        )
+        timer.merge(result['stats']['timings'])
+        result = _postsolved(reduction, result)
+        timer.lap('postsolve')
+        result['stats']['timings'] = timer.finish()
+    
+    result['stats']['presolve'] = reduction['stats']
+    return result
+
+def _postsolved(reduction, result):
+    """A result of the reduced problem restated for the original rows."""
+    result = dict(result, stats=dict(result['stats']))
+    reduced_value = result['objective_value']
+    if result['allocation'] is None:
+        result['objective_value'] = reduction['offset'] + reduced_value
+    else:
+        allocation = postsolve(reduction, result['allocation'])
+        result['allocation'] = [int(units) for units in allocation]
+        result['objective_value'] = float(np.dot(reduction['priorities'], allocation))
+    
+    # Gaps are relative to the objective, which now includes the fixed units
+    gap = result['stats'].get('mip_gap')
+    if gap:
+        absolute = gap * max(abs(reduced_value), 1e-9)
+        result['stats']['mip_gap'] = absolute / max(abs(result['objective_value']), 1e-9)
+    return result
+
+def build_work_matrix_model(work_df, total_budget):
+    """
+    Build the matrix-form model of the work allocation problem.
+    
+    Args:
+        work_df (pd.DataFrame): DataFrame containing work types
+        total_budget (float): Total available budget
+    
+    Returns:
+        dict: Matrix model (see matrix_model.build_matrix_model)
+    """
+    return build_budget_model(*_model_columns(work_df), total_budget)
+
+def _model_columns(work_df):
+    """Cost, priority, min_units and max_units as float arrays."""
+    return [
+        work_df[column].to_numpy(dtype=float)
+        for column in ('cost', 'priority', 'min_units', 'max_units')
+    ]
+
+def _optional_column(work_df, column, default):
+    """A per-work-type setting, filled with the default where missing."""
+    if column in work_df.columns:
+        return work_df[column].where(work_df[column].notna(), default).to_numpy()
+    return np.full(len(work_df), default, dtype=object)
+
+def solve_pulp(work_df, total_budget, timer=None, control=None):
+    """
+    Solve the work allocation problem as a PuLP integer program with CBC.
+    
+    Args:
+        work_df (pd.DataFrame): DataFrame containing work types
+        total_budget (float): Total available budget
+        timer (diagnostics.PhaseTimer): Timer to charge the phases to
+        control (solve_control.SolveControl): Time limit and gap target;
+            PuLP runs CBC to completion, so there are no incumbent reports
+            or stop requests
+    
+    Returns:
+        dict: Optimization results (see optimize_work_allocation)
+    """
+    timer = timer or PhaseTimer()
+    prob, work_vars = build_pulp_problem(work_df, total_budget)
+    timer.lap('build')
+    return _solve_pulp_problem(prob, work_vars, timer, control)
+
+def build_pulp_problem(work_df, total_budget):
+    """
+    Build the PuLP model of the work allocation problem.
+    
+    Args:
+        work_df (pd.DataFrame): DataFrame containing work types
+        total_budget (float): Total available budget
+    
+    Returns:
+        tuple: (LpProblem, list of LpVariable in work_df row order)
     """
+    # PuLP is imported on first use, so starting the app does not pay for it
+    from pulp import LpMaximize, LpProblem, LpVariable
+    
     # Create the optimization problem
     prob = LpProblem("Utility_Work_Optimization", LpMaximize)
     
     # Extract data from DataFrame
-    work_types = work_df['name'].tolist()
     costs = work_df['cost'].tolist()
     priorities = work_df['priority'].tolist()
     min_units = work_df['min_units'].tolist()
     max_units = work_df['max_units'].tolist()
     
-    # Create decision variables (number of units for each work type)
-    work_vars = {
-        work_type: LpVariable(f"Units_{i}", 
-                              lowBound=min_unit, 
-                              upBound=max_unit, 
-                              cat='Integer')
-        for i, (work_type, min_unit, max_unit) in enumerate(zip(work_types, min_units, max_units))
-    }
+    # Create decision variables (number of units for each work type),
+    # indexed by row so duplicate work type names stay distinct
+    work_vars = [
+        LpVariable(f"Units_{i}", 
+                   lowBound=min_unit, 
+                   upBound=max_unit, 
+                   cat='Integer')
+        for i, (min_unit, max_unit) in enumerate(zip(min_units, max_units))
+    ]
     
     # Objective function: Maximize priority-weighted work
-    prob += sum(priority * work_vars[work_type] 
-                for work_type, priority in zip(work_types, priorities))
+    prob += sum(priority * var for var, priority in zip(work_vars, priorities))
     
     # Constraint: Budget limitation
-    prob += sum(cost * work_vars[work_type] 
-                for work_type, cost in zip(work_types, costs)) <= total_budget, "Budget_Constraint"
+    prob += sum(cost * var for var, cost in zip(work_vars, costs)) <= total_budget, "Budget_Constraint"
+    
+    return prob, work_vars
+
+def _solve_pulp_problem(prob, work_vars, timer=None, control=None):
+    """Solve a PuLP model and extract the results."""
+    from pulp import LpSolutionIntegerFeasible, LpStatus, PULP_CBC_CMD, value
+    
+    timer = timer or PhaseTimer()
+    limits = {}
+    if control is not None:
+        remaining = control.remaining()
+        limits = {
+            # CBC reads a zero time limit as no limit
+            'timeLimit': None if remaining is None else max(remaining, 0.01),
+            'gapRel': control.mip_gap
+        }
     
-    # Solve the problem
-    prob.solve()
+    # Solve the problem, keeping the CBC log for the solver statistics
+    with tempfile.TemporaryDirectory() as tmp:
+        log_path = os.path.join(tmp, 'cbc.log')
+        prob.solve(PULP_CBC_CMD(msg=False, logPath=log_path, **limits))
+        timer.lap('solve')
+        with open(log_path) as f:
+            cbc_stats = parse_cbc_log(f.read())
     
     # Get results
     status = LpStatus[prob.status]
-    allocation = [int(value(work_vars[work_type])) for work_type in work_types]
+    if prob.sol_status == LpSolutionIntegerFeasible and cbc_stats['stopped'] != 'gap':
+        status = 'Feasible'
+    allocation = [int(value(var)) for var in work_vars]
     objective_value = value(prob.objective)
+    timer.lap('extract')
+    
+    # PuLP writes the model file inside solve(), so that counts as solver start
+    if cbc_stats['solver_seconds'] is not None:
+        timer.split('solve', 'solver_start', cbc_stats['solver_seconds'])
+    
+    stats = empty_stats()
+    stats.update(
+        engine='pulp',
+        method='cbc',
+        timings=timer.finish(),
+        nodes=cbc_stats['nodes'],
+        iterations=cbc_stats['iterations'],
+        mip_gap=cbc_stats['mip_gap'],
+        stopped=cbc_stats['stopped'],
+        n_variables=len(work_vars),
+        n_constraints=len(prob.constraints),
+        n_nonzeros=sum(len(constraint) for constraint in prob.constraints.values())
+    )
+    
+    return {
+        'status': status,
+        'allocation': allocation,
+        'objective_value': objective_value,
+        'stats': stats
+    }
+
+def knapsack_supported(work_df, total_budget):
+    """
+    Check whether the problem fits the built-in bounded knapsack engine.
+    
+    The knapsack engine handles a single budget constraint over integer
+    variables with finite bounds and non-negative costs.
+    
+    Args:
+        work_df (pd.DataFrame): DataFrame containing work types
+        total_budget (float): Total available budget
+    
+    Returns:
+        bool: True if the knapsack engine can solve the problem exactly
+    """
+    try:
+        budget = float(total_budget)
+        columns = work_df[['cost', 'priority', 'min_units', 'max_units']].to_numpy(dtype=float)
+    except (KeyError, TypeError, ValueError):
+        return False
+    
+    if not np.isfinite(budget) or not np.isfinite(columns).all():
+        return False
+    
+    costs, _, min_units, max_units = columns.T
+    return bool(
+        (costs >= 0).all()
+        and (min_units == np.round(min_units)).all()
+        and (max_units == np.round(max_units)).all()
+        and (min_units <= max_units).all()
+    )
+
+def solve_knapsack(work_df, total_budget, timer=None, control=None, start=None):
+    """
+    Solve the work allocation problem as a bounded knapsack without PuLP.
+    
+    Units above `min_units` are packed into the budget left after the
+    mandatory spend. Small integer budgets are solved with a vectorized
+    dynamic program over binary-split items; anything else uses
+    branch-and-bound with the LP relaxation as the bound.
+    
+    Args:
+        work_df (pd.DataFrame): DataFrame containing work types
+        total_budget (float): Total available budget
+        timer (diagnostics.PhaseTimer): Timer to charge the phases to
+        control (solve_control.SolveControl): Time limit, gap target, stop
+            request and incumbent callback for branch-and-bound
+        start (array-like): Allocation whose units above the minimum seed
+            branch-and-bound as its first incumbent
+    
+    Returns:
+        dict: Optimization results (see optimize_work_allocation), or None
+            if branch-and-bound hit its node limit before proving optimality
+    """
+    timer = timer or PhaseTimer()
+    items = _knapsack_items(work_df, total_budget)
+    timer.lap('extract_data')
+    
+    stats = empty_stats()
+    stats.update(engine='knapsack', n_variables=len(work_df), n_constraints=1, n_nonzeros=len(work_df))
+    if items is None:
+        result = _infeasible_result(work_df)
+        result['stats'] = dict(stats, timings=timer.finish())
+        return result
+    
+    allocation = items['base'].copy()
+    active = items['active']
+    offset = float(np.dot(items['priorities'], items['base']))
+    info = {'method': None, 'nodes': 0}
+    
+    def on_improve(chosen, chosen_value, bound):
+        """Report a branch-and-bound incumbent; True stops the search."""
+        if control.on_incumbent is not None:
+            incumbent = items['base'].copy()
+            incumbent[active] += chosen
+            result = _knapsack_result('Feasible', incumbent, items['priorities'])
+            result['stats'] = dict(
+                stats, method='branch_and_bound', nodes=info['nodes'],
+                mip_gap=relative_gap(offset + chosen_value, offset + bound),
+                timings={'total': control.elapsed()}
+            )
+            control.report(result)
+        return control.gap_reached(offset + chosen_value, offset + bound)
+    
+    gap = 0.0
+    if len(active) > 0:
+        incumbent = None
+        if start is not None:
+            incumbent = _fit_incumbent(
+                items['costs'][active], items['priorities'][active], items['upper'], items['slack'],
+                np.asarray(start, dtype=float)[active] - items['base'][active]
+            )
+        chosen = _knapsack_choose(
+            items['costs'][active], items['priorities'][active], items['upper'], items['slack'],
+            info, control, on_improve if control is not None else None, incumbent
+        )
+        timer.lap('solve')
+        if chosen is None:
+            return None
+        allocation[active] += chosen
+        if info.get('stopped'):
+            chosen_value = float(np.dot(items['priorities'][active], chosen))
+            gap = relative_gap(offset + chosen_value, offset + info['bound'])
+    
+    # A search stopped by time or by request has not proven its answer
+    proven = info.get('stopped') in (None, 'gap') or gap <= 1e-9
+    result = _knapsack_result('Optimal' if proven else 'Feasible', allocation, items['priorities'])
+    timer.lap('extract')
+    stats.update(
+        method=info['method'], nodes=info['nodes'], mip_gap=gap,
+        stopped=info.get('stopped'), timings=timer.finish()
+    )
+    result['stats'] = stats
+    return result
+
+def solve_approx(work_df, total_budget, timer=None):
+    """
+    Find a good allocation quickly without proving it optimal.
+    
+    The continuous relaxation of the single-budget model is solved in
+    closed form by sorting work types by priority per cost. Its solution
+    is rounded down and the leftover budget repaired greedily. Greedy
+    alone can do badly when one valuable work type does not fit whole,
+    so an allocation built around the most valuable single work type is
+    tried as well and the better one kept. The gap in the stats is
+    measured against the relaxation bound.
+    
+    Args:
+        work_df (pd.DataFrame): DataFrame containing work types
+        total_budget (float): Total available budget
+        timer (diagnostics.PhaseTimer): Timer to charge the phases to
+    
+    Returns:
+        dict: Optimization results (see optimize_work_allocation)
+    """
+    timer = timer or PhaseTimer()
+    items = _knapsack_items(work_df, total_budget)
+    timer.lap('extract_data')
+    
+    stats = empty_stats()
+    stats.update(engine='approx', method='lp_greedy', n_variables=len(work_df), n_constraints=1, n_nonzeros=len(work_df))
+    if items is None:
+        result = _infeasible_result(work_df)
+        result['stats'] = dict(stats, timings=timer.finish())
+        return result
+    
+    allocation = items['base'].copy()
+    active = items['active']
+    offset = float(np.dot(items['priorities'], items['base']))
+    gap = 0.0
+    if len(active) > 0:
+        costs, priorities, upper = items['costs'][active], items['priorities'][active], items['upper']
+        chosen, bound = _greedy_fill(costs, priorities, upper, items['slack'])
+        
+        # Fill the most valuable work type first, then the rest greedily
+        top = int(np.argmax(priorities * upper))
+        rest_upper = upper.copy()
+        rest_upper[top] = 0
+        around_top, _ = _greedy_fill(costs, priorities, rest_upper, items['slack'] - upper[top] * costs[top])
+        around_top[top] = upper[top]
+        if np.dot(priorities, around_top) > np.dot(priorities, chosen):
+            chosen = around_top
+        timer.lap('solve')
+        
+        if (priorities == np.round(priorities)).all():
+            bound = math.floor(bound + 1e-9)
+        allocation[active] += chosen
+        gap = relative_gap(offset + float(np.dot(priorities, chosen)), offset + bound)
+    
+    result = _knapsack_result('Optimal' if gap <= 1e-9 else 'Feasible', allocation, items['priorities'])
+    timer.lap('extract')
+    stats.update(mip_gap=gap, timings=timer.finish())
+    result['stats'] = stats
+    return result
+
+def _knapsack_choose(costs, priorities, upper, capacity, info=None, control=None, on_improve=None, incumbent=None):
+    """
+    Pick units per item for a bounded knapsack with the cheapest exact method.
+    
+    Args:
+        info (dict): Updated with the method that produced the answer
+            ('dp', 'branch_and_bound' or 'greedy'), the nodes explored and,
+            if `control` stopped the search, the reason and an upper bound
+        control (solve_control.SolveControl): Stops the search early
+        on_improve (callable): Passed to _knapsack_branch_and_bound
+        incumbent (np.ndarray): Feasible units to start branch-and-bound
+            from
+    
+    Returns:
+        np.ndarray: Units chosen per item, or None if no method finished
+    """
+    if info is None:
+        info = {}
+    info.setdefault('nodes', 0)
+    cells = _dp_cells(costs, upper, capacity)
+    
+    if cells is None or cells > KNAPSACK_DP_QUICK_CELLS:
+        info['method'] = 'branch_and_bound'
+        chosen = _knapsack_branch_and_bound(
+            costs, priorities, upper, capacity, KNAPSACK_QUICK_NODE_LIMIT, info, control, on_improve, incumbent
+        )
+        if chosen is not None:
+            return chosen
+    
+    info['method'] = 'dp'
+    chosen = _knapsack_dp(costs, priorities, upper, capacity, control)
+    if chosen is None and control is not None and control.stopped:
+        # Stopped while filling the table: keep the best solution seen so far
+        chosen, info['bound'] = _greedy_fill(costs, priorities, upper, capacity)
+        info['method'] = 'greedy'
+        if 'incumbent' in info and np.dot(priorities, info['incumbent']) > np.dot(priorities, chosen):
+            chosen, info['method'] = info['incumbent'], 'branch_and_bound'
+        info['stopped'] = control.stopped
+        return chosen
+    
+    if chosen is None:
+        info['method'] = 'branch_and_bound'
+        chosen = _knapsack_branch_and_bound(
+            costs, priorities, upper, capacity, info=info, control=control, on_improve=on_improve, incumbent=incumbent
+        )
+    return chosen
+
+def _greedy_fill(costs, priorities, upper, capacity):
+    """
+    Fill a bounded knapsack greedily by priority per cost.
+    
+    Items are taken whole in ratio order up to the first that does not
+    fit, which is the LP relaxation rounded down; the budget left over is
+    then repaired with as many units as fit of the following items.
+    
+    Returns:
+        tuple: (units chosen per item, LP relaxation bound on the optimum)
+    """
+    eps = 1e-9
+    order = np.argsort(-(priorities / costs), kind='stable')
+    chosen = np.zeros(len(costs), dtype=np.int64)
+    
+    # Take whole items in ratio order, then a fraction of the first that does not fit
+    cum_w = np.concatenate(([0.0], np.cumsum(costs[order] * upper[order])))
+    cum_v = np.concatenate(([0.0], np.cumsum(priorities[order] * upper[order])))
+    stop = int(np.searchsorted(cum_w, capacity + eps, side='right')) - 1
+    bound = cum_v[stop]
+    chosen[order[:stop]] = upper[order[:stop]]
+    
+    if stop < len(order):
+        cap = capacity - cum_w[stop]
+        bound += cap * priorities[order[stop]] / costs[order[stop]]
+        
+        # Cheapest remaining cost from each position on, to stop early
+        rest = order[stop:]
+        cheapest = np.minimum.accumulate(costs[rest][::-1])[::-1]
+        for i, floor_cost in zip(rest.tolist(), cheapest.tolist()):
+            if cap < floor_cost - eps:
+                break
+            units = min(int(upper[i]), int(math.floor(cap / costs[i] + eps)))
+            chosen[i] = units
+            cap -= units * costs[i]
+    
+    return chosen, float(bound)
+
+def _fit_incumbent(costs, priorities, upper, capacity, units):
+    """
+    Clip starting units to the item bounds and the capacity.
+    
+    Units of the lowest priority per cost are dropped until the rest fit.
+    
+    Returns:
+        np.ndarray: Feasible units per item
+    """
+    units = np.clip(np.round(units), 0, upper).astype(np.int64)
+    excess = float(np.dot(costs, units)) - capacity
+    if excess > 1e-9:
+        for i in np.argsort(priorities / costs, kind='stable').tolist():
+            if units[i] == 0:
+                continue
+            drop = min(int(units[i]), int(math.ceil(excess / costs[i] - 1e-9)))
+            units[i] -= drop
+            excess -= drop * costs[i]
+            if excess <= 1e-9:
+                break
+    return units
+
+def _feasible_start(model, start):
+    """
+    Clip a starting allocation to the bounds and budget of a single-budget model.
+    
+    Returns:
+        np.ndarray: The allocation within bounds and budget, or None if
+            the model is not one _fit_incumbent can repair
+    """
+    costs = np.zeros(len(model['objective']))
+    costs[model['cols']] = model['values']
+    lower = model['lower']
+    capacity = model['rhs'][0] - float(np.dot(costs, lower))
+    if len(model['rhs']) != 1 or not np.isfinite(lower).all() or capacity < -1e-9 or (costs < 0).any():
+        return None
+    
+    units = np.clip(np.round(np.asarray(start, dtype=float)), lower, model['upper'])
+    paid = costs > 0
+    extra = units - lower
+    extra[paid] = _fit_incumbent(
+        costs[paid], model['objective'][paid], (model['upper'] - lower)[paid], max(capacity, 0.0), extra[paid]
+    )
+    return lower + extra
+
+def _dp_cells(costs, upper, capacity):
+    """Size of the dynamic programming table, or None if costs are off-grid."""
+    grid = _integer_weights(costs, capacity)
+    if grid is None:
+        return None
+    piece_count = sum(int(count).bit_length() for count in upper)
+    return piece_count * (grid[1] + 1)
+
+def _knapsack_items(work_df, total_budget):
+    """
+    Reduce the work allocation problem to the items that compete for budget.
     
+    Returns:
+        dict: Arrays describing the reduced knapsack, or None if the
+            mandatory `min_units` spend already exceeds the budget
+    """
+    costs = work_df['cost'].to_numpy(dtype=float)
+    priorities = work_df['priority'].to_numpy(dtype=float)
+    min_units = work_df['min_units'].to_numpy(dtype=float).astype(np.int64)
+    max_units = work_df['max_units'].to_numpy(dtype=float).astype(np.int64)
+    
+    mandatory = float(np.dot(costs, min_units))
+    slack = float(total_budget) - mandatory
+    if slack < -1e-9 * max(1.0, abs(float(total_budget))):
+        return None
+    slack = max(slack, 0.0)
+    
+    # Units that can be added above the minimum
+    base = min_units.copy()
+    room = max_units - min_units
+    
+    # Free work with positive priority is always taken in full
+    free = (costs == 0) & (priorities > 0)
+    base[free] = max_units[free]
+    
+    # Only paid work with positive priority competes for the budget
+    active = np.flatnonzero((costs > 0) & (priorities > 0) & (room > 0))
+    upper = np.minimum(room[active], np.floor(slack / costs[active] + 1e-9).astype(np.int64))
+    keep = upper > 0
+    
+    return {
+        'costs': costs,
+        'priorities': priorities,
+        'base': base,
+        'mandatory': mandatory,
+        'slack': slack,
+        'active': active[keep],
+        'upper': upper[keep]
+    }
+
+def _infeasible_result(work_df):
+    """Result returned when the minimum units cannot be funded."""
+    min_units = work_df['min_units'].to_numpy(dtype=float).astype(np.int64)
+    return _knapsack_result('Infeasible', min_units, work_df['priority'].to_numpy(dtype=float))
+
+def _knapsack_result(status, allocation, priorities):
+    """Build a result dict in the same shape as the PuLP engine."""
     return {
         'status': status,
+        'allocation': [int(units) for units in allocation],
+        'objective_value': float(np.dot(priorities, allocation))
+    }
+
+def _value_step(priorities):
+    """
+    Largest value every solution's priority value is a multiple of.
+    
+    Returns:
+        float: The greatest common divisor of the priorities on a grid of at
+            most four decimal places, or None if they need more
+    """
+    for digits in range(5):
+        scale = 10 ** digits
+        scaled = priorities * scale
+        rounded = np.round(scaled)
+        if np.allclose(scaled, rounded, rtol=0, atol=1e-6):
+            divisor = int(np.gcd.reduce(np.abs(rounded).astype(np.int64))) if len(rounded) else 0
+            return max(divisor, 1) / scale
+    return None
+
+def _integer_weights(costs, capacity):
+    """
+    Scale costs and capacity onto a common integer grid.
+    
+    Returns:
+        tuple: (weights, grid_capacity, cell_size) where weights and
+            grid_capacity are integers and cell_size is the budget amount
+            of one grid cell, or None if the costs need more than four
+            decimal places
+    """
+    for digits in range(5):
+        scale = 10 ** digits
+        scaled = costs * scale
+        weights = np.round(scaled)
+        if np.allclose(scaled, weights, rtol=0, atol=1e-6):
+            weights = weights.astype(np.int64)
+            unit = int(np.gcd.reduce(weights))
+            grid_capacity = int(math.floor(capacity * scale / unit + 1e-9))
+            return weights // unit, grid_capacity, unit / scale
+    return None
+
+def _binary_split(upper):
+    """Split each bounded item into 1, 2, 4, ... unit pieces plus a remainder."""
+    item_index = []
+    piece_size = []
+    for i, count in enumerate(upper):
+        size = 1
+        while count > 0:
+            take = min(size, count)
+            item_index.append(i)
+            piece_size.append(take)
+            count -= take
+            size *= 2
+    return np.array(item_index, dtype=np.int64), np.array(piece_size, dtype=np.int64)
+
+def _knapsack_table(costs, priorities, upper, capacity, control=None):
+    """
+    Run the vectorized dynamic program for a bounded knapsack.
+    
+    Returns:
+        dict: DP table with the best value for every budget cell and the
+            packed take/skip decision of every binary-split piece, or None
+            if the costs are not on an integer grid, the table would be
+            too large, or `control` stopped the solve
+    """
+    grid = _integer_weights(costs, capacity)
+    if grid is None:
+        return None
+    weights, grid_capacity, cell_size = grid
+    
+    item_index, piece_size = _binary_split(upper)
+    if len(piece_size) * (grid_capacity + 1) > KNAPSACK_DP_MAX_CELLS:
+        return None
+    
+    # best[b] is the best value achievable with at most b budget cells
+    best = np.zeros(grid_capacity + 1)
+    piece_weight = weights[item_index] * piece_size
+    decisions = []
+    for item, size, weight in zip(item_index, piece_size, piece_weight):
+        if control is not None and control.check():
+            return None
+        if weight > grid_capacity:
+            decisions.append(None)
+            continue
+        candidate = best[:grid_capacity + 1 - weight] + priorities[item] * size
+        take = candidate > best[weight:]
+        best[weight:] = np.where(take, candidate, best[weight:])
+        decisions.append(np.packbits(take))
+    
+    return {
+        'best': best,
+        'decisions': decisions,
+        'item_index': item_index,
+        'piece_size': piece_size,
+        'piece_weight': piece_weight,
+        'cell_size': cell_size,
+        'n_items': len(costs)
+    }
+
+def _knapsack_backtrack(table, positions):
+    """
+    Recover the units chosen per item for several budget cells at once.
+    
+    Args:
+        table (dict): Result of _knapsack_table
+        positions (np.ndarray): Budget cells to backtrack from
+    
+    Returns:
+        np.ndarray: Array of shape (len(positions), n_items) with units
+    """
+    positions = np.array(positions, dtype=np.int64)
+    chosen = np.zeros((len(positions), table['n_items']), dtype=np.int64)
+    
+    for piece in range(len(table['piece_size']) - 1, -1, -1):
+        packed = table['decisions'][piece]
+        if packed is None:
+            continue
+        offset = positions - table['piece_weight'][piece]
+        valid = offset >= 0
+        safe = np.where(valid, offset, 0)
+        taken = valid & (((packed[safe >> 3] >> (7 - (safe & 7))) & 1) == 1)
+        chosen[taken, table['item_index'][piece]] += table['piece_size'][piece]
+        positions = np.where(taken, offset, positions)
+    
+    return chosen
+
+def _knapsack_dp(costs, priorities, upper, capacity, control=None):
+    """
+    Solve a bounded knapsack exactly with a vectorized dynamic program.
+    
+    Returns:
+        np.ndarray: Units chosen per item, or None if the DP does not apply
+    """
+    table = _knapsack_table(costs, priorities, upper, capacity, control)
+    if table is None:
+        return None
+    return _knapsack_backtrack(table, [len(table['best']) - 1])[0]
+
+def _knapsack_branch_and_bound(costs, priorities, upper, capacity, node_limit=None, info=None, control=None, on_improve=None, incumbent=None):
+    """
+    Solve a bounded knapsack exactly with depth-first branch-and-bound.
+    
+    Items are explored in decreasing priority-per-cost order and each node
+    is bounded by the greedy LP relaxation of the remaining items.
+    
+    Args:
+        node_limit (int): Nodes to explore before giving up (default
+            KNAPSACK_NODE_LIMIT)
+        info (dict): Its 'nodes' count is increased by the nodes explored;
+            'bound' is set to the root LP bound, 'incumbent' to the best
+            units found if the node limit is hit and 'stopped' to the
+            reason if `control` stopped the search
+        control (solve_control.SolveControl): Polled every
+            KNAPSACK_CHECK_INTERVAL nodes for a time limit or stop request
+        on_improve (callable): Called as on_improve(units, value, bound)
+            for every improving solution; returning True stops the search
+        incumbent (np.ndarray): Feasible units per item to start from; a
+            good one prunes most of the tree
+    
+    Returns:
+        np.ndarray: Units chosen per item (the incumbent if stopped early),
+            or None if the node limit was hit
+    """
+    if info is None:
+        info = {}
+    if node_limit is None:
+        node_limit = KNAPSACK_NODE_LIMIT
+    
+    order = np.argsort(-(priorities / costs), kind='stable')
+    w = costs[order].tolist()
+    v = priorities[order].tolist()
+    u = upper[order].tolist()
+    n = len(w)
+    
+    # Prefix sums of taking every remaining unit, used by the LP bound
+    cum_w = [0.0] + np.cumsum(costs[order] * upper[order]).tolist()
+    cum_v = [0.0] + np.cumsum(priorities[order] * upper[order]).tolist()
+    
+    def lp_bound(start, cap):
+        if start >= n:
+            return 0.0
+        stop = bisect.bisect_right(cum_w, cum_w[start] + cap, lo=start) - 1
+        bound = cum_v[stop] - cum_v[start]
+        if stop < n:
+            bound += (cap - (cum_w[stop] - cum_w[start])) * v[stop] / w[stop]
+        return bound
+    
+    # When priorities have few decimals every solution value is a multiple
+    # of `step`, so the LP bound can be rounded down to the next multiple
+    step = _value_step(priorities)
+    root_bound = lp_bound(0, capacity)
+    if step is not None:
+        root_bound = math.floor(root_bound / step + 1e-9) * step
+    info['bound'] = root_bound
+    
+    def unsort(units):
+        chosen = np.zeros(n, dtype=np.int64)
+        chosen[order] = units
+        return chosen
+    
+    eps = 1e-9
+    best_value = -1.0
+    best_units = [0] * n
+    if incumbent is not None:
+        best_units = np.asarray(incumbent, dtype=np.int64)[order].tolist()
+        best_value = float(np.dot(priorities, incumbent))
+        if best_value >= root_bound - eps:
+            # The starting units already reach the bound
+            return unsort(best_units)
+    units = [0] * n
+    caps = [0.0] * (n + 1)
+    vals = [0.0] * (n + 1)
+    caps[0] = capacity
+    units[0] = min(u[0], int(math.floor(capacity / w[0] + eps)))
+    depth = 0
+    nodes = 0
+    
+    while depth >= 0:
+        if units[depth] < 0:
+            # Every count at this depth has been explored
+            depth -= 1
+            if depth >= 0:
+                units[depth] -= 1
+            continue
+        
+        nodes += 1
+        if nodes > node_limit:
+            info['nodes'] = info.get('nodes', 0) + node_limit
+            info['incumbent'] = unsort(best_units)
+            return None
+        if control is not None and nodes % KNAPSACK_CHECK_INTERVAL == 0 and control.check():
+            break
+        
+        cap = caps[depth] - units[depth] * w[depth]
+        val = vals[depth] + units[depth] * v[depth]
+        
+        if depth == n - 1:
+            if val > best_value + eps:
+                best_value = val
+                best_units = units.copy()
+                if on_improve is not None and on_improve(unsort(best_units), best_value, root_bound):
+                    break
+            units[depth] = -1
+            continue
+        
+        bound = val + lp_bound(depth + 1, cap)
+        if step is not None:
+            bound = math.floor(bound / step + eps) * step
+        if bound <= best_value + eps:
+            # Smaller counts of this item cannot raise the bound either
+            units[depth] = -1
+            continue
+        
+        depth += 1
+        caps[depth] = cap
+        vals[depth] = val
+        units[depth] = min(u[depth], int(math.floor(cap / w[depth] + eps)))
+    
+    info['nodes'] = info.get('nodes', 0) + nodes
+    if control is not None and control.stopped:
+        info['stopped'] = control.stopped
+    
+    return unsort(best_units)
+
+def frontier_supported(work_df, max_budget=None):
+    """
+    Check whether the exact budget frontier can be computed for a problem.
+    
+    Args:
+        work_df (pd.DataFrame): DataFrame containing work types
+        max_budget (float): Largest budget of interest (defaults to the
+            cost of funding every work type up to `max_units`)
+    
+    Returns:
+        bool: True if compute_budget_frontier will succeed
+    """
+    if len(work_df) == 0:
+        return False
+    if max_budget is None:
+        if not knapsack_supported(work_df, 0):
+            return False
+        max_budget = _full_funding_cost(work_df)
+    if not knapsack_supported(work_df, max_budget):
+        return False
+    
+    items = _knapsack_items(work_df, max_budget)
+    if items is None or len(items['active']) == 0:
+        return True
+    
+    cells = _dp_cells(items['costs'][items['active']], items['upper'], items['slack'])
+    return cells is not None and cells <= KNAPSACK_DP_MAX_CELLS
+
+def compute_budget_frontier(work_df, max_budget=None):
+    """
+    Compute the optimal priority value for every budget in a single pass.
+    
+    The optimal value of the work allocation problem is a step function of
+    the budget. This runs the knapsack dynamic program once up to
+    `max_budget` and returns every budget at which the optimum steps up,
+    together with the optimal allocation from that budget on. Use
+    frontier_lookup to read off the result for any budget.
+    
+    Args:
+        work_df (pd.DataFrame): DataFrame containing work types
+        max_budget (float): Largest budget of interest (defaults to the
+            cost of funding every work type up to `max_units`)
+    
+    Returns:
+        dict: Frontier breakpoints, sorted by budget:
+            - budget: Budgets at which the optimal value steps up
+            - objective_value: Optimal priority value from each breakpoint on
+            - total_cost: Cost of the optimal allocation at each breakpoint
+            - allocation: Array (breakpoints x work types) of allocated units
+            - max_budget: Largest budget covered by the frontier
+            - infeasible: Result returned for budgets below the first breakpoint
+    
+    Raises:
+        ValueError: If the problem is not supported (see frontier_supported)
+    """
+    if max_budget is None and knapsack_supported(work_df, 0):
+        max_budget = _full_funding_cost(work_df)
+    if not frontier_supported(work_df, max_budget):
+        raise ValueError("Budget frontier is not available for these work types")
+    
+    items = _knapsack_items(work_df, max_budget)
+    if items is None:
+        # Even the largest budget cannot fund the minimum units
+        return {
+            'budget': np.empty(0),
+            'objective_value': np.empty(0),
+            'total_cost': np.empty(0),
+            'allocation': np.empty((0, len(work_df)), dtype=np.int64),
+            'max_budget': float(max_budget),
+            'infeasible': _infeasible_result(work_df)
+        }
+    
+    active = items['active']
+    positions = np.zeros(1, dtype=np.int64)
+    cell_size = 0.0
+    if len(active) > 0:
+        table = _knapsack_table(
+            items['costs'][active], items['priorities'][active], items['upper'], items['slack']
+        )
+        best = table['best']
+        cell_size = table['cell_size']
+        steps = np.flatnonzero(np.diff(best) > 1e-9) + 1
+        positions = np.concatenate(([0], steps))
+    
+    allocation = np.tile(items['base'], (len(positions), 1))
+    if len(active) > 0:
+        allocation[:, active] += _knapsack_backtrack(table, positions)
+    
+    return {
+        'budget': items['mandatory'] + positions * cell_size,
+        'objective_value': allocation @ items['priorities'],
+        'total_cost': allocation @ items['costs'],
         'allocation': allocation,
-        'objective_value': objective_value
+        'max_budget': float(max_budget),
+        'infeasible': _infeasible_result(work_df)
     }
 
-def analyze_sensitivity(work_df, total_budget, steps=10):
+def frontier_lookup(frontier, budget):
+    """
+    Look up the optimal allocation for a budget on a precomputed frontier.
+    
+    Args:
+        frontier (dict): Result of compute_budget_frontier
+        budget (float): Budget to look up (at most the frontier's max_budget)
+    
+    Returns:
+        dict: Optimization results (see optimize_work_allocation)
+    """
+    timer = PhaseTimer()
+    tolerance = 1e-9 * max(1.0, abs(float(budget)))
+    index = int(np.searchsorted(frontier['budget'], float(budget) + tolerance, side='right')) - 1
+    
+    if index < 0:
+        result = dict(frontier['infeasible'])
+    else:
+        result = {
+            'status': 'Optimal',
+            'allocation': [int(units) for units in frontier['allocation'][index]],
+            'objective_value': float(frontier['objective_value'][index])
+        }
+    timer.lap('extract')
+    
+    n_items = frontier['allocation'].shape[1]
+    result['stats'] = dict(
+        empty_stats(), engine='frontier', method='lookup', mip_gap=0.0, timings=timer.finish(),
+        n_variables=n_items, n_constraints=1, n_nonzeros=n_items
+    )
+    return result
+
+def _full_funding_cost(work_df):
+    """Cost of funding every work type up to its maximum units."""
+    return float(np.dot(work_df['cost'].to_numpy(dtype=float), work_df['max_units'].to_numpy(dtype=float)))
+
+def analyze_sensitivity(work_df, total_budget, steps=10, engine='auto', workers=None, chunksize=1):
     """
     Perform sensitivity analysis by varying the budget and observing changes.
     
@@ -70,23 +1118,149 @@ def analyze_sensitivity(work_df, total_budget, steps=10):
         work_df (pd.DataFrame): DataFrame containing work types
         total_budget (float): Current total budget
         steps (int): Number of budget steps to analyze
+        engine (str): Solver engine (see optimize_work_allocation)
+        workers (int): Number of worker processes for the solves (None or 1
+            solves serially)
+        chunksize (int): Number of budget points sent to a worker at a time
     
     Returns:
         pd.DataFrame: Results of sensitivity analysis
     """
+    return pd.DataFrame(list(iter_sensitivity(work_df, total_budget, steps, engine, workers, chunksize)))
+
+def iter_sensitivity(work_df, total_budget, steps=10, engine='auto', workers=None, chunksize=1, executor=None, cache=None):
+    """
+    Yield sensitivity analysis rows in budget order as they are solved.
+    
+    When the exact budget frontier is available it answers every point.
+    Otherwise each budget is solved from a serialized model, either in
+    this process or on a process pool. Both paths run the same solve code,
+    so they produce identical rows.
+    
+    Args:
+        work_df (pd.DataFrame): DataFrame containing work types
+        total_budget (float): Current total budget
+        steps (int): Number of budget steps to analyze
+        engine (str): Solver engine (see optimize_work_allocation)
+        workers (int): Number of worker processes (None or 1 solves serially)
+        chunksize (int): Number of budget points sent to a worker at a time
+        executor (concurrent.futures.Executor): Existing pool to use instead
+            of starting one with `workers` processes
+        cache (solve_cache.SolveCache): Cache consulted before solving each
+            budget point and updated with the new results
+    
+    Yields:
+        dict: Row with budget, objective_value and budget_utilization
+    """
     budget_range = np.linspace(total_budget * 0.5, total_budget * 1.5, steps)
-    results = []
     
-    for budget in budget_range:
-        result = optimize_work_allocation(work_df, budget)
+    # One frontier pass answers every budget point exactly
+    if engine != 'pulp' and frontier_supported(work_df, budget_range.max()):
+        frontier = compute_budget_frontier(work_df, budget_range.max())
+        costs = work_df['cost'].to_numpy(dtype=float)
+        for budget in budget_range:
+            yield _sensitivity_row(budget, frontier_lookup(frontier, budget), costs)
+        return
+    
+    cached = [None] * len(budget_range)
+    if cache is not None:
+        cached = [cache.get(work_df, budget, engine=engine) for budget in budget_range]
+    missing = [budget for budget, result in zip(budget_range, cached) if result is None]
+    
+    model = serialize_model(work_df, engine)
+    solve_point = partial(solve_serialized_model, model)
+    costs = model['columns']['cost']
+    
+    with ExitStack() as stack:
+        if executor is not None:
+            solved = executor.map(solve_point, missing, chunksize=chunksize)
+        elif workers is None or workers <= 1 or not missing:
+            solved = map(solve_point, missing)
+        else:
+            # Spawned workers avoid forking the threads of a running Streamlit server
+            context = multiprocessing.get_context('spawn')
+            pool = stack.enter_context(ProcessPoolExecutor(max_workers=workers, mp_context=context))
+            # Closing the generator early drops budget points not yet started
+            stack.callback(pool.shutdown, wait=False, cancel_futures=True)
+            solved = pool.map(solve_point, missing, chunksize=chunksize)
         
-        # Calculate total cost
-        total_cost = sum(alloc * cost for alloc, cost in zip(result['allocation'], work_df['cost']))
+        for budget, result in zip(budget_range, cached):
+            if result is None:
+                result = next(solved)
+                if cache is not None:
+                    result['stats']['cache'] = 'miss'
+                    cache.put(work_df, budget, result, engine=engine)
+                notify_solve_hooks(result)
+            yield _sensitivity_row(budget, result, costs)
+
+def serialize_model(work_df, engine='auto'):
+    """
+    Serialize the work allocation model for solving in another process.
+    
+    The PuLP and matrix engines ship the built model (a plain dict or
+    NumPy arrays) so workers only need to change the budget; the knapsack
+    engine ships the model columns as NumPy arrays.
+    
+    Args:
+        work_df (pd.DataFrame): DataFrame containing work types
+        engine (str): Solver engine (see optimize_work_allocation)
+    
+    Returns:
+        dict: Picklable model for solve_serialized_model
+    """
+    columns = {
+        column: work_df[column].to_numpy()
+        for column in ('cost', 'priority', 'min_units', 'max_units')
+    }
+    model = {'engine': engine, 'columns': columns}
+    
+    if engine == 'auto' and not knapsack_supported(work_df, 0):
+        engine = model['engine'] = 'matrix'
+    
+    if engine == 'pulp':
+        prob, _ = build_pulp_problem(work_df, 0)
+        model['problem'] = prob.to_dict()
+    elif engine == 'matrix':
+        model['problem'] = build_work_matrix_model(work_df, 0)
+    
+    return model
+
+def solve_serialized_model(model, total_budget):
+    """
+    Solve a model produced by serialize_model for one budget.
+    
+    Args:
+        model (dict): Result of serialize_model
+        total_budget (float): Total available budget
+    
+    Returns:
+        dict: Optimization results (see optimize_work_allocation)
+    """
+    timer = PhaseTimer()
+    if model['engine'] == 'pulp':
+        from pulp import LpProblem
         
-        results.append({
-            'budget': budget,
-            'objective_value': result['objective_value'],
-            'budget_utilization': total_cost / budget if budget > 0 else 0
-        })
+        variables, prob = LpProblem.from_dict(model['problem'])
+        prob.constraints['Budget_Constraint'].constant = -float(total_budget)
+        work_vars = [variables[f"Units_{i}"] for i in range(len(model['columns']['cost']))]
+        timer.lap('build')
+        return _solve_pulp_problem(prob, work_vars, timer)
+    
+    if model['engine'] == 'matrix':
+        problem = dict(model['problem'], rhs=np.array([float(total_budget)]))
+        timer.lap('build')
+        return solve_matrix_model(problem, timer=timer)
     
-    return pd.DataFrame(results)
\ No newline at end of file
+    # Hooks are notified by the caller, in the process that registered them
+    return _optimize(pd.DataFrame(model['columns']), total_budget, model['engine'])
+
+def _sensitivity_row(budget, result, costs):
+    """Summarize one optimization result as a sensitivity analysis row."""
+    # Calculate total cost
+    total_cost = sum(alloc * cost for alloc, cost in zip(result['allocation'], costs))
+    
+    return {
+        'budget': budget,
+        'objective_value': result['objective_value'],
+        'budget_utilization': total_cost / budget if budget > 0 else 0
+    }
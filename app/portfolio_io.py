@@ -0,0 +1,263 @@
+"""
+Streaming import and export of work types, results and saved scenarios.
+
+Two formats carry the same content:
+    - JSON, the original format, written in chunks of rows so a large
+      portfolio never exists as a single string
+    - columnar NumPy .npz, one array per work type column plus the
+      scenario store's delta arrays, read one column at a time
+Either can be gzip-compressed (.npz files are compressed internally).
+Imports detect the format from the file's first bytes and validate the
+work types column by column before anything is replaced.
+"""
+import gzip
+import io
+import json
+
+import numpy as np
+import pandas as pd
+
+FORMAT_VERSION = 1
+
+# Formats offered for export: (file extension, MIME type)
+EXPORT_FORMATS = {
+    'json': ('json', 'application/json'),
+    'npz': ('npz', 'application/octet-stream')
+}
+
+WORK_TYPE_COLUMNS = ['name', 'cost', 'priority', 'min_units', 'max_units']
+
+# Work type rows encoded per JSON chunk
+CHUNK_ROWS = 2000
+
+# gzip level for JSON exports; higher levels are several times slower for
+# little gain on this data
+GZIP_LEVEL = 6
+
+GZIP_MAGIC = b'\x1f\x8b'
+ZIP_MAGIC = b'PK'
+
+def iter_json_export(work_types, results=None, scenario_store=None, chunk_rows=CHUNK_ROWS):
+    """
+    Yield an export in JSON form, a chunk of text at a time.
+    
+    Args:
+        work_types (list): Work type dicts
+        results (dict): Last optimization result, if any
+        scenario_store (ScenarioStore): Saved scenarios, if any
+        chunk_rows (int): Work type rows per chunk
+    
+    Yields:
+        str: Consecutive pieces of the JSON document
+    """
+    yield '{"work_types": ['
+    for start in range(0, len(work_types), chunk_rows):
+        rows = work_types[start:start + chunk_rows]
+        yield (', ' if start else '') + ', '.join(json.dumps(row, default=_json_default) for row in rows)
+    yield ']'
+    
+    if results:
+        yield ', "results": ' + json.dumps(results, default=_json_default)
+    if scenario_store is not None and len(scenario_store) > 0:
+        yield ', "scenario_store": ' + json.dumps(scenario_store.to_dict(), default=_json_default)
+    yield '}'
+
+def columnar_arrays(work_types, results=None, scenario_store=None):
+    """
+    Build the arrays of an .npz export.
+    
+    Returns:
+        dict: format_version, one work_type_<column> array per column,
+            results_json (the result as a JSON string, empty if none) and
+            the scenario store's to_arrays() prefixed with 'scenarios_'
+    """
+    work_df = pd.DataFrame(work_types, columns=WORK_TYPE_COLUMNS)
+    arrays = {'format_version': np.array(FORMAT_VERSION)}
+    arrays['work_type_name'] = work_df['name'].astype(str).to_numpy(dtype=str)
+    for column in WORK_TYPE_COLUMNS[1:]:
+        arrays[f'work_type_{column}'] = work_df[column].to_numpy()
+    
+    arrays['results_json'] = np.array(json.dumps(results, default=_json_default) if results else '')
+    if scenario_store is not None and len(scenario_store) > 0:
+        arrays.update({f'scenarios_{name}': array for name, array in scenario_store.to_arrays().items()})
+    return arrays
+
+def write_export(f, work_types, results=None, scenario_store=None, fmt='json', compress=False):
+    """
+    Write an export to a binary file object.
+    
+    Args:
+        f: Binary file object
+        work_types (list): Work type dicts
+        results (dict): Last optimization result, if any
+        scenario_store (ScenarioStore): Saved scenarios, if any
+        fmt (str): 'json' or 'npz'
+        compress (bool): gzip the JSON, or compress the .npz members
+    """
+    if fmt == 'npz':
+        save = np.savez_compressed if compress else np.savez
+        save(f, **columnar_arrays(work_types, results, scenario_store))
+    elif fmt == 'json':
+        stream = gzip.GzipFile(fileobj=f, mode='wb', compresslevel=GZIP_LEVEL) if compress else f
+        for chunk in iter_json_export(work_types, results, scenario_store):
+            stream.write(chunk.encode())
+        if compress:
+            stream.close()
+    else:
+        raise ValueError(f"Unknown export format: {fmt}")
+
+def export_bytes(work_types, results=None, scenario_store=None, fmt='json', compress=False):
+    """Encode an export in memory (see write_export)."""
+    buffer = io.BytesIO()
+    write_export(buffer, work_types, results, scenario_store, fmt, compress)
+    return buffer.getvalue()
+
+def export_filename(fmt, compress=False, stem='utility_work_plan'):
+    """File name and MIME type for an export."""
+    extension, mime = EXPORT_FORMATS[fmt]
+    if compress and fmt == 'json':
+        return f"{stem}.{extension}.gz", 'application/gzip'
+    return f"{stem}.{extension}", mime
+
+def read_export(f, scenario_store=None):
+    """
+    Read an export in any supported format.
+    
+    Args:
+        f: Binary file object (an upload or an open file)
+        scenario_store (ScenarioStore): Store the file's scenarios are
+            saved into (skipped if None)
+    
+    Returns:
+        dict: work_types (validated DataFrame, or None if the file has
+            none), results (dict or None), budget (or None) and scenarios
+            (number of scenarios in the file)
+    
+    Raises:
+        ValueError: If the work types fail validation
+    """
+    if _peek(f, 2) == GZIP_MAGIC:
+        f = gzip.GzipFile(fileobj=f, mode='rb')
+    
+    if _peek(f, 2) == ZIP_MAGIC:
+        return _read_npz(f, scenario_store)
+    return _read_json(f, scenario_store)
+
+def validate_work_types(work_df):
+    """
+    Check work types column by column.
+    
+    Returns:
+        list: Error messages; empty if the work types are valid
+    """
+    missing = [column for column in WORK_TYPE_COLUMNS if column not in work_df.columns]
+    if missing:
+        return [f"Missing work type columns: {', '.join(missing)}"]
+    
+    numeric = {column: pd.to_numeric(work_df[column], errors='coerce') for column in WORK_TYPE_COLUMNS[1:]}
+    names = work_df['name']
+    checks = [
+        ("have no name", names.isna() | (names.astype(str).str.strip() == '')),
+        ("have a non-numeric or infinite value", ~np.isfinite(pd.DataFrame(numeric).to_numpy(dtype=float)).all(axis=1)),
+        ("have a negative cost", numeric['cost'] < 0),
+        ("have negative units", (numeric['min_units'] < 0) | (numeric['max_units'] < 0)),
+        ("have fractional units", (numeric['min_units'] % 1 != 0) | (numeric['max_units'] % 1 != 0)),
+        ("have minimum units above maximum units", numeric['min_units'] > numeric['max_units'])
+    ]
+    
+    errors = []
+    for message, failed in checks:
+        failed = np.asarray(failed, dtype=bool)
+        if failed.any():
+            rows = np.flatnonzero(failed)
+            errors.append(f"{len(rows)} work type(s) {message} (first at row {rows[0] + 1})")
+    return errors
+
+def import_legacy_scenarios(store, scenarios, work_types):
+    """
+    Save scenarios exported as full records tables into the store.
+    
+    Args:
+        store (ScenarioStore): Store to save into
+        scenarios (dict): Scenario name to {"data": records, "objective_value"}
+        work_types (list): Work types of the file, used for priorities and
+            for the cost of work types with no units allocated
+    """
+    known = {w['name']: w for w in work_types}
+    
+    for name, scenario in scenarios.items():
+        scenario_data = pd.DataFrame(scenario["data"])
+        units = scenario_data['Units Allocated'].to_numpy(dtype=float)
+        known_costs = scenario_data['Work Type'].map(lambda n: known.get(n, {}).get('cost', 0.0))
+        costs = np.where(units > 0, scenario_data['Cost'] / np.where(units > 0, units, 1), known_costs)
+        
+        scenario_types = pd.DataFrame({
+            'name': scenario_data['Work Type'],
+            'cost': costs,
+            'priority': scenario_data['Work Type'].map(lambda n: known.get(n, {}).get('priority', 0.0))
+        })
+        store.save(name, scenario_types, units.astype(int), scenario.get("objective_value"))
+
+def _read_json(f, scenario_store):
+    data = json.load(f)
+    
+    work_df = None
+    if "work_types" in data:
+        work_df = _validated(pd.DataFrame(data["work_types"]))
+    
+    count = 0
+    if scenario_store is not None:
+        if "scenario_store" in data:
+            scenario_store.update_from_dict(data["scenario_store"])
+            count += len(data["scenario_store"]["scenarios"])
+        # Files exported before the scenario store list every row
+        if "scenarios" in data:
+            import_legacy_scenarios(scenario_store, data["scenarios"], data.get("work_types", []))
+            count += len(data["scenarios"])
+    
+    return {'work_types': work_df, 'results': data.get("results"), 'budget': data.get("budget"), 'scenarios': count}
+
+def _read_npz(f, scenario_store):
+    with np.load(f, allow_pickle=False) as arrays:
+        version = int(arrays['format_version'])
+        if version > FORMAT_VERSION:
+            raise ValueError(f"File format version {version} is newer than this app supports ({FORMAT_VERSION})")
+        
+        work_df = _validated(pd.DataFrame({column: arrays[f'work_type_{column}'] for column in WORK_TYPE_COLUMNS}))
+        results_json = str(arrays['results_json'])
+        
+        count = 0
+        if scenario_store is not None and 'scenarios_scenario_names' in arrays.files:
+            scenario_arrays = {
+                name[len('scenarios_'):]: arrays[name] for name in arrays.files if name.startswith('scenarios_')
+            }
+            scenario_store.update_from_arrays(scenario_arrays)
+            count = len(scenario_arrays['scenario_names'])
+    
+    return {
+        'work_types': work_df,
+        'results': json.loads(results_json) if results_json else None,
+        'budget': None,
+        'scenarios': count
+    }
+
+def _validated(work_df):
+    errors = validate_work_types(work_df)
+    if errors:
+        raise ValueError("Invalid work types: " + "; ".join(errors))
+    return work_df
+
+def _peek(f, size):
+    """Read the first bytes of a file without consuming them."""
+    position = f.tell()
+    head = f.read(size)
+    f.seek(position)
+    return head
+
+def _json_default(value):
+    """Encode NumPy scalars and arrays that end up in results."""
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
@@ -0,0 +1,198 @@
+"""
+Presolve: shrink a work allocation problem before it reaches a solver.
+
+Portfolios of asset-level work types repeat themselves. reduce_problem()
+makes exact reductions, all vectorized:
+    - the spend on `min_units` is fixed up front, and a problem whose
+      minimum spend exceeds the budget is reported infeasible at once
+    - units that can never be chosen (no priority, or costlier than the
+      budget left) are fixed at the minimum, and free work with a priority
+      at the maximum; if everything left fits the budget it is all taken
+    - work types with the same cost and priority are merged into one item,
+      as any split of its units between them is equally good
+    - an item is dropped when the items that cost no more and are worth
+      no less cannot all be filled with room to spare for one of its units:
+      some optimum then never uses it, since moving a unit to an unfilled
+      better item never costs more nor gains less
+The reduced problem has the same columns as the original, so any engine
+solves it; postsolve() maps its allocation back to the original rows.
+"""
+import numpy as np
+import pandas as pd
+
+# Dominance is checked level by level of distinct priorities; with more
+# levels than this the reduction is skipped
+DOMINANCE_MAX_LEVELS = 64
+
+def reduce_problem(work_df, total_budget):
+    """
+    Reduce a single-budget problem to the items that compete for budget.
+    
+    The problem must have the shape the knapsack engine accepts (see
+    optimization.knapsack_supported): finite values, non-negative costs
+    and integer unit limits.
+    
+    Args:
+        work_df (pd.DataFrame): DataFrame containing work types; a name
+            column is optional and carried to the reduced work types
+        total_budget (float): Total available budget
+    
+    Returns:
+        dict: Reduction with:
+            - status: 'Infeasible' if the minimum units exceed the budget,
+              otherwise None
+            - work_df: Reduced work types (min_units 0), one per item
+            - total_budget: Budget left for the reduced work types
+            - base: Units per original row fixed by presolve
+            - offset: Priority value of the fixed units
+            - stats: rows, reduced_rows, fixed_rows, aggregated_rows,
+              dominated_rows and fixed_spend
+            plus the row mapping used by postsolve
+    """
+    costs = work_df['cost'].to_numpy(dtype=float)
+    priorities = work_df['priority'].to_numpy(dtype=float)
+    min_units = work_df['min_units'].to_numpy(dtype=float).astype(np.int64)
+    max_units = work_df['max_units'].to_numpy(dtype=float).astype(np.int64)
+    n = len(costs)
+    
+    mandatory = float(np.dot(costs, min_units))
+    slack = float(total_budget) - mandatory
+    if slack < -1e-9 * max(1.0, abs(float(total_budget))):
+        return {'status': 'Infeasible', 'base': min_units, 'stats': _stats(n, 0, n, 0, 0, mandatory)}
+    slack = max(slack, 0.0)
+    
+    base = min_units.copy()
+    free = (costs == 0) & (priorities > 0)
+    base[free] = max_units[free]
+    
+    # Units above the minimum each paid row could take within the budget
+    paid = (costs > 0) & (priorities > 0)
+    room = np.zeros(n, dtype=np.int64)
+    room[paid] = np.minimum(max_units[paid] - min_units[paid], np.floor(slack / costs[paid] + 1e-9))
+    rows = np.flatnonzero(room > 0)
+    
+    if float(np.dot(costs[rows], room[rows])) <= slack + 1e-9:
+        # Everything left fits the budget
+        base[rows] += room[rows]
+        rows = rows[:0]
+    
+    # Merge rows with the same cost and priority into one item
+    order = rows[np.lexsort((rows, priorities[rows], costs[rows]))]
+    boundary = np.ones(len(order), dtype=bool)
+    boundary[1:] = (np.diff(costs[order]) != 0) | (np.diff(priorities[order]) != 0)
+    starts = np.flatnonzero(boundary)
+    group = np.cumsum(boundary) - 1
+    item_costs = costs[order[starts]]
+    item_priorities = priorities[order[starts]]
+    item_room = np.minimum(np.bincount(group, weights=room[order], minlength=len(starts)), np.floor(slack / item_costs + 1e-9))
+    
+    kept = ~_dominated(item_costs, item_priorities, item_room, slack)
+    item_index = np.full(len(starts), -1, dtype=np.int64)
+    item_index[kept] = np.arange(int(kept.sum()))
+    
+    reduced = pd.DataFrame({
+        'cost': item_costs[kept],
+        'priority': item_priorities[kept],
+        'min_units': np.zeros(int(kept.sum()), dtype=np.int64),
+        'max_units': item_room[kept].astype(np.int64)
+    })
+    if 'name' in work_df:
+        reduced.insert(0, 'name', work_df['name'].to_numpy()[order[starts[kept]]])
+    
+    member = kept[group]
+    fixed_spend = float(np.dot(costs, base))
+    return {
+        'status': None,
+        'work_df': reduced,
+        'total_budget': float(total_budget) - fixed_spend,
+        'base': base,
+        'offset': float(np.dot(priorities, base)),
+        'priorities': priorities,
+        # Original rows of each kept item, in row order, with their room
+        'rows': order[member],
+        'row_item': item_index[group[member]],
+        'row_room': room[order[member]],
+        'stats': _stats(
+            n, len(reduced), n - len(order), int(member.sum()) - len(reduced), int((~member).sum()), fixed_spend
+        )
+    }
+
+def postsolve(reduction, allocation):
+    """
+    Map an allocation of the reduced work types back to the original rows.
+    
+    An item's units go to its rows in row order, each up to its room.
+    
+    Args:
+        reduction (dict): Result of reduce_problem
+        allocation (array-like): Units per reduced work type
+    
+    Returns:
+        np.ndarray: Units per original row
+    """
+    units = reduction['base'].copy()
+    if len(reduction['rows']) == 0:
+        return units
+    
+    item_units = np.asarray(allocation, dtype=np.int64)[reduction['row_item']]
+    room = reduction['row_room']
+    # Room of the earlier rows of the same item
+    cumulative = np.cumsum(room)
+    first = np.flatnonzero(np.concatenate(([True], np.diff(reduction['row_item']) != 0)))
+    before = cumulative - room - np.repeat(cumulative[first] - room[first], np.diff(np.append(first, len(room))))
+    units[reduction['rows']] += np.clip(item_units - before, 0, room)
+    return units
+
+def reduce_start(reduction, allocation):
+    """
+    Map an allocation of the original rows onto the reduced work types.
+    
+    Units of rows that presolve fixed or dropped are ignored, so the
+    result can be infeasible for the reduced problem; use it as a start.
+    
+    Returns:
+        np.ndarray: Units per reduced work type
+    """
+    extra = np.asarray(allocation, dtype=np.int64)[reduction['rows']] - reduction['base'][reduction['rows']]
+    extra = np.clip(extra, 0, reduction['row_room'])
+    return np.bincount(reduction['row_item'], weights=extra, minlength=len(reduction['work_df'])).astype(np.int64)
+
+def _dominated(costs, priorities, room, capacity):
+    """
+    Items some optimum leaves empty.
+    
+    Item i is dominated when filling every other item that costs no more
+    and is worth no less leaves no room for a unit of i. Items are
+    distinct in (cost, priority), so the dominance is strict.
+    
+    Returns:
+        np.ndarray: Boolean mask of dominated items
+    """
+    dominated = np.zeros(len(costs), dtype=bool)
+    levels = np.unique(priorities)
+    if len(costs) < 2 or len(levels) > DOMINANCE_MAX_LEVELS:
+        return dominated
+    
+    order = np.argsort(costs, kind='stable')
+    sorted_costs = costs[order]
+    spend = costs * room
+    # Position after the last item costing no more than each item
+    reach = np.searchsorted(sorted_costs, costs, side='right')
+    
+    for level in levels:
+        at_level = priorities == level
+        # Spend of filling every item worth at least this level, by cost
+        cumulative = np.concatenate(([0.0], np.cumsum(np.where(priorities[order] >= level, spend[order], 0.0))))
+        better = cumulative[reach[at_level]] - spend[at_level]
+        dominated[at_level] = better + costs[at_level] > capacity + 1e-9
+    return dominated
+
+def _stats(rows, reduced_rows, fixed_rows, aggregated_rows, dominated_rows, fixed_spend):
+    return {
+        'rows': rows,
+        'reduced_rows': reduced_rows,
+        'fixed_rows': fixed_rows,
+        'aggregated_rows': aggregated_rows,
+        'dominated_rows': dominated_rows,
+        'fixed_spend': fixed_spend
+    }
@@ -0,0 +1,248 @@
+"""
+Monte Carlo robustness of allocations under uncertain unit costs.
+
+Unit costs are drawn for thousands of scenarios at once, one row per
+scenario and one column per work type. Every candidate allocation is then
+priced against all scenarios in a single matrix product, which gives the
+probability of overrunning the budget and the expected shortfall. Each
+sampled cost vector can also be re-optimized, in parallel, to see how the
+best allocation itself moves with the costs.
+
+Work types may carry their own `cost_distribution` and `cost_spread`
+columns; the rest use the defaults passed in.
+"""
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import ExitStack
+from functools import partial
+
+import numpy as np
+import pandas as pd
+
+from diagnostics import notify_solve_hooks
+from optimization import _optimize, _optional_column
+
+DISTRIBUTIONS = ('lognormal', 'normal', 'triangular', 'uniform')
+
+# Cost scenarios drawn per block; blocks keep memory flat for large portfolios
+SAMPLE_BLOCK_CELLS = 5_000_000
+
+# Share of the costliest scenarios averaged into the tail cost
+TAIL_SHARE = 0.05
+
+METRIC_COLUMNS = ['Scenario', 'Expected Cost', 'Cost P95', 'Overrun Probability', 'Expected Shortfall', 'Tail Cost']
+
+def sample_costs(work_df, n_samples=1000, distribution='lognormal', spread=0.1, seed=0):
+    """
+    Draw unit cost scenarios for every work type.
+    
+    Each distribution is centred on the work type's cost, with `spread`
+    setting its width relative to the cost:
+        - lognormal: mean equal to the cost, coefficient of variation spread
+        - normal: standard deviation spread * cost, cut off at zero
+        - triangular: from (1 - spread) to (1 + 2 * spread) times the cost,
+          most likely at the cost, so overruns reach further than savings
+        - uniform: between (1 - spread) and (1 + spread) times the cost
+    
+    Args:
+        work_df (pd.DataFrame): Work types; optional cost_distribution and
+            cost_spread columns override the defaults per work type
+        n_samples (int): Number of scenarios
+        distribution (str): Default distribution (one of DISTRIBUTIONS)
+        spread (float): Default relative spread
+        seed (int): Random seed; the same arguments give the same scenarios
+    
+    Returns:
+        np.ndarray: Unit costs of shape (n_samples, work types)
+    """
+    blocks = list(iter_cost_samples(work_df, n_samples, distribution, spread, seed))
+    return np.vstack(blocks) if blocks else np.zeros((0, len(work_df)))
+
+def iter_cost_samples(work_df, n_samples=1000, distribution='lognormal', spread=0.1, seed=0, block_rows=None):
+    """
+    Yield cost scenarios a block of rows at a time (see sample_costs).
+    
+    Args:
+        block_rows (int): Scenarios per block (default: as many as fit in
+            SAMPLE_BLOCK_CELLS values)
+    
+    Yields:
+        np.ndarray: Unit costs of shape (block rows, work types)
+    """
+    costs = work_df['cost'].to_numpy(dtype=float)
+    kinds = _optional_column(work_df, 'cost_distribution', distribution).astype(str)
+    spreads = _optional_column(work_df, 'cost_spread', spread).astype(float)
+    
+    unknown = set(np.unique(kinds)) - set(DISTRIBUTIONS)
+    if unknown:
+        raise ValueError(f"Unknown cost distribution: {', '.join(sorted(unknown))}. Expected one of {DISTRIBUTIONS}")
+    if (spreads < 0).any():
+        raise ValueError("Cost spread must be non-negative")
+    
+    groups = [(kind, np.flatnonzero(kinds == kind)) for kind in DISTRIBUTIONS]
+    groups = [(kind, columns) for kind, columns in groups if len(columns)]
+    block_rows = block_rows or max(SAMPLE_BLOCK_CELLS // max(len(costs), 1), 1)
+    rng = np.random.default_rng(seed)
+    
+    for start in range(0, n_samples, block_rows):
+        rows = min(block_rows, n_samples - start)
+        factors = np.empty((rows, len(costs)))
+        for kind, columns in groups:
+            factors[:, columns] = _draw_factors(rng, kind, spreads[columns], rows)
+        yield factors * costs
+
+def evaluate_allocations(names, allocations, cost_samples, total_budget, priorities=None):
+    """
+    Price allocations against every cost scenario at once.
+    
+    Args:
+        names (list): Label of each allocation
+        allocations (array-like): Units per work type, one row per allocation
+        cost_samples (np.ndarray or iterable): Scenarios from sample_costs,
+            or blocks from iter_cost_samples
+        total_budget (float): Budget the allocations must fit
+        priorities (array-like): Priorities of the work types, to report
+            each allocation's priority value
+    
+    Returns:
+        pd.DataFrame: Scenario, Priority Value (if priorities are given),
+            Expected Cost, Cost P95, Overrun Probability, Expected Shortfall
+            (mean budget overrun, counting scenarios within budget as zero)
+            and Tail Cost (mean cost of the costliest TAIL_SHARE of scenarios)
+    """
+    allocations = np.atleast_2d(np.asarray(allocations, dtype=float))
+    metrics = summarize_totals(names, scenario_totals(allocations, cost_samples), total_budget)
+    if priorities is not None:
+        metrics.insert(1, 'Priority Value', allocations @ np.asarray(priorities, dtype=float))
+    return metrics
+
+def summarize_totals(names, totals, total_budget):
+    """
+    Robustness metrics from the scenario totals of each allocation.
+    
+    Args:
+        names (list): Label of each allocation
+        totals (np.ndarray): Result of scenario_totals
+        total_budget (float): Budget the allocations must fit
+    
+    Returns:
+        pd.DataFrame: The columns of evaluate_allocations except Priority Value
+    """
+    if len(totals) == 0:
+        return pd.DataFrame({'Scenario': list(names)}).reindex(columns=METRIC_COLUMNS)
+    
+    tail = max(int(np.ceil(len(totals) * TAIL_SHARE)), 1)
+    return pd.DataFrame({
+        'Scenario': list(names),
+        'Expected Cost': totals.mean(axis=0),
+        'Cost P95': np.percentile(totals, 95, axis=0),
+        'Overrun Probability': (totals > total_budget).mean(axis=0),
+        'Expected Shortfall': np.maximum(totals - total_budget, 0.0).mean(axis=0),
+        'Tail Cost': np.sort(totals, axis=0)[-tail:].mean(axis=0)
+    })
+
+def scenario_totals(allocations, cost_samples):
+    """
+    Total cost of every allocation in every scenario.
+    
+    Returns:
+        np.ndarray: Shape (scenarios, allocations)
+    """
+    allocations = np.atleast_2d(np.asarray(allocations, dtype=float))
+    blocks = [cost_samples] if isinstance(cost_samples, np.ndarray) else cost_samples
+    totals = [block @ allocations.T for block in blocks]
+    return np.vstack(totals) if totals else np.zeros((0, len(allocations)))
+
+def iter_resolves(work_df, total_budget, cost_samples, engine='approx', workers=None, chunksize=16):
+    """
+    Re-optimize the allocation for each cost scenario.
+    
+    Like iter_sensitivity, solves run in this process or on a pool of
+    spawned worker processes and are yielded in scenario order, and closing
+    the generator early drops scenarios not yet started.
+    
+    Args:
+        work_df (pd.DataFrame): Work types
+        total_budget (float): Total available budget
+        cost_samples (np.ndarray): Scenarios from sample_costs
+        engine (str): Solver engine (see optimize_work_allocation)
+        workers (int): Number of worker processes (None or 1 solves serially)
+        chunksize (int): Scenarios sent to a worker at a time
+    
+    Yields:
+        dict: Optimization result for each scenario (see
+            optimize_work_allocation)
+    """
+    columns = {column: work_df[column].to_numpy() for column in ('priority', 'min_units', 'max_units')}
+    solve = partial(_solve_scenario, columns, total_budget, engine)
+    
+    with ExitStack() as stack:
+        if workers is None or workers <= 1 or len(cost_samples) == 0:
+            solved = map(solve, cost_samples)
+        else:
+            context = multiprocessing.get_context('spawn')
+            pool = stack.enter_context(ProcessPoolExecutor(max_workers=workers, mp_context=context))
+            stack.callback(pool.shutdown, wait=False, cancel_futures=True)
+            solved = pool.map(solve, cost_samples, chunksize=chunksize)
+        
+        for result in solved:
+            notify_solve_hooks(result)
+            yield result
+
+def summarize_resolves(work_df, results):
+    """
+    Summarize how re-optimized allocations vary across cost scenarios.
+    
+    Args:
+        work_df (pd.DataFrame): Work types
+        results (list): Results from iter_resolves
+    
+    Returns:
+        dict: 'work_types' (DataFrame of Work Type, Mean Units, Units P5,
+            Units P95 and Funded Share, the share of scenarios funding
+            more than the minimum), 'mean_allocation' (units per work type,
+            rounded) and 'objective_values' (array, one per scenario)
+    """
+    allocations = np.array([result['allocation'] for result in results], dtype=float).reshape(
+        len(results), len(work_df)
+    )
+    minimum = work_df['min_units'].to_numpy(dtype=float)
+    has_results = len(results) > 0
+    
+    return {
+        'work_types': pd.DataFrame({
+            'Work Type': work_df['name'].to_numpy(),
+            'Mean Units': allocations.mean(axis=0) if has_results else np.nan,
+            'Units P5': np.percentile(allocations, 5, axis=0) if has_results else np.nan,
+            'Units P95': np.percentile(allocations, 95, axis=0) if has_results else np.nan,
+            'Funded Share': (allocations > minimum).mean(axis=0) if has_results else np.nan
+        }),
+        'mean_allocation': np.round(allocations.mean(axis=0)).astype(int) if has_results else minimum.astype(int),
+        'objective_values': np.array([result['objective_value'] for result in results], dtype=float)
+    }
+
+def _solve_scenario(columns, total_budget, engine, costs):
+    # Whole-currency costs keep the knapsack on a coarse integer grid
+    work_df = pd.DataFrame(dict(columns, cost=np.round(costs)))
+    return _optimize(work_df, total_budget, engine)
+
+def _draw_factors(rng, kind, spreads, rows):
+    """Cost multipliers with mean or mode 1 for one distribution."""
+    shape = (rows, len(spreads))
+    if kind == 'lognormal':
+        sigma = np.sqrt(np.log1p(spreads ** 2))
+        return np.exp(rng.standard_normal(shape) * sigma - sigma ** 2 / 2)
+    if kind == 'normal':
+        return np.maximum(1.0 + rng.standard_normal(shape) * spreads, 0.0)
+    if kind == 'triangular':
+        low, high = 1.0 - np.minimum(spreads, 1.0), 1.0 + 2 * spreads
+        # Inverse CDF of a triangle from low to high with its mode at 1
+        u = rng.random(shape)
+        width = np.where(high > low, high - low, 1.0)
+        cut = (1.0 - low) / width
+        return np.where(
+            u < cut,
+            low + np.sqrt(u * width * (1.0 - low)),
+            high - np.sqrt((1.0 - u) * width * (high - 1.0))
+        )
+    return 1.0 + (2 * rng.random(shape) - 1.0) * np.minimum(spreads, 1.0)
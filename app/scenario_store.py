@@ -0,0 +1,391 @@
+"""
+Disk-backed store of saved scenarios.
+
+A scenario is an allocation of units over a set of work types. The first
+scenario saved for a set of work types becomes the baseline for that set;
+every scenario after it is stored as the sparse list of work types whose
+units differ from the baseline. Arrays are kept in the smallest integer
+type that holds them, in a SQLite file, and read only when needed.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+# Environment variable naming a SQLite file shared by every session
+SCENARIO_PATH_ENV = 'WORK_PLANNER_SCENARIO_PATH'
+
+SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS baselines ("
+    "id TEXT PRIMARY KEY, names TEXT NOT NULL, costs BLOB NOT NULL, "
+    "priorities BLOB NOT NULL, allocation BLOB NOT NULL, allocation_dtype TEXT NOT NULL)",
+    "CREATE TABLE IF NOT EXISTS scenarios ("
+    "name TEXT PRIMARY KEY, baseline TEXT NOT NULL REFERENCES baselines(id), "
+    "objective_value REAL, delta_index BLOB NOT NULL, index_dtype TEXT NOT NULL, "
+    "delta_units BLOB NOT NULL, units_dtype TEXT NOT NULL, saved REAL NOT NULL)"
+)
+
+class ScenarioStore:
+    """
+    Saved scenarios as integer deltas from a per-work-type-set baseline.
+    
+    Only scenario names are read eagerly; allocations are rebuilt from the
+    file when a scenario is loaded or compared. Baselines read once are
+    kept in memory.
+    """
+    
+    def __init__(self, path=':memory:'):
+        """
+        Args:
+            path (str): SQLite file (the default keeps the store in memory)
+        """
+        self.path = path
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._baselines = {}
+        
+        with self._lock, self._conn:
+            for statement in SCHEMA:
+                self._conn.execute(statement)
+    
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM scenarios").fetchone()[0]
+    
+    def __contains__(self, name):
+        with self._lock:
+            return self._conn.execute("SELECT 1 FROM scenarios WHERE name = ?", (name,)).fetchone() is not None
+    
+    def names(self):
+        """Scenario names in the order they were saved."""
+        with self._lock:
+            return [row[0] for row in self._conn.execute("SELECT name FROM scenarios ORDER BY saved, rowid")]
+    
+    def save(self, name, work_types, allocation, objective_value=None):
+        """
+        Save (or replace) a scenario.
+        
+        Args:
+            name (str): Scenario name
+            work_types (pd.DataFrame or list): Work types with name, cost and
+                priority, in allocation order
+            allocation (list): Units allocated to each work type
+            objective_value (float): Priority value reported by the solver
+        """
+        work_df = pd.DataFrame(work_types)
+        names = [str(n) for n in work_df['name']]
+        costs = work_df['cost'].to_numpy(dtype=float)
+        priorities = work_df['priority'].to_numpy(dtype=float)
+        allocation = np.asarray(allocation, dtype=np.int64)
+        
+        baseline_id = _baseline_id(names, costs, priorities)
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT allocation, allocation_dtype FROM baselines WHERE id = ?", (baseline_id,)
+            ).fetchone()
+            if row is None:
+                base_blob, base_dtype = _pack(allocation)
+                self._conn.execute(
+                    "INSERT INTO baselines (id, names, costs, priorities, allocation, allocation_dtype) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (baseline_id, json.dumps(names), costs.tobytes(), priorities.tobytes(), base_blob, base_dtype)
+                )
+                base = allocation
+            else:
+                base = _unpack(*row)
+            
+            index = np.flatnonzero(allocation != base)
+            index_blob, index_dtype = _pack(index)
+            units_blob, units_dtype = _pack(allocation[index])
+            self._conn.execute(
+                "INSERT OR REPLACE INTO scenarios "
+                "(name, baseline, objective_value, delta_index, index_dtype, delta_units, units_dtype, saved) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (name, baseline_id, objective_value, index_blob, index_dtype, units_blob, units_dtype, time.time())
+            )
+    
+    def delete(self, names):
+        """Delete scenarios, and baselines no scenario refers to any more."""
+        with self._lock, self._conn:
+            self._conn.executemany("DELETE FROM scenarios WHERE name = ?", [(name,) for name in names])
+            self._conn.execute("DELETE FROM baselines WHERE id NOT IN (SELECT DISTINCT baseline FROM scenarios)")
+            self._baselines.clear()
+    
+    def clear(self):
+        """Delete every scenario."""
+        self.delete(self.names())
+    
+    def load(self, name):
+        """
+        Load one scenario in the shape the comparison page displays.
+        
+        Returns:
+            dict: 'data' (DataFrame with Work Type, Units Allocated and
+                Cost), 'total_cost' and 'objective_value'
+        """
+        frame = self.allocation_frame([name])
+        metrics = self.metrics([name]).iloc[0]
+        return {
+            'data': frame.drop(columns='Scenario').reset_index(drop=True),
+            'total_cost': float(metrics['Total Cost']),
+            'objective_value': float(metrics['Priority Value'])
+        }
+    
+    def allocations(self, names):
+        """
+        Rebuild the allocations of several scenarios at once.
+        
+        Scenarios are grouped by baseline; each group's allocations are the
+        baseline repeated once per scenario with all deltas scattered in
+        a single indexing operation.
+        
+        Args:
+            names (list): Scenario names
+        
+        Returns:
+            list: (scenario names, baseline dict, allocation matrix of shape
+                scenarios x work types) per baseline, in first-seen order
+        """
+        rows = self._scenario_rows(names)
+        groups = {}
+        for name, baseline_id, _, index_blob, index_dtype, units_blob, units_dtype in rows:
+            groups.setdefault(baseline_id, []).append(
+                (name, _unpack(index_blob, index_dtype), _unpack(units_blob, units_dtype))
+            )
+        
+        result = []
+        for baseline_id, members in groups.items():
+            baseline = self._baseline(baseline_id)
+            matrix = np.tile(baseline['allocation'], (len(members), 1))
+            counts = [len(index) for _, index, _ in members]
+            scenario_rows = np.repeat(np.arange(len(members)), counts)
+            if len(scenario_rows):
+                matrix[scenario_rows, np.concatenate([index for _, index, _ in members])] = np.concatenate(
+                    [units for _, _, units in members]
+                )
+            result.append(([name for name, _, _ in members], baseline, matrix))
+        return result
+    
+    def metrics(self, names):
+        """
+        Compute comparison metrics for scenarios from their stored arrays.
+        
+        Returns:
+            pd.DataFrame: Scenario, Total Cost, Priority Value, Total Units
+                and Changed Work Types (relative to the baseline), in the
+                order of `names`
+        """
+        frames = []
+        for group_names, baseline, matrix in self.allocations(names):
+            frames.append(pd.DataFrame({
+                'Scenario': group_names,
+                'Total Cost': matrix @ baseline['costs'],
+                'Priority Value': matrix @ baseline['priorities'],
+                'Total Units': matrix.sum(axis=1),
+                'Changed Work Types': (matrix != baseline['allocation']).sum(axis=1)
+            }))
+        if not frames:
+            return pd.DataFrame(columns=['Scenario', 'Total Cost', 'Priority Value', 'Total Units', 'Changed Work Types'])
+        metrics = pd.concat(frames, ignore_index=True).set_index('Scenario')
+        return metrics.loc[[name for name in names if name in metrics.index]].reset_index()
+    
+    def allocation_frame(self, names):
+        """
+        Allocations of several scenarios as one long table.
+        
+        Returns:
+            pd.DataFrame: Scenario, Work Type, Units Allocated and Cost
+        """
+        frames = []
+        for group_names, baseline, matrix in self.allocations(names):
+            n_types = len(baseline['names'])
+            frames.append(pd.DataFrame({
+                'Scenario': np.repeat(group_names, n_types),
+                'Work Type': np.tile(baseline['names'], len(group_names)),
+                'Units Allocated': matrix.ravel(),
+                'Cost': (matrix * baseline['costs']).ravel()
+            }))
+        if not frames:
+            return pd.DataFrame(columns=['Scenario', 'Work Type', 'Units Allocated', 'Cost'])
+        return pd.concat(frames, ignore_index=True)
+    
+    def to_dict(self):
+        """
+        Export every scenario in delta form for JSON serialization.
+        
+        Returns:
+            dict: 'baselines' (work types and baseline allocation by id)
+                and 'scenarios' (baseline id, objective value and the
+                changed indices and units by name)
+        """
+        with self._lock:
+            baseline_ids = [row[0] for row in self._conn.execute("SELECT id FROM baselines")]
+        rows = self._scenario_rows(self.names())
+        
+        baselines = {}
+        for baseline_id in baseline_ids:
+            baseline = self._baseline(baseline_id)
+            baselines[baseline_id] = {
+                'names': baseline['names'],
+                'costs': baseline['costs'].tolist(),
+                'priorities': baseline['priorities'].tolist(),
+                'allocation': baseline['allocation'].tolist()
+            }
+        
+        scenarios = {
+            name: {
+                'baseline': baseline_id,
+                'objective_value': objective_value,
+                'index': _unpack(index_blob, index_dtype).tolist(),
+                'units': _unpack(units_blob, units_dtype).tolist()
+            }
+            for name, baseline_id, objective_value, index_blob, index_dtype, units_blob, units_dtype in rows
+        }
+        return {'baselines': baselines, 'scenarios': scenarios}
+    
+    def update_from_dict(self, data):
+        """Add the scenarios of a to_dict export, replacing any with the same name."""
+        for name, scenario in data['scenarios'].items():
+            baseline = data['baselines'][scenario['baseline']]
+            allocation = np.array(baseline['allocation'], dtype=np.int64)
+            allocation[np.array(scenario['index'], dtype=np.int64)] = scenario['units']
+            work_types = {'name': baseline['names'], 'cost': baseline['costs'], 'priority': baseline['priorities']}
+            self.save(name, work_types, allocation, scenario.get('objective_value'))
+    
+    def to_arrays(self):
+        """
+        Export every scenario as flat arrays for a columnar file.
+        
+        Per-baseline and per-scenario arrays are concatenated; the *_sizes
+        arrays give the length of each one's slice.
+        
+        Returns:
+            dict: NumPy arrays baseline_ids, baseline_sizes, names, costs,
+                priorities, allocation, scenario_names, scenario_baselines
+                (positions in baseline_ids), objective_values (NaN if
+                unknown), delta_sizes, delta_index and delta_units
+        """
+        with self._lock:
+            baseline_ids = [row[0] for row in self._conn.execute("SELECT id FROM baselines")]
+        baselines = [self._baseline(baseline_id) for baseline_id in baseline_ids]
+        rows = self._scenario_rows(self.names())
+        position = {baseline_id: i for i, baseline_id in enumerate(baseline_ids)}
+        
+        indices = [_unpack(row[3], row[4]).astype(np.int64) for row in rows]
+        units = [_unpack(row[5], row[6]).astype(np.int64) for row in rows]
+        return {
+            'baseline_ids': np.array(baseline_ids, dtype=str),
+            'baseline_sizes': np.array([len(b['names']) for b in baselines], dtype=np.int64),
+            'names': np.array([name for b in baselines for name in b['names']], dtype=str),
+            'costs': np.concatenate([b['costs'] for b in baselines] or [np.zeros(0)]),
+            'priorities': np.concatenate([b['priorities'] for b in baselines] or [np.zeros(0)]),
+            'allocation': np.concatenate([b['allocation'] for b in baselines] or [np.zeros(0, dtype=np.int64)]),
+            'scenario_names': np.array([row[0] for row in rows], dtype=str),
+            'scenario_baselines': np.array([position[row[1]] for row in rows], dtype=np.int64),
+            'objective_values': np.array([np.nan if row[2] is None else row[2] for row in rows], dtype=float),
+            'delta_sizes': np.array([len(index) for index in indices], dtype=np.int64),
+            'delta_index': np.concatenate(indices or [np.zeros(0, dtype=np.int64)]),
+            'delta_units': np.concatenate(units or [np.zeros(0, dtype=np.int64)])
+        }
+    
+    def update_from_arrays(self, arrays):
+        """Add the scenarios of a to_arrays export, replacing any with the same name."""
+        bounds = np.concatenate(([0], np.cumsum(arrays['baseline_sizes'])))
+        baselines = [
+            {
+                'name': arrays['names'][start:end].tolist(),
+                'cost': arrays['costs'][start:end],
+                'priority': arrays['priorities'][start:end],
+                'allocation': arrays['allocation'][start:end]
+            }
+            for start, end in zip(bounds[:-1], bounds[1:])
+        ]
+        
+        delta_bounds = np.concatenate(([0], np.cumsum(arrays['delta_sizes'])))
+        for i, name in enumerate(arrays['scenario_names'].tolist()):
+            baseline = baselines[arrays['scenario_baselines'][i]]
+            allocation = baseline['allocation'].astype(np.int64)
+            start, end = delta_bounds[i], delta_bounds[i + 1]
+            allocation[arrays['delta_index'][start:end]] = arrays['delta_units'][start:end]
+            objective_value = arrays['objective_values'][i]
+            work_types = {key: baseline[key] for key in ('name', 'cost', 'priority')}
+            self.save(name, work_types, allocation, None if np.isnan(objective_value) else float(objective_value))
+    
+    def _scenario_rows(self, names):
+        names = list(names)
+        if not names:
+            return []
+        with self._lock:
+            rows = []
+            # Stay under SQLite's limit on query parameters
+            for start in range(0, len(names), 500):
+                chunk = names[start:start + 500]
+                rows += self._conn.execute(
+                    "SELECT name, baseline, objective_value, delta_index, index_dtype, delta_units, units_dtype "
+                    f"FROM scenarios WHERE name IN ({','.join('?' * len(chunk))})",
+                    chunk
+                ).fetchall()
+        order = {name: i for i, name in enumerate(names)}
+        return sorted(rows, key=lambda row: order[row[0]])
+    
+    def _baseline(self, baseline_id):
+        baseline = self._baselines.get(baseline_id)
+        if baseline is None:
+            with self._lock:
+                names, costs, priorities, allocation, allocation_dtype = self._conn.execute(
+                    "SELECT names, costs, priorities, allocation, allocation_dtype FROM baselines WHERE id = ?",
+                    (baseline_id,)
+                ).fetchone()
+            baseline = self._baselines[baseline_id] = {
+                'names': json.loads(names),
+                'costs': np.frombuffer(costs, dtype=float),
+                'priorities': np.frombuffer(priorities, dtype=float),
+                'allocation': _unpack(allocation, allocation_dtype).astype(np.int64)
+            }
+        return baseline
+
+def open_session_store():
+    """
+    Open the scenario store for a new session.
+    
+    Uses the file named by WORK_PLANNER_SCENARIO_PATH if it is set, so
+    scenarios are shared and survive restarts; otherwise each session
+    gets its own temporary file.
+    """
+    path = os.environ.get(SCENARIO_PATH_ENV)
+    if not path:
+        handle, path = tempfile.mkstemp(prefix='scenarios-', suffix='.sqlite')
+        os.close(handle)
+    return ScenarioStore(path)
+
+def session_store(state):
+    """Return the scenario store kept in `state` (st.session_state), opening it on first use."""
+    store = state.get('scenario_store')
+    if store is None:
+        store = state['scenario_store'] = open_session_store()
+    return store
+
+def _baseline_id(names, costs, priorities):
+    """Content hash of a set of work types."""
+    digest = hashlib.sha256(json.dumps(names).encode())
+    digest.update(costs.tobytes())
+    digest.update(priorities.tobytes())
+    return digest.hexdigest()[:32]
+
+def _pack(values):
+    """Store integers in the smallest dtype that holds them."""
+    values = np.asarray(values, dtype=np.int64)
+    if len(values) == 0:
+        dtype = np.dtype(np.uint8)
+    else:
+        dtype = np.promote_types(np.min_scalar_type(values.min()), np.min_scalar_type(values.max()))
+    return values.astype(dtype).tobytes(), dtype.str
+
+def _unpack(blob, dtype):
+    return np.frombuffer(blob, dtype=np.dtype(dtype)).astype(np.int64)
@@ -0,0 +1,436 @@
+"""
+Sensitivity of the optimum to the budget and to priority or cost multipliers.
+
+A grid has a budget axis and any number of multiplier axes, each scaling
+the priority or the cost of some work types. Cells are not solved one by
+one; solutions are carried between neighbouring cells whenever they are
+provably still optimal:
+    - a row of budgets is answered by one budget frontier pass when the
+      work types allow it, and otherwise from the largest budget down,
+      keeping an allocation while it still fits
+    - along a priority axis the optimum is convex in the multiplier, so if
+      the optima at both ends of an interval give the scaled work types
+      the same priority value, the first is optimal throughout; only
+      intervals where they differ are bisected and solved
+    - along a cost axis only the scaled work types change, so the other
+      work types get one budget frontier pass for the whole axis, and each
+      cell is the best split of its budget between a unit combination of
+      the scaled work types and that frontier; when the frontier or the
+      combinations are out of reach, an optimal allocation is kept while
+      it still fits, as the feasible set only shrinks as costs grow
+Only solves proven optimal are reused; a grid with the 'approx' engine
+solves every row.
+"""
+import itertools
+
+import numpy as np
+import pandas as pd
+
+from diagnostics import PhaseTimer, notify_solve_hooks
+from optimization import _optimize, compute_budget_frontier, frontier_lookup, frontier_supported
+
+PARAMETERS = ('priority', 'cost')
+
+# Decimal places kept when costs are scaled
+COST_DECIMALS = 2
+
+# Budgets a row needs before one frontier pass beats solving them one by one
+FRONTIER_MIN_BUDGETS = 8
+
+# Engines whose 'Optimal' results may be carried to other cells
+EXACT_ENGINES = ('auto', 'knapsack', 'matrix', 'pulp')
+
+# Unit combinations of the scaled work types above which a cost axis is
+# not split against the frontier of the other work types
+COST_SPLIT_MAX_COMBINATIONS = 4096
+
+def compute_sensitivity_grid(work_df, budgets, axes, engine='auto', cache=None, on_progress=None, stop_event=None):
+    """
+    Solve the allocation problem over a grid of budgets and multipliers.
+    
+    Args:
+        work_df (pd.DataFrame): DataFrame containing work types
+        budgets (array-like): Budgets, the last axis of the grid
+        axes (list): Multiplier axes, each a dict with:
+            - parameter: 'priority' or 'cost'
+            - work_types: Names of the work types the multiplier scales
+            - multipliers: Values of the multiplier along the axis
+        engine (str): Solver engine (see optimize_work_allocation)
+        cache (solve_cache.SolveCache): Cache consulted before each
+            single-budget solve and updated with the new results
+        on_progress (callable): Called with the number of cells finished
+            so far after every row of budgets
+        stop_event (threading.Event): Set to stop early; cells not reached
+            are left as NaN
+    
+    Returns:
+        dict: Grid of shape (multipliers of each axis..., budgets):
+            - budgets, axes: The grid's coordinates
+            - objective_value: Optimal priority value of each cell
+            - total_cost: Cost of each cell's allocation
+            - units: Units of each work type named on any axis, with that
+              work type as an extra last dimension; work types sharing a
+              name are summed
+            - unit_names: Names of the work types in `units`
+            - stats: Cells, rows solved, frontier passes, single-budget
+              solves and cache hits, cells reused, and timings
+    
+    Raises:
+        ValueError: If an axis has an unknown parameter or work type
+    """
+    timer = PhaseTimer()
+    budgets = np.asarray(budgets, dtype=float)
+    axes = [_checked_axis(work_df, axis) for axis in axes]
+    unit_names = list(dict.fromkeys(name for axis in axes for name in axis['work_types']))
+    # Indicator of the rows behind each unit name, so duplicates are summed
+    names = work_df['name'].to_numpy()
+    unit_rows = np.zeros((len(names), len(unit_names)))
+    for column, name in enumerate(unit_names):
+        unit_rows[names == name, column] = 1.0
+    
+    shape = tuple(len(axis['multipliers']) for axis in axes) + (len(budgets),)
+    grid = {
+        'budgets': budgets,
+        'axes': axes,
+        'objective_value': np.full(shape, np.nan),
+        'total_cost': np.full(shape, np.nan),
+        'units': np.full(shape + (len(unit_names),), np.nan),
+        'unit_names': unit_names,
+        'stats': {
+            'cells': int(np.prod(shape)), 'rows_solved': 0, 'frontier_passes': 0,
+            'solves': 0, 'cache_hits': 0, 'reused': 0
+        }
+    }
+    sweep = GridSweep(work_df, budgets, engine, cache, grid['stats'])
+    
+    # Every combination of the outer axes is a line along the last axis
+    outer = [range(len(axis['multipliers'])) for axis in axes[:-1]]
+    finished = 0
+    for prefix in itertools.product(*outer):
+        if stop_event is not None and stop_event.is_set():
+            break
+        scaled = _scaled(work_df, [(axis, axis['multipliers'][i]) for axis, i in zip(axes, prefix)])
+        
+        if axes:
+            line = sweep.solve_line(scaled, axes[-1], stop_event)
+        else:
+            line = [sweep.solve_row(scaled, np.ones(len(budgets), dtype=bool))]
+        
+        for position, row in enumerate(line):
+            if row is None:
+                continue
+            index = prefix + (position,) if axes else ()
+            grid['objective_value'][index] = row['objective_value']
+            grid['total_cost'][index] = row['total_cost']
+            grid['units'][index] = row['allocation'] @ unit_rows
+            finished += len(budgets)
+        if on_progress is not None:
+            on_progress(finished)
+    
+    timer.lap('solve')
+    grid['stats']['timings'] = timer.finish()
+    return grid
+
+def grid_frame(grid):
+    """
+    Flatten a grid into one row per cell.
+    
+    Returns:
+        pd.DataFrame: One column per multiplier axis (named after its
+            parameter and work types), then budget, objective_value and
+            total_cost
+    """
+    coordinates = [axis['multipliers'] for axis in grid['axes']] + [grid['budgets']]
+    mesh = np.meshgrid(*coordinates, indexing='ij')
+    frame = pd.DataFrame({axis_label(axis): values.ravel() for axis, values in zip(grid['axes'], mesh)})
+    frame['budget'] = mesh[-1].ravel()
+    frame['objective_value'] = grid['objective_value'].ravel()
+    frame['total_cost'] = grid['total_cost'].ravel()
+    return frame
+
+def axis_label(axis):
+    """Label of a multiplier axis, e.g. 'priority x Pole Replacement'."""
+    return f"{axis['parameter']} x {', '.join(axis['work_types'])}"
+
+class GridSweep:
+    """Solves rows of budgets for one grid, counting the work it does."""
+    
+    def __init__(self, work_df, budgets, engine, cache, stats):
+        self.work_df = work_df
+        self.budgets = budgets
+        self.engine = engine
+        self.cache = cache
+        self.stats = stats
+        self.exact = engine in EXACT_ENGINES
+    
+    def solve_line(self, work_df, axis, stop_event=None):
+        """
+        Solve every row along one multiplier axis.
+        
+        Returns:
+            list: One row (see solve_row) per multiplier, None for rows not
+                reached before a stop
+        """
+        multipliers = np.asarray(axis['multipliers'], dtype=float)
+        order = np.argsort(multipliers, kind='stable')
+        scaled = [_scaled(work_df, [(axis, multipliers[i])]) for i in order]
+        index = _positions(work_df, axis['work_types'])
+        
+        if not self.exact or len(order) < 3:
+            rows = self._solve_each(scaled, stop_event)
+        elif axis['parameter'] == 'priority':
+            base = work_df['priority'].to_numpy(dtype=float)[index]
+            rows = self._priority_line(scaled, index, base, stop_event)
+        else:
+            rows = self._cost_split(work_df, scaled, index, stop_event)
+            if rows is None:
+                rows = self._cost_line(scaled, stop_event)
+        
+        line = [None] * len(order)
+        for position, row in zip(order, rows):
+            line[position] = row
+        return line
+    
+    def solve_row(self, work_df, columns, known=None):
+        """
+        Solve the budgets in `columns` for one set of work types.
+        
+        Args:
+            work_df (pd.DataFrame): Work types with multipliers applied
+            columns (np.ndarray): Boolean mask of the budgets to solve
+            known (dict): Row whose other budgets are kept
+        
+        Returns:
+            dict: allocation (budgets x work types), objective_value,
+                total_cost and optimal (mask of budgets proven optimal)
+        """
+        self.stats['rows_solved'] += 1
+        row = known or _empty_row(len(self.budgets), len(work_df))
+        priorities = work_df['priority'].to_numpy(dtype=float)
+        costs = work_df['cost'].to_numpy(dtype=float)
+        wanted = np.flatnonzero(columns)
+        
+        frontier = (
+            len(wanted) >= FRONTIER_MIN_BUDGETS and self.engine not in ('pulp', 'approx')
+            and frontier_supported(work_df, self.budgets[wanted].max())
+        )
+        if frontier:
+            self.stats['frontier_passes'] += 1
+            frontier = compute_budget_frontier(work_df, self.budgets[wanted].max())
+            for column in wanted:
+                self._store(row, column, frontier_lookup(frontier, self.budgets[column]), priorities, costs)
+            return row
+        
+        # Largest budget first: an allocation optimal for a larger budget
+        # stays optimal for a smaller one it still fits
+        previous = None
+        for column in wanted[np.argsort(-self.budgets[wanted], kind='stable')]:
+            budget = self.budgets[column]
+            if previous is not None and row['optimal'][previous] and row['total_cost'][previous] <= budget:
+                row['allocation'][column] = row['allocation'][previous]
+                row['objective_value'][column] = row['objective_value'][previous]
+                row['total_cost'][column] = row['total_cost'][previous]
+                row['optimal'][column] = True
+                self.stats['reused'] += 1
+            else:
+                self._store(row, column, self._solve(work_df, budget), priorities, costs)
+            previous = column
+        return row
+    
+    def _solve_each(self, scaled, stop_event):
+        rows = []
+        for work_df in scaled:
+            if stop_event is not None and stop_event.is_set():
+                break
+            rows.append(self.solve_row(work_df, np.ones(len(self.budgets), dtype=bool)))
+        return rows
+    
+    def _priority_line(self, scaled, index, base, stop_event):
+        """Bisect the multipliers, solving only where the ends disagree."""
+        rows = [None] * len(scaled)
+        everything = np.ones(len(self.budgets), dtype=bool)
+        rows[0] = self.solve_row(scaled[0], everything)
+        rows[-1] = self.solve_row(scaled[-1], everything)
+        
+        intervals = [(0, len(scaled) - 1, everything)]
+        while intervals:
+            if stop_event is not None and stop_event.is_set():
+                break
+            low, high, columns = intervals.pop()
+            if high - low < 2:
+                continue
+            
+            # Same priority value on the scaled work types at both ends
+            # means the lower end is optimal over the whole interval
+            slope_low = rows[low]['allocation'][:, index] @ base
+            slope_high = rows[high]['allocation'][:, index] @ base
+            certain = (
+                columns & rows[low]['optimal'] & rows[high]['optimal']
+                & np.isclose(slope_low, slope_high, rtol=1e-9, atol=1e-9)
+            )
+            for middle in range(low + 1, high):
+                rows[middle] = rows[middle] or _empty_row(len(self.budgets), len(scaled[middle]))
+                self._reuse(rows[middle], certain, rows[low], scaled[middle])
+            
+            remaining = columns & ~certain
+            if remaining.any():
+                middle = (low + high) // 2
+                rows[middle] = self.solve_row(scaled[middle], remaining, known=rows[middle])
+                intervals += [(middle, high, remaining), (low, middle, remaining)]
+        return rows
+    
+    def _cost_split(self, work_df, scaled, index, stop_event):
+        """
+        Answer a cost axis from one frontier pass over the unscaled work types.
+        
+        Returns:
+            list: One row per multiplier, or None if the frontier is not
+                available or the scaled work types have too many unit
+                combinations
+        """
+        lower = work_df['min_units'].to_numpy(dtype=float)[index]
+        upper = work_df['max_units'].to_numpy(dtype=float)[index]
+        if (
+            not (np.isfinite(lower).all() and np.isfinite(upper).all())
+            or (lower != np.round(lower)).any() or (upper != np.round(upper)).any() or (lower > upper).any()
+            or np.prod(upper - lower + 1) > COST_SPLIT_MAX_COMBINATIONS
+            or any((scaled_df['cost'].to_numpy(dtype=float) < 0).any() for scaled_df in scaled)
+        ):
+            return None
+        
+        rest = np.setdiff1d(np.arange(len(work_df)), index)
+        rest_df = work_df.iloc[rest].reset_index(drop=True)
+        max_budget = float(self.budgets.max())
+        if not frontier_supported(rest_df, max_budget):
+            return None
+        frontier = compute_budget_frontier(rest_df, max_budget)
+        self.stats['frontier_passes'] += 1
+        
+        # Every unit combination of the scaled work types, one per row
+        ranges = [np.arange(low, high + 1) for low, high in zip(lower.astype(np.int64), upper.astype(np.int64))]
+        combinations = np.stack([grid.ravel() for grid in np.meshgrid(*ranges, indexing='ij')], axis=1)
+        tolerance = 1e-9 * np.maximum(1.0, np.abs(self.budgets))[:, None]
+        
+        rows = []
+        for scaled_df in scaled:
+            if stop_event is not None and stop_event.is_set():
+                break
+            self.stats['rows_solved'] += 1
+            costs = scaled_df['cost'].to_numpy(dtype=float)
+            priorities = scaled_df['priority'].to_numpy(dtype=float)
+            
+            # Frontier breakpoint funded by what each combination leaves
+            left = self.budgets[:, None] - combinations @ costs[index]
+            breakpoint = np.searchsorted(frontier['budget'], left + tolerance, side='right') - 1
+            values = np.where(
+                breakpoint >= 0,
+                combinations @ priorities[index] + frontier['objective_value'][np.maximum(breakpoint, 0)],
+                -np.inf
+            )
+            best = np.argmax(values, axis=1)
+            funded = np.isfinite(values[np.arange(len(self.budgets)), best])
+            
+            # Budgets no split funds cannot fund the minimum units; like an
+            # infeasible solve, they keep the minimum units, unproven
+            allocation = np.tile(scaled_df['min_units'].to_numpy(dtype=float), (len(self.budgets), 1))
+            allocation[np.ix_(funded, index)] = combinations[best[funded]]
+            allocation[np.ix_(funded, rest)] = frontier['allocation'][breakpoint[funded, best[funded]]]
+            rows.append({
+                'allocation': allocation,
+                'objective_value': allocation @ priorities,
+                'total_cost': allocation @ costs,
+                'optimal': funded
+            })
+        return rows
+    
+    def _cost_line(self, scaled, stop_event):
+        """Keep each budget's allocation while rising costs still fit it."""
+        rows = []
+        for work_df in scaled:
+            if stop_event is not None and stop_event.is_set():
+                break
+            if not rows or (work_df['cost'] < 0).any():
+                rows.append(self.solve_row(work_df, np.ones(len(self.budgets), dtype=bool)))
+                continue
+            
+            previous = rows[-1]
+            row = _empty_row(len(self.budgets), len(work_df))
+            costs = work_df['cost'].to_numpy(dtype=float)
+            fits = previous['optimal'] & (previous['allocation'] @ costs <= self.budgets * (1 + 1e-12))
+            self._reuse(row, fits, previous, work_df)
+            if (~fits).any():
+                row = self.solve_row(work_df, ~fits, known=row)
+            rows.append(row)
+        return rows
+    
+    def _solve(self, work_df, budget):
+        if self.cache is not None:
+            hit = self.cache.get(work_df, budget, engine=self.engine)
+            if hit is not None:
+                self.stats['cache_hits'] += 1
+                return hit
+        
+        self.stats['solves'] += 1
+        result = _optimize(work_df, budget, self.engine)
+        if self.cache is not None:
+            result['stats']['cache'] = 'miss'
+            self.cache.put(work_df, budget, result, engine=self.engine)
+        notify_solve_hooks(result)
+        return result
+    
+    def _store(self, row, column, result, priorities, costs):
+        allocation = np.asarray(result['allocation'], dtype=float)
+        row['allocation'][column] = allocation
+        row['objective_value'][column] = allocation @ priorities
+        row['total_cost'][column] = allocation @ costs
+        row['optimal'][column] = self.exact and result['status'] == 'Optimal'
+    
+    def _reuse(self, row, columns, source, work_df):
+        """Copy proven optima into the same budgets of another row, re-priced for its work types."""
+        allocation = source['allocation'][columns]
+        row['allocation'][columns] = allocation
+        row['objective_value'][columns] = allocation @ work_df['priority'].to_numpy(dtype=float)
+        row['total_cost'][columns] = allocation @ work_df['cost'].to_numpy(dtype=float)
+        row['optimal'][columns] = True
+        self.stats['reused'] += int(np.count_nonzero(columns))
+
+def _empty_row(n_budgets, n_types):
+    return {
+        'allocation': np.full((n_budgets, n_types), np.nan),
+        'objective_value': np.full(n_budgets, np.nan),
+        'total_cost': np.full(n_budgets, np.nan),
+        'optimal': np.zeros(n_budgets, dtype=bool)
+    }
+
+def _scaled(work_df, settings):
+    """Work types with each (axis, multiplier) applied."""
+    if not settings:
+        return work_df
+    work_df = work_df.copy()
+    for axis, multiplier in settings:
+        column = axis['parameter']
+        values = work_df[column].to_numpy(dtype=float).copy()
+        values[_positions(work_df, axis['work_types'])] *= float(multiplier)
+        if column == 'cost':
+            # Scaled costs stay on a cent grid the knapsack frontier can use
+            values = np.round(values, COST_DECIMALS)
+        work_df[column] = values
+    return work_df
+
+def _positions(work_df, names):
+    """Positions of every work type with one of `names`, duplicate names included."""
+    known = set(work_df['name'])
+    missing = [name for name in names if name not in known]
+    if missing:
+        raise ValueError(f"Unknown work types: {', '.join(map(str, missing))}")
+    return np.flatnonzero(work_df['name'].isin(names).to_numpy())
+
+def _checked_axis(work_df, axis):
+    if axis['parameter'] not in PARAMETERS:
+        raise ValueError(f"Unknown sensitivity parameter: {axis['parameter']}. Expected one of {PARAMETERS}")
+    _positions(work_df, axis['work_types'])
+    return {
+        'parameter': axis['parameter'],
+        'work_types': list(axis['work_types']),
+        'multipliers': np.asarray(axis['multipliers'], dtype=float)
+    }
@@ -0,0 +1,290 @@
+import copy
+import hashlib
+import inspect
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from diagnostics import cache_status, empty_stats, notify_solve_hooks
+from optimization import optimize_work_allocation
+
+# Columns that determine the solution of a work allocation problem. Names
+# are labels only, so renamed work types share cache entries.
+KEY_COLUMNS = ['cost', 'priority', 'min_units', 'max_units']
+
+# Options that control how a solve runs but not the answer it is cached
+# under: only results that were not cut short are stored
+RUN_OPTIONS = ('time_limit', 'on_incumbent', 'stop_event')
+
+# Default solver options, so an explicit default and an omitted option
+# share a cache entry
+SOLVER_DEFAULTS = {
+    name: parameter.default
+    for name, parameter in inspect.signature(optimize_work_allocation).parameters.items()
+    if parameter.default is not inspect.Parameter.empty and name not in RUN_OPTIONS
+}
+
+# Environment variable naming the SQLite file of the default cache
+CACHE_PATH_ENV = 'WORK_PLANNER_CACHE_PATH'
+
+class SolveCache:
+    """
+    Cache of optimization results keyed by the content of the problem.
+    
+    Keys are a canonical hash of the work-type rows (independent of row
+    order, with normalized numerics) plus the budget and solver options.
+    Recent results are kept in an in-memory LRU; with a `path` they are
+    also written to a SQLite file shared by every session and process
+    using the same path.
+    """
+    
+    def __init__(self, max_entries=256, path=None, max_disk_entries=10000):
+        """
+        Args:
+            max_entries (int): Maximum number of results kept in memory
+            path (str): SQLite file for the persistent store (None keeps
+                results in memory only)
+            max_disk_entries (int): Maximum number of results kept on disk
+        """
+        self.max_entries = max_entries
+        self.path = path
+        self.max_disk_entries = max_disk_entries
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'disk_hits': 0, 'misses': 0, 'evictions': 0}
+        
+        if path:
+            with self._connect() as conn:
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS solves ("
+                    "key TEXT PRIMARY KEY, result TEXT NOT NULL, accessed REAL NOT NULL)"
+                )
+    
+    def get(self, work_df, total_budget, **options):
+        """
+        Look up the result of a solve.
+        
+        Args:
+            work_df (pd.DataFrame): DataFrame containing work types
+            total_budget (float): Total available budget
+            **options: Solver options passed to optimize_work_allocation
+        
+        Returns:
+            dict: Optimization results in work_df row order, or None. The
+                stats of a hit report the cache lookup time.
+        """
+        start = time.perf_counter()
+        key, order = problem_key(work_df, total_budget, **options)
+        
+        with self._lock:
+            stored = self._memory.get(key)
+            if stored is not None:
+                self._memory.move_to_end(key)
+                self._stats['hits'] += 1
+        
+        if stored is None and self.path:
+            stored = self._disk_get(key)
+            if stored is not None:
+                with self._lock:
+                    self._stats['disk_hits'] += 1
+                    self._remember(key, stored)
+        
+        if stored is None:
+            with self._lock:
+                self._stats['misses'] += 1
+            return None
+        
+        result = _from_canonical(stored, order)
+        seconds = time.perf_counter() - start
+        result['stats'] = dict(
+            stored.get('stats') or empty_stats(),
+            cache='hit',
+            timings={'cache_lookup': seconds, 'total': seconds}
+        )
+        return result
+    
+    def put(self, work_df, total_budget, result, **options):
+        """
+        Store the result of a solve.
+        
+        Args:
+            work_df (pd.DataFrame): DataFrame containing work types
+            total_budget (float): Total available budget
+            result (dict): Optimization results in work_df row order
+            **options: Solver options passed to optimize_work_allocation
+        """
+        key, order = problem_key(work_df, total_budget, **options)
+        stored = _to_canonical(result, order)
+        
+        with self._lock:
+            self._remember(key, stored)
+        
+        if self.path:
+            self._disk_put(key, stored)
+    
+    def stats(self):
+        """
+        Return hit/miss statistics.
+        
+        Returns:
+            dict: hits (memory), disk_hits, misses, evictions, entries in
+                memory, and hit_rate over all lookups
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            stats['entries'] = len(self._memory)
+        lookups = stats['hits'] + stats['disk_hits'] + stats['misses']
+        stats['hit_rate'] = (stats['hits'] + stats['disk_hits']) / lookups if lookups else 0.0
+        return stats
+    
+    def clear(self, disk=False):
+        """
+        Drop cached results and reset the statistics.
+        
+        Args:
+            disk (bool): Also delete the persistent store
+        """
+        with self._lock:
+            self._memory.clear()
+            self._stats = {name: 0 for name in self._stats}
+        
+        if disk and self.path:
+            with self._connect() as conn:
+                conn.execute("DELETE FROM solves")
+    
+    def _remember(self, key, stored):
+        """Insert into the in-memory LRU (caller holds the lock)."""
+        self._memory[key] = stored
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self._stats['evictions'] += 1
+    
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30)
+    
+    def _disk_get(self, key):
+        with self._connect() as conn:
+            row = conn.execute("SELECT result FROM solves WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            conn.execute("UPDATE solves SET accessed = ? WHERE key = ?", (time.time(), key))
+        return json.loads(row[0])
+    
+    def _disk_put(self, key, stored):
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO solves (key, result, accessed) VALUES (?, ?, ?)",
+                (key, json.dumps(stored, separators=(',', ':')), time.time())
+            )
+            # Drop the least recently used rows beyond the size limit
+            conn.execute(
+                "DELETE FROM solves WHERE key IN ("
+                "SELECT key FROM solves ORDER BY accessed DESC LIMIT -1 OFFSET ?)",
+                (self.max_disk_entries,)
+            )
+
+def problem_key(work_df, total_budget, **options):
+    """
+    Compute the content hash of a work allocation problem.
+    
+    Rows are sorted into a canonical order first, so the same work types
+    in a different order hash to the same key.
+    
+    Args:
+        work_df (pd.DataFrame): DataFrame containing work types
+        total_budget (float): Total available budget
+        **options: Solver options that can change the result
+    
+    Returns:
+        tuple: (key, order) where order maps canonical rows to work_df rows
+    """
+    options = {name: option for name, option in options.items() if name not in RUN_OPTIONS}
+    values = _normalize(work_df[KEY_COLUMNS].to_numpy(dtype=float))
+    order = np.lexsort(values.T[::-1])
+    
+    digest = hashlib.sha256()
+    digest.update(np.ascontiguousarray(values[order]).tobytes())
+    digest.update(repr(float(_normalize(np.array([float(total_budget)]))[0])).encode())
+    digest.update(json.dumps({**SOLVER_DEFAULTS, **options}, sort_keys=True, default=str).encode())
+    
+    return digest.hexdigest(), order
+
+def cached_optimize(work_df, total_budget, cache=None, **options):
+    """
+    Optimize work allocation, reusing an earlier result for the same problem.
+    
+    Results of a search stopped by its time limit or a stop request are
+    returned but not cached, so a later solve can improve on them.
+    
+    Args:
+        work_df (pd.DataFrame): DataFrame containing work types
+        total_budget (float): Total available budget
+        cache (SolveCache): Cache to use (defaults to get_default_cache())
+        **options: Solver options passed to optimize_work_allocation
+    
+    Returns:
+        dict: Optimization results (see optimize_work_allocation)
+    """
+    if cache is None:
+        cache = get_default_cache()
+    
+    result = cache.get(work_df, total_budget, **options)
+    if result is not None:
+        notify_solve_hooks(result)
+        return result
+    
+    return solve_and_cache(cache, work_df, total_budget, **options)
+
+def solve_and_cache(cache, work_df, total_budget, **options):
+    """Optimize after a cache miss, storing the result unless the search stopped early."""
+    with cache_status('miss'):
+        result = optimize_work_allocation(work_df, total_budget, **options)
+    if result['stats']['stopped'] in (None, 'gap'):
+        cache.put(work_df, total_budget, result, **options)
+    
+    return result
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+def get_default_cache():
+    """
+    Return the process-wide solve cache shared by all sessions.
+    
+    Results are persisted to the SQLite file named by the
+    WORK_PLANNER_CACHE_PATH environment variable, if it is set.
+    """
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = SolveCache(path=os.environ.get(CACHE_PATH_ENV))
+        return _default_cache
+
+def _normalize(values):
+    """Round away float noise and fold -0.0 into 0.0 so equal numbers hash equally."""
+    rounded = np.round(values, 9)
+    return np.where(rounded == 0, 0.0, rounded)
+
+def _to_canonical(result, order):
+    """Reorder a result's allocation into canonical row order."""
+    stored = dict(result)
+    stored['allocation'] = [result['allocation'][row] for row in order]
+    if 'stats' in result:
+        # The caller keeps the result, so the cache needs its own stats
+        stored['stats'] = copy.deepcopy(result['stats'])
+    return stored
+
+def _from_canonical(stored, order):
+    """Copy a stored result with its allocation back in the caller's row order."""
+    result = dict(stored)
+    allocation = [0] * len(order)
+    for canonical, row in enumerate(order):
+        allocation[row] = stored['allocation'][canonical]
+    result['allocation'] = allocation
+    return result
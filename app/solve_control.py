@@ -0,0 +1,75 @@
+"""
+Limits and callbacks for anytime solving.
+
+A SolveControl travels with one solve. Engines poll it to stop on a time
+limit, a reached MIP gap or a user request, and report every improving
+incumbent through it.
+"""
+import time
+
+class SolveControl:
+    """Time limit, gap target, stop request and incumbent callback of one solve."""
+    
+    def __init__(self, time_limit=None, mip_gap=None, on_incumbent=None, stop_event=None):
+        """
+        Args:
+            time_limit (float): Seconds before the best solution so far is
+                returned (None for no limit)
+            mip_gap (float): Relative gap between the incumbent and the bound
+                at which the search stops (None proves optimality)
+            on_incumbent (callable): Called with a result dict for every
+                improving solution found during the search
+            stop_event (threading.Event): Set from another thread to stop
+                early and keep the incumbent
+        """
+        self.time_limit = time_limit
+        self.mip_gap = mip_gap
+        self.on_incumbent = on_incumbent
+        self.stop_event = stop_event
+        self.stopped = None
+        self._start = time.perf_counter()
+    
+    @property
+    def limited(self):
+        """True if anything can stop the solve before optimality is proven."""
+        return self.time_limit is not None or self.mip_gap is not None or self.stop_event is not None
+    
+    def elapsed(self):
+        return time.perf_counter() - self._start
+    
+    def remaining(self):
+        """Seconds left before the time limit, or None without a limit."""
+        if self.time_limit is None:
+            return None
+        return max(self.time_limit - self.elapsed(), 0.0)
+    
+    def check(self):
+        """
+        Check whether the solve should stop now.
+        
+        Returns:
+            str: 'user' or 'time_limit' once a stop is due (and from then
+                on), otherwise None
+        """
+        if self.stopped is None:
+            if self.stop_event is not None and self.stop_event.is_set():
+                self.stopped = 'user'
+            elif self.time_limit is not None and self.elapsed() >= self.time_limit:
+                self.stopped = 'time_limit'
+        return self.stopped
+    
+    def gap_reached(self, objective_value, bound):
+        """Stop with reason 'gap' if the incumbent is within the target gap."""
+        if self.mip_gap is not None and relative_gap(objective_value, bound) <= self.mip_gap:
+            self.stopped = self.stopped or 'gap'
+            return True
+        return False
+    
+    def report(self, result):
+        """Pass an improving solution to the incumbent callback, if any."""
+        if self.on_incumbent is not None:
+            self.on_incumbent(result)
+
+def relative_gap(objective_value, bound):
+    """Relative gap between a maximization incumbent and its upper bound."""
+    return max(bound - objective_value, 0.0) / max(abs(objective_value), 1e-9)
@@ -0,0 +1,319 @@
+"""
+Shared solver service for every session of the app.
+
+Solves from all sessions run on one bounded pool of solver threads.
+Identical requests in flight at the same time are merged into a single
+solve whose result goes to every waiter, sessions take turns so one
+planner queueing many solves cannot starve the others, and new work is
+refused once the queue is full. It stands in for a separate solver
+process behind the same submit/ticket interface.
+"""
+import copy
+import heapq
+import itertools
+import os
+import threading
+from collections import defaultdict
+
+from diagnostics import notify_solve_hooks
+from solve_cache import _from_canonical, _to_canonical, get_default_cache, problem_key, solve_and_cache
+
+# Environment variables sizing the default service
+SOLVER_WORKERS_ENV = 'WORK_PLANNER_SOLVER_WORKERS'
+SOLVER_QUEUE_ENV = 'WORK_PLANNER_SOLVER_QUEUE'
+DEFAULT_QUEUE_DEPTH = 32
+
+class ServiceBusy(RuntimeError):
+    """Raised by SolverService.submit when the queue is full."""
+
+class _Request:
+    """One solve, shared by every ticket waiting for it."""
+    
+    def __init__(self, key, work_df, total_budget, options, order, session):
+        self.key = key
+        self.work_df = work_df
+        self.total_budget = total_budget
+        self.options = options
+        self.order = order
+        self.session = session
+        self.state = 'queued'
+        self.tickets = []
+        self.latest = None
+        self.result = None
+        self.error = None
+        self.stop_event = threading.Event()
+        self.finished = threading.Event()
+    
+    def report(self, result):
+        """Fan an improving incumbent out to every waiting ticket."""
+        self.latest = _incumbent_to_canonical(result, self.order)
+        for ticket in list(self.tickets):
+            if ticket.on_incumbent is not None:
+                ticket.on_incumbent(_incumbent_from_canonical(self.latest, ticket.order))
+
+class Ticket:
+    """One caller's claim on a solve that may be shared with other callers."""
+    
+    def __init__(self, service, request, order, on_incumbent=None, shared=False):
+        self.service = service
+        self.request = request
+        self.order = order
+        self.on_incumbent = on_incumbent
+        self.shared = shared
+        self.cancelled = False
+        self._detached = False
+        self._result = None
+    
+    def done(self):
+        return self._detached or self.request.finished.is_set()
+    
+    def wait(self, timeout=None):
+        """Block until the result is ready; returns True if it is."""
+        return self._detached or self.request.finished.wait(timeout)
+    
+    def result(self, timeout=None):
+        """
+        Return the optimization result, waiting for it if necessary.
+        
+        Returns:
+            dict: Result in this caller's row order (see
+                optimize_work_allocation). The stats of a result shared
+                with another caller report cache 'shared'. None if the
+                ticket was cancelled before any solution was found.
+        """
+        if not self.wait(timeout):
+            raise TimeoutError("Solve did not finish in time")
+        if self._detached:
+            return self._result
+        if self.request.error is not None:
+            raise self.request.error
+        if self.request.result is None:
+            return None
+        
+        result = _from_canonical(self.request.result, self.order)
+        result['stats'] = copy.deepcopy(result['stats'])
+        if self.shared:
+            result['stats']['cache'] = 'shared'
+        return result
+    
+    def cancel(self):
+        """
+        Stop waiting for the solve.
+        
+        The solve itself stops only when no other ticket waits for it; the
+        last ticket then receives the best solution found before the stop.
+        A ticket leaving a solve others still wait for keeps the best
+        solution found so far.
+        """
+        self.service._cancel(self)
+
+class SolverService:
+    """
+    Bounded pool of solver threads shared by all sessions.
+    
+    Requests are ordered by priority, then by how many requests their
+    session already has outstanding, then by arrival, so sessions take
+    turns at the same priority.
+    """
+    
+    def __init__(self, workers=None, max_queue=DEFAULT_QUEUE_DEPTH, cache=None):
+        """
+        Args:
+            workers (int): Number of solver threads (defaults to the number
+                of CPUs)
+            max_queue (int): Maximum number of requests waiting for a
+                solver thread before submit raises ServiceBusy
+            cache (solve_cache.SolveCache): Cache checked before queueing
+                and updated with new results (defaults to get_default_cache())
+        """
+        self.workers = workers or os.cpu_count() or 1
+        self.max_queue = max_queue
+        self.cache = cache
+        self._condition = threading.Condition()
+        self._queue = []
+        self._inflight = {}
+        self._outstanding = defaultdict(int)
+        self._sequence = itertools.count()
+        self._running = 0
+        self._closed = False
+        self._stats = {'submitted': 0, 'cache_hits': 0, 'deduplicated': 0, 'rejected': 0, 'completed': 0}
+        self._threads = [
+            threading.Thread(target=self._work, name=f'solver-{i}', daemon=True)
+            for i in range(self.workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+    
+    def submit(self, work_df, total_budget, session=None, priority=0, on_incumbent=None, **options):
+        """
+        Request a solve, joining an identical one already in flight.
+        
+        Args:
+            work_df (pd.DataFrame): DataFrame containing work types
+            total_budget (float): Total available budget
+            session (str): Caller's session, for fair ordering
+            priority (int): Higher priorities are served first
+            on_incumbent (callable): Called with each improving solution
+            **options: Solver options passed to optimize_work_allocation
+                (engine, time_limit, mip_gap)
+        
+        Returns:
+            Ticket: Claim on the result
+        
+        Raises:
+            ServiceBusy: If the queue already holds max_queue requests
+        """
+        cache = self._cache()
+        key, order = problem_key(work_df, total_budget, **options)
+        # Runs with different time limits can stop with different answers
+        key = (key, options.get('time_limit'))
+        
+        hit = cache.get(work_df, total_budget, **options)
+        if hit is not None:
+            notify_solve_hooks(hit)
+            request = _Request(key, work_df, total_budget, options, order, session)
+            request.result = _to_canonical(hit, order)
+            request.state = 'done'
+            request.finished.set()
+            with self._condition:
+                self._stats['submitted'] += 1
+                self._stats['cache_hits'] += 1
+            return Ticket(self, request, order)
+        
+        with self._condition:
+            self._stats['submitted'] += 1
+            request = self._inflight.get(key)
+            if request is not None and not request.stop_event.is_set():
+                ticket = Ticket(self, request, order, on_incumbent, shared=True)
+                request.tickets.append(ticket)
+                self._stats['deduplicated'] += 1
+                return ticket
+            
+            if len(self._queue) >= self.max_queue:
+                self._stats['rejected'] += 1
+                raise ServiceBusy(f"The solver queue is full ({self.max_queue} requests waiting); try again shortly")
+            
+            request = _Request(key, work_df, total_budget, options, order, session)
+            ticket = Ticket(self, request, order, on_incumbent)
+            request.tickets.append(ticket)
+            turn = self._outstanding[session]
+            self._outstanding[session] += 1
+            heapq.heappush(self._queue, (-priority, turn, next(self._sequence), request))
+            self._inflight[key] = request
+            self._condition.notify()
+        return ticket
+    
+    def stats(self):
+        """
+        Return the service's load and counters.
+        
+        Returns:
+            dict: workers, running, queued, and counts of submitted
+                requests, cache hits, requests merged into a solve in
+                flight, rejected requests and completed solves
+        """
+        with self._condition:
+            stats = dict(self._stats)
+            stats.update(workers=self.workers, running=self._running, queued=len(self._queue))
+        return stats
+    
+    def shutdown(self, wait=True):
+        """Stop the solver threads once the queue is empty."""
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        if wait:
+            for thread in self._threads:
+                thread.join()
+    
+    def _cache(self):
+        return self.cache if self.cache is not None else get_default_cache()
+    
+    def _work(self):
+        while True:
+            with self._condition:
+                while not self._queue and not self._closed:
+                    self._condition.wait()
+                if not self._queue:
+                    return
+                request = heapq.heappop(self._queue)[-1]
+                request.state = 'running'
+                self._running += 1
+            
+            try:
+                result = solve_and_cache(
+                    self._cache(),
+                    request.work_df,
+                    request.total_budget,
+                    on_incumbent=request.report,
+                    stop_event=request.stop_event,
+                    **request.options
+                )
+                request.result = _to_canonical(result, request.order)
+            except Exception as e:
+                request.error = e
+            
+            with self._condition:
+                self._running -= 1
+                self._stats['completed'] += 1
+                self._release(request)
+    
+    def _release(self, request):
+        """Finish a request and forget it (caller holds the lock)."""
+        self._outstanding[request.session] -= 1
+        if self._outstanding[request.session] <= 0:
+            del self._outstanding[request.session]
+        if self._inflight.get(request.key) is request:
+            del self._inflight[request.key]
+        request.state = 'done'
+        request.finished.set()
+    
+    def _cancel(self, ticket):
+        request = ticket.request
+        with self._condition:
+            if ticket.cancelled or request.finished.is_set():
+                return
+            ticket.cancelled = True
+            request.tickets.remove(ticket)
+            
+            if request.tickets:
+                # Others still wait: leave with the best solution so far
+                ticket._detached = True
+                if request.latest is not None:
+                    ticket._result = _incumbent_from_canonical(request.latest, ticket.order)
+            elif request.state == 'queued':
+                self._queue = [entry for entry in self._queue if entry[-1] is not request]
+                heapq.heapify(self._queue)
+                self._release(request)
+            else:
+                request.stop_event.set()
+
+_default_service = None
+_default_service_lock = threading.Lock()
+
+def get_solver_service():
+    """
+    Return the process-wide solver service shared by all sessions.
+    
+    WORK_PLANNER_SOLVER_WORKERS and WORK_PLANNER_SOLVER_QUEUE set its
+    number of solver threads and queue depth.
+    """
+    global _default_service
+    with _default_service_lock:
+        if _default_service is None:
+            _default_service = SolverService(
+                workers=int(os.environ.get(SOLVER_WORKERS_ENV) or 0) or None,
+                max_queue=int(os.environ.get(SOLVER_QUEUE_ENV) or DEFAULT_QUEUE_DEPTH)
+            )
+        return _default_service
+
+def _incumbent_to_canonical(result, order):
+    """Reorder an incumbent; CBC reports some incumbents without an allocation."""
+    if result['allocation'] is None:
+        return dict(result)
+    return _to_canonical(result, order)
+
+def _incumbent_from_canonical(stored, order):
+    if stored['allocation'] is None:
+        return dict(stored)
+    return _from_canonical(stored, order)
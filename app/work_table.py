@@ -0,0 +1,243 @@
+"""
+Column-oriented table of work types, the session's source of truth.
+
+Pages used to rebuild a DataFrame from a list of work type dicts on every
+Streamlit rerun. A WorkTable holds one NumPy array per column instead and
+never changes: adding, editing, deleting and bulk-updating work types
+return a new table. Every table gets a version number no other table
+shares, so the version identifies the content for job and cache keys,
+and everything derived from a table (its DataFrame, records, labels and
+allocation tables) is built once per version and reused on later reruns.
+"""
+import itertools
+import threading
+
+import numpy as np
+import pandas as pd
+
+from portfolio_io import WORK_TYPE_COLUMNS, validate_work_types
+
+# Columns a bulk update can set or scale
+BULK_COLUMNS = ('cost', 'priority', 'min_units', 'max_units')
+
+_versions = itertools.count(1)
+
+class WorkTable:
+    """
+    Immutable work types stored as one array per column.
+    
+    Columns beyond WORK_TYPE_COLUMNS (such as the robustness page's
+    cost_distribution) are carried along. Derived values are memoized per
+    table; treat the arrays and frames it returns as read-only.
+    """
+    
+    def __init__(self, columns=None):
+        """
+        Args:
+            columns (dict): Equally long arrays by column name; the
+                WORK_TYPE_COLUMNS are added empty if missing
+        """
+        columns = dict(columns or {})
+        for column in WORK_TYPE_COLUMNS:
+            columns.setdefault(column, np.empty(0, dtype=object if column == 'name' else np.int64))
+        self._columns = {}
+        for column, values in columns.items():
+            values = np.asarray(values)
+            values.setflags(write=False)
+            self._columns[column] = values
+        
+        lengths = {len(values) for values in self._columns.values()}
+        if len(lengths) > 1:
+            raise ValueError("Work type columns differ in length")
+        self._length = lengths.pop()
+        self.version = next(_versions)
+        self._derived = {}
+        self._lock = threading.Lock()
+    
+    @classmethod
+    def from_frame(cls, work_df):
+        """Table with the columns of a DataFrame."""
+        return cls({column: work_df[column].to_numpy() for column in work_df.columns})
+    
+    @classmethod
+    def from_records(cls, records):
+        """Table from a list of work type dicts (the original session layout)."""
+        return cls.from_frame(pd.DataFrame(list(records)))
+    
+    def __len__(self):
+        return self._length
+    
+    @property
+    def columns(self):
+        """Column names."""
+        return list(self._columns)
+    
+    def column(self, column):
+        """One column as a read-only array."""
+        return self._columns[column]
+    
+    def row(self, index):
+        """One work type as a dict of Python values."""
+        row = {}
+        for column, values in self._columns.items():
+            value = values[index]
+            row[column] = value.item() if isinstance(value, np.generic) else value
+        return row
+    
+    def derive(self, name, build, *args):
+        """
+        Build a value from this table once and return it on later calls.
+        
+        Args:
+            name (str): Names the derived value
+            build (callable): Called with the table and `args`
+            *args: Further inputs; numbers and strings are compared by
+                value and anything else by identity, so an allocation list
+                kept in session state is only processed once. Only the
+                latest value per name is kept
+        
+        Returns:
+            The value of build(self, *args)
+        """
+        with self._lock:
+            cached = self._derived.get(name)
+        if cached is not None and len(cached[0]) == len(args) and all(map(_same, cached[0], args)):
+            return cached[1]
+        
+        value = build(self, *args)
+        with self._lock:
+            self._derived[name] = (args, value)
+        return value
+    
+    def frame(self):
+        """The work types as a DataFrame."""
+        return self.derive('frame', lambda table: pd.DataFrame(table._columns))
+    
+    def records(self):
+        """The work types as a list of dicts, as exports write them."""
+        return self.derive('records', lambda table: table.frame().to_dict('records'))
+    
+    def labels(self):
+        """Numbered work type names for pickers."""
+        return self.derive('labels', lambda table: [f"{i + 1}. {name}" for i, name in enumerate(table.column('name'))])
+    
+    def spend(self, allocation):
+        """Cost of the units allocated to each work type."""
+        return self.derive('spend', _spend, allocation)
+    
+    def allocation_frame(self, allocation):
+        """
+        Results table of an allocation of these work types.
+        
+        Returns:
+            pd.DataFrame: Work Type, Units Allocated and Cost
+        """
+        return self.derive('allocation_frame', _allocation_frame, allocation)
+    
+    def append(self, record):
+        """Table with one more work type."""
+        return _checked(WorkTable.from_frame(pd.concat([self.frame(), pd.DataFrame([record])], ignore_index=True)))
+    
+    def edit(self, index, **changes):
+        """
+        Change fields of one work type.
+        
+        Args:
+            index (int): Position of the work type to change
+            **changes: New values by column name
+        
+        Returns:
+            WorkTable: The updated work types
+        
+        Raises:
+            ValueError: If a column is unknown or the result is invalid
+        """
+        unknown = set(changes) - set(WORK_TYPE_COLUMNS)
+        if unknown:
+            raise ValueError(f"Unknown work type columns: {', '.join(sorted(unknown))}")
+        
+        columns = dict(self._columns)
+        for column, value in changes.items():
+            columns[column] = _assigned(columns[column], [index], value)
+        return _checked(WorkTable(columns))
+    
+    def delete(self, indices):
+        """
+        Remove work types by position.
+        
+        Returns:
+            WorkTable: The remaining work types, in their original order
+        """
+        keep = np.ones(len(self), dtype=bool)
+        keep[list(indices)] = False
+        return WorkTable({column: values[keep] for column, values in self._columns.items()})
+    
+    def bulk_update(self, indices, column, value=None, factor=None):
+        """
+        Set or scale one column of several work types at once.
+        
+        Args:
+            indices (list): Positions of the work types to change
+            column (str): One of BULK_COLUMNS
+            value (float): New value for every selected work type
+            factor (float): Multiplier applied to the current values instead;
+                units are rounded to whole numbers
+        
+        Returns:
+            WorkTable: The updated work types
+        
+        Raises:
+            ValueError: If the column is not in BULK_COLUMNS, neither or both of
+                value and factor are given, or the result is invalid
+        """
+        if column not in BULK_COLUMNS:
+            raise ValueError(f"Cannot bulk update {column}. Expected one of {BULK_COLUMNS}")
+        if (value is None) == (factor is None):
+            raise ValueError("Give either a value or a factor")
+        
+        indices = list(indices)
+        current = self._columns[column]
+        values = value if factor is None else current[indices] * factor
+        if column.endswith('_units'):
+            values = np.round(values).astype(np.int64)
+        columns = dict(self._columns)
+        columns[column] = _assigned(current, indices, values)
+        return _checked(WorkTable(columns))
+
+def session_table(state):
+    """
+    Return the work types kept in `state` (st.session_state) as a WorkTable.
+    
+    A list of dicts left by an older session is converted once.
+    """
+    table = state.get('work_types')
+    if not isinstance(table, WorkTable):
+        table = state['work_types'] = WorkTable.from_records(table or [])
+    return table
+
+def _same(a, b):
+    return a is b or (isinstance(a, (int, float, str)) and type(a) is type(b) and a == b)
+
+def _assigned(values, indices, new_values):
+    """Copy of `values` with `new_values` at `indices`, widening the dtype if needed."""
+    new_values = np.asarray(new_values)
+    dtype = object if values.dtype == object or new_values.dtype.kind in 'OUS' else np.result_type(values, new_values)
+    values = values.astype(dtype)
+    values[indices] = new_values
+    return values
+
+def _spend(table, allocation):
+    return np.asarray(allocation, dtype=float) * table.column('cost').astype(float)
+
+def _allocation_frame(table, allocation):
+    return pd.DataFrame({
+        'Work Type': table.column('name'),
+        'Units Allocated': allocation,
+        'Cost': table.spend(allocation)
+    })
+
+def _checked(table):
+    errors = validate_work_types(table.frame())
+    if errors:
+        raise ValueError("; ".join(errors))
+    return table
@@ -0,0 +1,13 @@
+"""
+Reproducible benchmarks for the work allocation engine.
+
+Run the suites with `python -m benchmarks run` and compare two result
+files with `python -m benchmarks compare BASE NEW`.
+"""
+import os
+import sys
+
+# The app modules import each other by bare name, as Streamlit runs them
+APP_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app")
+if APP_DIR not in sys.path:
+    sys.path.insert(0, APP_DIR)
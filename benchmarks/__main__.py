@@ -0,0 +1,144 @@
+"""
+Command line entry point for the benchmark suites.
+
+Usage:
+    python -m benchmarks run [--quick] [--suites solve regions sensitivity io startup] [-o results.json]
+    python -m benchmarks compare BASE.json NEW.json [--threshold 1.2] [--no-fail-on-regression]
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import subprocess
+import sys
+
+import numpy as np
+import pandas as pd
+import pulp
+
+from benchmarks import suites
+
+SUITES = ('solve', 'regions', 'sensitivity', 'incremental', 'presolve', 'io', 'startup')
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+def git_commit():
+    """Commit hash of the working tree, marked dirty if it has changes."""
+    repo = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=repo, capture_output=True, text=True, check=True
+        ).stdout.strip()
+        dirty = subprocess.run(
+            ['git', 'status', '--porcelain', '--untracked-files=no'], cwd=repo, capture_output=True, text=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return commit + ('-dirty' if dirty else '')
+
+def environment():
+    """Machine and library versions recorded with every run."""
+    return {
+        'commit': git_commit(),
+        'timestamp': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'pulp': pulp.__version__
+    }
+
+def run(args):
+    meta = environment()
+    meta.update({'seed': args.seed, 'quick': args.quick, 'repeat': args.repeat})
+    
+    results = []
+    for suite in args.suites:
+        print(f"Running {suite} suite...", file=sys.stderr)
+        if suite == 'solve':
+            results += suites.run_solve_suite(args.engines, args.quick, args.repeat, args.seed)
+        elif suite == 'regions':
+            results += suites.run_regions_suite(args.quick, seed=args.seed)
+        elif suite == 'sensitivity':
+            results += suites.run_sensitivity_suite(quick=args.quick, seed=args.seed)
+        elif suite == 'incremental':
+            results += suites.run_incremental_suite(quick=args.quick, seed=args.seed)
+        elif suite == 'presolve':
+            results += suites.run_presolve_suite(quick=args.quick, repeat=args.repeat, seed=args.seed)
+        elif suite == 'io':
+            results += suites.run_io_suite(args.quick, args.repeat, args.seed)
+        elif suite == 'startup':
+            results += suites.run_startup_suite(args.repeat)
+    
+    output = args.output
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        stamp = meta['timestamp'].replace(':', '').replace('+0000', 'Z')
+        output = os.path.join(RESULTS_DIR, f"{stamp}-{meta['commit'] or 'unknown'}.json")
+    
+    with open(output, 'w') as f:
+        json.dump({'meta': meta, 'results': results}, f, indent=2)
+    
+    for record in results:
+        timings = ' '.join(f"{phase}={seconds:.4f}" for phase, seconds in record['timings'].items())
+        print(f"{record['suite']:<12} {record['case']:<40} {record['engine']:<9} {timings}")
+    print(f"Wrote {len(results)} results to {output}", file=sys.stderr)
+    return 0
+
+def compare(args):
+    with open(args.base) as f:
+        base = json.load(f)
+    with open(args.new) as f:
+        new = json.load(f)
+    
+    base_times = {_result_key(r): r['timings']['total'] for r in base['results']}
+    regressions = 0
+    
+    print(f"base: {base['meta'].get('commit')}  new: {new['meta'].get('commit')}")
+    print(f"{'suite':<12} {'case':<40} {'engine':<9} {'base (s)':>9} {'new (s)':>9} {'ratio':>7}")
+    for record in new['results']:
+        key = _result_key(record)
+        if key not in base_times:
+            continue
+        before, after = base_times[key], record['timings']['total']
+        ratio = after / before if before > 0 else float('inf')
+        flag = ''
+        if ratio > args.threshold:
+            regressions += 1
+            flag = '  REGRESSION'
+        print(f"{key[0]:<12} {key[1]:<40} {key[2]:<9} {before:>9.4f} {after:>9.4f} {ratio:>6.2f}x{flag}")
+    
+    print(f"{regressions} regression(s) above {args.threshold:.2f}x")
+    return 1 if regressions and args.fail_on_regression else 0
+
+def _result_key(record):
+    return record['suite'], record['case'], record['engine']
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks', description="Work allocation benchmarks")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    
+    run_parser = subparsers.add_parser('run', help="Run benchmark suites and write a results file")
+    run_parser.add_argument('--suites', nargs='+', choices=SUITES, default=list(SUITES))
+    run_parser.add_argument('--engines', nargs='+', choices=list(suites.ENGINES), default=list(suites.ENGINES))
+    run_parser.add_argument('--quick', action='store_true', help="Smaller portfolios for a fast check")
+    run_parser.add_argument('--repeat', type=int, default=3, help="Runs per measurement (the fastest is kept)")
+    run_parser.add_argument('--seed', type=int, default=0)
+    run_parser.add_argument('-o', '--output', help="Results file (default: benchmarks/results/<time>-<commit>.json)")
+    
+    compare_parser = subparsers.add_parser('compare', help="Compare two results files")
+    compare_parser.add_argument('base')
+    compare_parser.add_argument('new')
+    compare_parser.add_argument('--threshold', type=float, default=1.2, help="Slowdown ratio reported as a regression")
+    compare_parser.add_argument(
+        '--fail-on-regression', action=argparse.BooleanOptionalAction, default=True,
+        help="Exit with status 1 when any case regresses (default); --no-fail-on-regression only reports"
+    )
+    
+    args = parser.parse_args(argv)
+    return run(args) if args.command == 'run' else compare(args)
+
+if __name__ == "__main__":
+    sys.exit(main())
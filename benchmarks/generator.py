@@ -0,0 +1,125 @@
+"""Seeded generator of synthetic work-type portfolios."""
+import numpy as np
+import pandas as pd
+
+PRIORITY_DISTRIBUTIONS = ('uniform', 'skewed', 'flat')
+
+def generate_portfolio(n, seed=0, cost_spread=100.0, priority_distribution='uniform', min_fraction=0.1, max_units=50, budget_ratio=0.5):
+    """
+    Generate a random work-type portfolio and budget.
+    
+    The same arguments always produce the same portfolio.
+    
+    Args:
+        n (int): Number of work types
+        seed (int): Random seed
+        cost_spread (float): Ratio between the most and least expensive unit
+            cost; costs are log-uniform between 10 and 10 * cost_spread
+        priority_distribution (str): 'uniform' (1-10 evenly), 'skewed'
+            (mostly low priorities, few high) or 'flat' (all 5)
+        min_fraction (float): Average share of max_units that is required
+            as min_units (0 leaves every work type optional)
+        max_units (int): Largest possible max_units of a work type
+        budget_ratio (float): Budget as a share of the spend between funding
+            only min_units and funding every work type up to max_units
+    
+    Returns:
+        tuple: (work_df, total_budget)
+    """
+    rng = np.random.default_rng(seed)
+    
+    costs = np.round(10 * np.exp(rng.uniform(0, np.log(cost_spread), n)))
+    
+    if priority_distribution == 'uniform':
+        priorities = rng.integers(1, 11, n)
+    elif priority_distribution == 'skewed':
+        priorities = np.minimum(rng.geometric(0.35, n), 10)
+    elif priority_distribution == 'flat':
+        priorities = np.full(n, 5)
+    else:
+        raise ValueError(f"Unknown priority distribution: {priority_distribution}")
+    
+    maxima = rng.integers(1, max_units + 1, n)
+    minima = np.floor(maxima * rng.uniform(0, 2 * min_fraction, n).clip(0, 1)).astype(np.int64)
+    
+    work_df = pd.DataFrame({
+        'name': [f"Work Type {i}" for i in range(n)],
+        'cost': costs,
+        'priority': priorities,
+        'min_units': minima,
+        'max_units': maxima
+    })
+    
+    mandatory = float(np.dot(costs, minima))
+    full = float(np.dot(costs, maxima))
+    total_budget = float(np.round(mandatory + budget_ratio * (full - mandatory)))
+    
+    return work_df, total_budget
+
+def generate_portfolio_dict(n, seed=0, **kwargs):
+    """
+    Generate a portfolio in the shape of data/example_data.json.
+    
+    Args:
+        n (int): Number of work types
+        seed (int): Random seed
+        **kwargs: Passed to generate_portfolio
+    
+    Returns:
+        dict: Portfolio with `work_types` records and `budget`
+    """
+    work_df, total_budget = generate_portfolio(n, seed, **kwargs)
+    records = [
+        {
+            'name': row.name,
+            'cost': float(row.cost),
+            'priority': int(row.priority),
+            'min_units': int(row.min_units),
+            'max_units': int(row.max_units)
+        }
+        for row in work_df.itertuples(index=False)
+    ]
+    return {'work_types': records, 'budget': total_budget}
+
+def generate_regional_portfolio(n_regions, per_region=50, seed=0, region_ratio=0.6, total_ratio=0.8, **kwargs):
+    """
+    Generate a portfolio spread over regions, with crew hours as a second resource.
+    
+    Every region caps its cost and crew hours, and the linking limits
+    across regions are tighter than the sum of the region caps, so both
+    kinds of limit bind.
+    
+    Args:
+        n_regions (int): Number of regions
+        per_region (int): Work types per region
+        seed (int): Random seed
+        region_ratio (float): Region caps as a share of the spend between
+            minimum and maximum units in the region
+        total_ratio (float): Linking limits as a share of the sum of the
+            region caps
+        **kwargs: Passed to generate_portfolio
+    
+    Returns:
+        tuple: (work_df, limits, region_limits), the arguments of
+            multi_resource.optimize_multi_resource
+    """
+    rng = np.random.default_rng(seed)
+    work_df, _ = generate_portfolio(n_regions * per_region, seed, **kwargs)
+    work_df['region'] = [f"Region {i // per_region}" for i in range(len(work_df))]
+    work_df['crew_hours'] = np.round(work_df['cost'] * rng.uniform(0.05, 0.5, len(work_df)), 1)
+    
+    region_limits = {}
+    for region, rows in work_df.groupby('region'):
+        region_limits[region] = {
+            resource: float(np.round(
+                rows[resource] @ rows['min_units']
+                + region_ratio * (rows[resource] @ (rows['max_units'] - rows['min_units']))
+            ))
+            for resource in ('cost', 'crew_hours')
+        }
+    
+    limits = {
+        resource: float(np.round(total_ratio * sum(caps[resource] for caps in region_limits.values())))
+        for resource in ('cost', 'crew_hours')
+    }
+    return work_df, limits, region_limits
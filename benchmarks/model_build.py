@@ -0,0 +1,58 @@
+"""
+Benchmark the PuLP model builder against the matrix-form builder.
+
+Both builders are timed from a work-type DataFrame to a written MPS file,
+which is the input CBC receives from either engine.
+
+Usage:
+    python -m benchmarks.model_build [--sizes 1000 10000 100000] [--repeat 3]
+
+The PuLP builder grows quadratically, so it is skipped above --max-pulp-size.
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from benchmarks.generator import generate_portfolio
+from matrix_model import write_mps
+from optimization import build_pulp_problem, build_work_matrix_model
+
+def time_pulp_build(work_df, budget, path):
+    start = time.perf_counter()
+    prob, _ = build_pulp_problem(work_df, budget)
+    prob.writeMPS(path)
+    return time.perf_counter() - start
+
+def time_matrix_build(work_df, budget, path):
+    start = time.perf_counter()
+    model = build_work_matrix_model(work_df, budget)
+    write_mps(model, path)
+    return time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--max-pulp-size', type=int, default=10000)
+    args = parser.parse_args()
+    
+    print(f"{'work types':>10} {'pulp (s)':>10} {'matrix (s)':>11} {'speedup':>8} {'matrix us/type':>15}")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'model.mps')
+        for n in args.sizes:
+            work_df, budget = generate_portfolio(n)
+            # Repeated names must not collide in either builder
+            work_df['name'] = [f"Work Type {i % 100}" for i in range(n)]
+            matrix_time = min(time_matrix_build(work_df, budget, path) for _ in range(args.repeat))
+            if n <= args.max_pulp_size:
+                pulp_time = min(time_pulp_build(work_df, budget, path) for _ in range(args.repeat))
+                pulp_column = f"{pulp_time:>10.3f}"
+                speedup_column = f"{pulp_time / matrix_time:>7.1f}x"
+            else:
+                pulp_column = f"{'-':>10}"
+                speedup_column = f"{'-':>8}"
+            print(f"{n:>10} {pulp_column} {matrix_time:>11.3f} {speedup_column} {matrix_time / n * 1e6:>15.2f}")
+
+if __name__ == "__main__":
+    main()
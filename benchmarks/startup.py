@@ -0,0 +1,54 @@
+"""
+Measure the start-up cost of one app page in a fresh interpreter.
+
+Usage:
+    python -m benchmarks.startup "Import/Export Data"
+
+Runs app.py in Streamlit's bare mode with the page selected, twice: the
+first run is a cold start (importing Streamlit and the page's modules),
+the second is a rerun. Prints one JSON object with both times and the
+heavy modules the page loaded.
+"""
+import json
+import os
+import runpy
+import sys
+import time
+
+start = time.perf_counter()
+
+import streamlit as st
+
+from benchmarks import APP_DIR
+
+# Modules a page should load only if it needs them
+HEAVY_MODULES = ('pulp', 'charts', 'optimization', 'matrix_model', 'solver_service')
+
+def measure(page):
+    """
+    Time a cold start and a rerun of `page`.
+    
+    Returns:
+        dict: cold_start and rerun seconds, and the HEAVY_MODULES loaded
+    """
+    st.sidebar.radio = lambda label, options, *args, **kwargs: page
+    app_path = os.path.join(APP_DIR, 'app.py')
+    
+    runpy.run_path(app_path, run_name='__main__')
+    cold = time.perf_counter()
+    runpy.run_path(app_path, run_name='__main__')
+    rerun = time.perf_counter()
+    
+    return {
+        'cold_start': cold - start,
+        'rerun': rerun - cold,
+        'loaded': [name for name in HEAVY_MODULES if name in sys.modules]
+    }
+
+def measure_streamlit():
+    """Time importing Streamlit alone, the floor under every page's cold start."""
+    return {'cold_start': time.perf_counter() - start, 'rerun': 0.0, 'loaded': []}
+
+if __name__ == "__main__":
+    page = sys.argv[1] if len(sys.argv) > 1 else None
+    print(json.dumps(measure(page) if page else measure_streamlit()))
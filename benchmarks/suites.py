@@ -0,0 +1,478 @@
+"""
+Benchmark suites for solving, multi-resource decomposition, sensitivity
+sweeps, incremental re-optimization, presolve, import/export and app
+start-up.
+
+Each suite returns a list of result records. Times are the best of
+`repeat` runs, in seconds.
+"""
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+from pulp import LpStatus, PULP_CBC_CMD, value
+
+from benchmarks.generator import generate_portfolio, generate_portfolio_dict, generate_regional_portfolio
+from incremental import IncrementalSolver
+from matrix_model import read_solution, write_mps
+from multi_resource import optimize_multi_resource
+from optimization import (
+    _knapsack_choose, _knapsack_items, _knapsack_result, _optimize,
+    analyze_sensitivity, build_pulp_problem, build_work_matrix_model, knapsack_supported, solve_approx
+)
+from portfolio_io import export_bytes, read_export
+from scenario_store import ScenarioStore
+from sensitivity_grid import PARAMETERS, compute_sensitivity_grid
+
+ENGINES = ('knapsack', 'matrix', 'pulp', 'approx')
+
+# The PuLP model builder grows quadratically with the number of work types
+PULP_MAX_SIZE = 2000
+
+# The monolithic multi-resource MIP takes minutes beyond this many regions
+MONOLITHIC_MAX_REGIONS = 192
+
+# Single-row edits timed by the incremental suite
+EDIT_KINDS = ('max_units', 'priority', 'cost', 'delete', 'delete_rows')
+
+# Rows removed at once by a 'delete_rows' edit, as a bulk delete does
+DELETE_ROWS = 5
+
+# Export formats timed by the io suite: (format, compress)
+IO_FORMATS = (('json', False), ('json', True), ('npz', False), ('npz', True))
+
+# Pages of app.py timed by the start-up suite
+APP_PAGES = (
+    "Work Optimization", "Sensitivity Analysis", "Scenario Comparison", "Robustness Analysis", "Multi-Period Planning",
+    "Import/Export Data"
+)
+
+def solve_cases(quick=False):
+    """Portfolio shapes for the solve suite: (case name, generator kwargs)."""
+    sizes = [10, 100, 1000] if quick else [10, 100, 1000, 10000]
+    cases = [(f"n={n}", {'n': n}) for n in sizes]
+    
+    # Vary one property at a time around a mid-sized portfolio
+    variants = [
+        ('cost_spread', [10.0, 1000.0]),
+        ('priority_distribution', ['skewed', 'flat']),
+        ('min_fraction', [0.0, 0.4]),
+        ('budget_ratio', [0.1, 0.9])
+    ]
+    for name, values in variants:
+        for variant_value in values:
+            cases.append((f"n=1000,{name}={variant_value}", {'n': 1000, name: variant_value}))
+    
+    return cases
+
+def time_engine_phases(engine, work_df, total_budget):
+    """
+    Solve once with an engine, timing model build, solve and extraction.
+    
+    Returns:
+        dict: Timings and the result, or None if the engine does not apply
+    """
+    if engine == 'knapsack':
+        if not knapsack_supported(work_df, total_budget):
+            return None
+        return _time_knapsack(work_df, total_budget)
+    if engine == 'matrix':
+        return _time_matrix(work_df, total_budget)
+    if engine == 'pulp':
+        return _time_pulp(work_df, total_budget)
+    if engine == 'approx':
+        if not knapsack_supported(work_df, total_budget):
+            return None
+        return _time_approx(work_df, total_budget)
+    raise ValueError(f"Unknown engine: {engine}")
+
+def _time_knapsack(work_df, total_budget):
+    start = time.perf_counter()
+    items = _knapsack_items(work_df, total_budget)
+    built = time.perf_counter()
+    
+    chosen = None
+    if items is not None and len(items['active']) > 0:
+        active = items['active']
+        chosen = _knapsack_choose(items['costs'][active], items['priorities'][active], items['upper'], items['slack'])
+    solved = time.perf_counter()
+    
+    if items is None:
+        status, allocation = 'Infeasible', work_df['min_units'].to_numpy()
+    else:
+        status, allocation = 'Optimal', items['base'].copy()
+        if chosen is not None:
+            allocation[items['active']] += chosen
+    result = _knapsack_result(status, allocation, work_df['priority'].to_numpy(dtype=float))
+    extracted = time.perf_counter()
+    
+    return _phase_record(start, built, solved, extracted, result)
+
+def _time_matrix(work_df, total_budget):
+    with tempfile.TemporaryDirectory() as tmp:
+        mps_path = os.path.join(tmp, 'model.mps')
+        solution_path = os.path.join(tmp, 'model.sol')
+        
+        start = time.perf_counter()
+        model = build_work_matrix_model(work_df, total_budget)
+        write_mps(model, mps_path)
+        built = time.perf_counter()
+        
+        command = [PULP_CBC_CMD().path, mps_path, '-max', '-solve', '-solution', solution_path]
+        subprocess.run(command, check=True, stdout=subprocess.DEVNULL)
+        solved = time.perf_counter()
+        
+        result = read_solution(solution_path, model)
+        extracted = time.perf_counter()
+    
+    return _phase_record(start, built, solved, extracted, result)
+
+def _time_pulp(work_df, total_budget):
+    start = time.perf_counter()
+    prob, work_vars = build_pulp_problem(work_df, total_budget)
+    built = time.perf_counter()
+    
+    # PuLP writes the MPS file inside solve(), so that is part of this phase
+    prob.solve(PULP_CBC_CMD(msg=False))
+    solved = time.perf_counter()
+    
+    result = {
+        'status': LpStatus[prob.status],
+        'allocation': [int(value(var)) for var in work_vars],
+        'objective_value': value(prob.objective)
+    }
+    extracted = time.perf_counter()
+    
+    return _phase_record(start, built, solved, extracted, result)
+
+def _time_approx(work_df, total_budget):
+    result = solve_approx(work_df, total_budget)
+    timings = result['stats']['timings']
+    record = {
+        'timings': {
+            'build': timings['extract_data'],
+            'solve': timings.get('solve', 0.0),
+            'extract': timings.get('extract', 0.0),
+            'total': timings['total']
+        },
+        'status': result['status'],
+        'objective_value': result['objective_value'],
+        'mip_gap': result['stats']['mip_gap']
+    }
+    return record
+
+def _phase_record(start, built, solved, extracted, result):
+    return {
+        'timings': {
+            'build': built - start,
+            'solve': solved - built,
+            'extract': extracted - solved,
+            'total': extracted - start
+        },
+        'status': result['status'],
+        'objective_value': result['objective_value']
+    }
+
+def _best_of(repeat, run):
+    """Run a timed function several times and keep the fastest run."""
+    best = None
+    for _ in range(repeat):
+        record = run()
+        if record is None:
+            return None
+        if best is None or record['timings']['total'] < best['timings']['total']:
+            best = record
+    return best
+
+def run_solve_suite(engines=ENGINES, quick=False, repeat=3, seed=0):
+    """Time every engine on every portfolio shape."""
+    results = []
+    for case, params in solve_cases(quick):
+        work_df, total_budget = generate_portfolio(seed=seed, **params)
+        for engine in engines:
+            if engine == 'pulp' and params['n'] > PULP_MAX_SIZE:
+                continue
+            record = _best_of(repeat, lambda: time_engine_phases(engine, work_df, total_budget))
+            if record is None:
+                continue
+            record.update({'suite': 'solve', 'case': case, 'engine': engine, 'params': params})
+            results.append(record)
+    return results
+
+def run_regions_suite(quick=False, repeat=1, seed=0, per_region=50):
+    """
+    Time multi-resource solves as the number of regions grows.
+    
+    The monolithic MIP is skipped above MONOLITHIC_MAX_REGIONS, where a
+    single run takes minutes; the decomposition should grow close to
+    linearly throughout. The full run brackets the region count from which
+    'auto' decomposes (multi_resource.DECOMPOSE_MIN_REGIONS).
+    """
+    results = []
+    region_counts = [4, 16, 64] if quick else [4, 16, 64, 192, 256]
+    
+    for n_regions in region_counts:
+        work_df, limits, region_limits = generate_regional_portfolio(n_regions, per_region, seed=seed)
+        for method in ('monolithic', 'lagrangian'):
+            if method == 'monolithic' and n_regions > MONOLITHIC_MAX_REGIONS:
+                continue
+            def run():
+                result = optimize_multi_resource(work_df, limits, region_limits, method=method)
+                return {
+                    'timings': result['stats']['timings'],
+                    'status': result['status'],
+                    'objective_value': result['objective_value'],
+                    'mip_gap': result['stats']['mip_gap'],
+                    'iterations': result['stats']['iterations']
+                }
+            record = _best_of(repeat, run)
+            record.update({
+                'suite': 'regions',
+                'case': f"regions={n_regions},per_region={per_region}",
+                'engine': method,
+                'params': {'regions': n_regions, 'per_region': per_region}
+            })
+            results.append(record)
+    return results
+
+def run_sensitivity_suite(engines=('auto', 'matrix'), quick=False, repeat=1, seed=0):
+    """Time budget sensitivity sweeps at several resolutions."""
+    results = []
+    step_counts = [10, 40] if quick else [10, 40, 160]
+    work_df, total_budget = generate_portfolio(200, seed=seed)
+    
+    for engine in engines:
+        for steps in step_counts:
+            def run():
+                start = time.perf_counter()
+                sweep = analyze_sensitivity(work_df, total_budget, steps, engine=engine)
+                return {
+                    'timings': {'total': time.perf_counter() - start},
+                    'objective_value': float(sweep['objective_value'].iloc[-1])
+                }
+            record = _best_of(repeat, run)
+            record.update({
+                'suite': 'sensitivity',
+                'case': f"n=200,steps={steps}",
+                'engine': engine,
+                'params': {'n': 200, 'steps': steps}
+            })
+            results.append(record)
+    
+    results += _grid_records(repeat, seed)
+    return results
+
+def _grid_records(repeat, seed, n=40, size=50):
+    """Time size x size budget x multiplier grids on the priority and cost of two work types."""
+    results = []
+    work_df, total_budget = generate_portfolio(n, seed=seed, max_units=20)
+    budgets = np.linspace(0.5, 1.5, size) * total_budget
+    multipliers = np.round(np.linspace(0.5, 2.0, size), 2)
+    
+    for parameter in PARAMETERS:
+        axis = {'parameter': parameter, 'work_types': list(work_df['name'][:2]), 'multipliers': multipliers}
+        def run():
+            grid = compute_sensitivity_grid(work_df, budgets, [axis])
+            stats = {key: value for key, value in grid['stats'].items() if key != 'timings'}
+            return {'timings': grid['stats']['timings'], 'grid_stats': stats}
+        record = _best_of(repeat, run)
+        record.update({
+            'suite': 'sensitivity',
+            'case': f"n={n},grid={size}x{size},{parameter}",
+            'engine': 'grid',
+            'params': {'n': n, 'size': size, 'parameter': parameter}
+        })
+        results.append(record)
+    return results
+
+def run_incremental_suite(engines=('auto', 'matrix'), quick=False, seed=0, edits=10):
+    """
+    Time re-optimizing after single-row edits against cold solves.
+    
+    Each case applies `edits` random edits of one kind in a row, as a
+    planner would, re-optimizing with one IncrementalSolver after each and
+    solving the edited portfolio from scratch for comparison. 'max_units'
+    edits raise the bound of a work type the allocation does not fill;
+    'delete_rows' edits remove DELETE_ROWS work types at once. Timings are
+    totals over the edits; `actions` counts how often the solve was
+    skipped, warm started or run cold. Deletions must be solved cold, never
+    aligned and warm started, which costs more than it saves.
+    """
+    results = []
+    sizes = [1000] if quick else [1000, 10000]
+    
+    for n in sizes:
+        base_df, total_budget = generate_portfolio(n, seed=seed)
+        for engine in engines:
+            base = _optimize(base_df, total_budget, engine)
+            for kind in EDIT_KINDS:
+                rng = np.random.default_rng(seed)
+                solver = IncrementalSolver()
+                solver.remember(base_df, total_budget, base)
+                work_df, allocation = base_df, np.asarray(base['allocation'])
+                timings = {'incremental': 0.0, 'cold': 0.0}
+                
+                for _ in range(edits):
+                    work_df = _single_edit(work_df, allocation, kind, rng)
+                    start = time.perf_counter()
+                    result = solver.solve(work_df, total_budget, engine=engine)
+                    solved = time.perf_counter()
+                    cold = _optimize(work_df, total_budget, engine)
+                    timings['incremental'] += solved - start
+                    timings['cold'] += time.perf_counter() - solved
+                    if abs(result['objective_value'] - cold['objective_value']) > 1e-6 * max(1.0, abs(cold['objective_value'])):
+                        raise AssertionError(f"Incremental and cold optima differ after a {kind} edit")
+                    allocation = np.asarray(result['allocation'])
+                
+                if kind.startswith('delete') and solver.counts['cold'] != edits:
+                    raise AssertionError(f"{kind} edits were not solved cold: {solver.counts}")
+                results.append({
+                    'suite': 'incremental',
+                    'case': f"n={n},edit={kind}",
+                    'engine': engine,
+                    'params': {'n': n, 'edit': kind, 'edits': edits},
+                    'timings': dict(timings, total=timings['incremental']),
+                    'speedup': timings['cold'] / max(timings['incremental'], 1e-9),
+                    'actions': dict(solver.counts)
+                })
+    return results
+
+def _single_edit(work_df, allocation, kind, rng):
+    """Copy of the work types with one random row edited or deleted."""
+    work_df = work_df.copy()
+    if kind == 'max_units':
+        unfilled = np.flatnonzero(allocation < work_df['max_units'].to_numpy())
+        i = int(rng.choice(unfilled)) if len(unfilled) else int(rng.integers(len(work_df)))
+        work_df.loc[i, 'max_units'] += int(rng.integers(1, 10))
+    elif kind == 'priority':
+        i = int(rng.integers(len(work_df)))
+        work_df.loc[i, 'priority'] = int(rng.integers(1, 11))
+    elif kind == 'cost':
+        i = int(rng.integers(len(work_df)))
+        work_df.loc[i, 'cost'] = float(np.round(work_df.loc[i, 'cost'] * rng.uniform(0.8, 1.2)))
+    else:
+        rows = 1 if kind == 'delete' else DELETE_ROWS
+        work_df = work_df.drop(index=rng.choice(len(work_df), rows, replace=False)).reset_index(drop=True)
+    return work_df
+
+def run_presolve_suite(engines=('auto', 'matrix'), quick=False, repeat=3, seed=0):
+    """
+    Time solves of asset-level portfolios with and without presolve.
+    
+    Costs are drawn from about a hundred distinct values, as when many
+    assets share a unit rate, so most rows merge with an identical one.
+    The full problem is not timed with the matrix engine above 10,000 work
+    types, where CBC takes minutes. The `names=off` cases solve the bare
+    numeric columns, as robustness, sweep and region solves pass them.
+    """
+    results = []
+    sizes = [10000] if quick else [10000, 100000]
+    
+    for n in sizes:
+        work_df, total_budget = generate_portfolio(n, seed=seed, cost_spread=10.0)
+        for engine in engines:
+            for presolve, names in ((True, True), (False, True), (True, False)):
+                if engine == 'matrix' and not presolve and n > 10000:
+                    continue
+                frame = work_df if names else work_df.drop(columns='name')
+                def run():
+                    result = _optimize(frame, total_budget, engine, presolve=presolve)
+                    return {
+                        'timings': result['stats']['timings'],
+                        'status': result['status'],
+                        'objective_value': result['objective_value'],
+                        'presolve': result['stats'].get('presolve')
+                    }
+                record = _best_of(repeat, run)
+                record.update({
+                    'suite': 'presolve',
+                    'case': f"n={n},presolve={'on' if presolve else 'off'}" + ("" if names else ",names=off"),
+                    'engine': engine,
+                    'params': {'n': n, 'cost_spread': 10.0, 'presolve': presolve, 'names': names}
+                })
+                results.append(record)
+    return results
+
+def run_io_suite(quick=False, repeat=3, seed=0, scenarios=5):
+    """Time export and import of large portfolios with saved scenarios in every file format."""
+    results = []
+    sizes = [1000, 10000] if quick else [1000, 10000, 50000]
+    
+    for n in sizes:
+        portfolio = generate_portfolio_dict(n, seed=seed)
+        state = _export_state(portfolio, scenarios)
+        
+        for fmt, compress in IO_FORMATS:
+            def run():
+                start = time.perf_counter()
+                payload = export_bytes(state['work_types'], None, state['scenario_store'], fmt, compress)
+                exported = time.perf_counter()
+                read_export(io.BytesIO(payload), ScenarioStore())
+                imported = time.perf_counter()
+                return {
+                    'timings': {
+                        'export': exported - start,
+                        'import': imported - exported,
+                        'total': imported - start
+                    },
+                    'size_bytes': len(payload)
+                }
+            record = _best_of(repeat, run)
+            record.update({
+                'suite': 'io',
+                'case': f"n={n},scenarios={scenarios}",
+                'engine': fmt + ('.gz' if compress else ''),
+                'params': {'n': n, 'scenarios': scenarios, 'format': fmt, 'compress': compress}
+            })
+            results.append(record)
+    return results
+
+def run_startup_suite(repeat=3):
+    """
+    Time the cold start and a rerun of every app page.
+    
+    Each measurement runs in a fresh interpreter. Cold start and rerun are
+    separate records so `compare` flags a regression in either; a
+    'streamlit' record gives the floor set by importing Streamlit alone.
+    """
+    results = []
+    repo = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    
+    for page in (None,) + APP_PAGES:
+        runs = []
+        for _ in range(repeat):
+            command = [sys.executable, '-m', 'benchmarks.startup'] + ([page] if page else [])
+            output = subprocess.run(command, cwd=repo, capture_output=True, text=True, check=True).stdout
+            runs.append(json.loads(output.strip().splitlines()[-1]))
+        
+        for phase in ('cold_start', 'rerun') if page else ('cold_start',):
+            best = min(runs, key=lambda run: run[phase])
+            results.append({
+                'suite': 'startup',
+                'case': f"page={page or 'streamlit'}",
+                'engine': phase,
+                'timings': {'total': best[phase]},
+                'loaded': best['loaded'],
+                'params': {'page': page}
+            })
+    return results
+
+def _export_state(portfolio, scenarios):
+    """Session state as the Import/Export page sees it."""
+    work_types = portfolio['work_types']
+    rng = np.random.default_rng(0)
+    
+    # Scenarios of one portfolio differ from each other in a few work types
+    base = rng.integers(0, 50, len(work_types))
+    store = ScenarioStore()
+    for i in range(scenarios):
+        units = base.copy()
+        changed = rng.choice(len(units), size=max(len(units) // 20, 1), replace=False)
+        units[changed] = rng.integers(0, 50, len(changed))
+        store.save(f"Scenario {i + 1}", work_types, units, float(units.sum()))
+    return {'work_types': work_types, 'scenario_store': store}
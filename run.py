@@ -1,15 +1,68 @@
+import argparse
 import os
 import subprocess
 import sys
 
+APP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app")
+
+def solve(args):
+    """
+    Solve portfolios headlessly without starting Streamlit.
+    """
+    if APP_DIR not in sys.path:
+        sys.path.insert(0, APP_DIR)
+    from batch import run_batch
+    
+    summary = run_batch(
+        args.source,
+        args.output,
+        output_format=args.format,
+        workers=args.workers,
+        budget=args.budget,
+        engine=args.engine,
+        resume=args.resume,
+        time_limit=args.time_limit,
+        mip_gap=args.gap
+    )
+    return 1 if summary['failed'] else 0
+
+def parse_args(argv):
+    if APP_DIR not in sys.path:
+        sys.path.insert(0, APP_DIR)
+    from optimization import ENGINES
+    
+    parser = argparse.ArgumentParser(description="Utility Work Planner")
+    subparsers = parser.add_subparsers(dest="command")
+    
+    subparsers.add_parser("ui", help="Launch the Streamlit app (default)")
+    
+    solve_parser = subparsers.add_parser("solve", help="Solve portfolios in batch without the UI")
+    solve_parser.add_argument("source", help="Directory of portfolio files, a .json/.jsonl file, or - for JSON lines on stdin")
+    solve_parser.add_argument("-o", "--output", required=True, help="Output file (.jsonl or .csv)")
+    solve_parser.add_argument("--format", choices=["jsonl", "csv"], help="Output format (default: from the output file extension)")
+    solve_parser.add_argument("-j", "--workers", type=int, help="Number of worker processes (default: CPU count)")
+    solve_parser.add_argument("--budget", type=float, help="Budget for every portfolio, overriding their own")
+    solve_parser.add_argument(
+        "--engine", default="auto", choices=ENGINES, help=f"Solver engine: {', '.join(ENGINES)} (default: auto)"
+    )
+    solve_parser.add_argument("--time-limit", type=float, help="Seconds per portfolio before keeping the best allocation found")
+    solve_parser.add_argument("--gap", type=float, help="Relative optimality gap at which to stop (e.g. 0.01)")
+    solve_parser.add_argument("--resume", action="store_true", help="Skip portfolios already solved in the output file")
+    
+    return parser.parse_args(argv)
+
 def main():
     """
     Run the Streamlit app with proper Python environment setup.
     """
+    args = parse_args(sys.argv[1:])
+    if args.command == "solve":
+        sys.exit(solve(args))
+    
     print("Starting Utility Work Planner...")
     
     # Get the absolute path to the app directory
-    app_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app")
+    app_dir = APP_DIR
     app_file = os.path.join(app_dir, "app.py")
     
     # Use python3 explicitly which seems to be in PATH